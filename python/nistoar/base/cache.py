@@ -0,0 +1,80 @@
+"""
+Utilities for caching objects built from files on disk
+"""
+import os, threading
+
+class FileDependentCache(object):
+    """
+    a thread-safe cache of objects that are expensive to build from the contents of files on disk
+    (like parsed schemas or vocabularies).  An entry is associated with the files (and directories)
+    it was built from and is rebuilt whenever the modification time of any of those files changes--or,
+    for a directory, when any of the files directly within it changes or files are added or removed.
+
+    A single module-level instance can be used to share such objects across a process.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _mtime(cls, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def signature(cls, depends):
+        """
+        return a value that captures the current state of the given files and directories; it will
+        change if any of the files are modified.
+        :param list depends:  the paths to the files or directories of interest
+        """
+        out = []
+        for path in depends:
+            out.append((path, cls._mtime(path)))
+            if os.path.isdir(path):
+                with os.scandir(path) as entries:
+                    out.extend(sorted((e.path, cls._mtime(e.path)) for e in entries
+                                                                   if e.is_file()))
+        return tuple(out)
+
+    def get(self, key, factory, depends):
+        """
+        return the object cached under the given key, (re-)building it via the given factory function
+        if it has not been built yet or if any of the files it depends on have changed.
+
+        :param key:               a hashable identifier for the object
+        :param callable factory:  a function (taking no arguments) that builds the object
+        :param list depends:      the paths to the files and/or directories that the object is
+                                  built from
+        """
+        sig = self.signature(depends)
+        with self._lock:
+            ent = self._cache.get(key)
+            if ent and ent[0] == sig:
+                return ent[1]
+            out = factory()
+            self._cache[key] = (sig, out)
+            return out
+
+    def remove(self, key):
+        """
+        remove the object cached under the given key (if it exists)
+        """
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        """
+        remove all objects from this cache
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
@@ -1,11 +1,60 @@
 """
 A python interface to the PDR's jq-based JSON transformation
 """
-import os, json, subprocess as subproc, types, re
+import os, json, subprocess as subproc, types, re, threading, tempfile, select
+from itertools import chain, repeat
 from collections import OrderedDict
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 jsonDecoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
 
+def dumps(data):
+    """
+    serialize the given data to a compact JSON-formatted string, using the 
+    (faster) orjson codec if it is installed.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(data).decode('utf-8')
+        except TypeError:
+            pass   # e.g. non-string keys; let json handle (or reject) it
+    return json.dumps(data, separators=(',', ':'))
+
+def dumpb(data):
+    """
+    serialize the given data to compact, UTF-8-encoded JSON bytes, using the 
+    (faster) orjson codec if it is installed.
+    """
+    if orjson:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            pass
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def loads(data, ordered=True):
+    """
+    parse the given JSON-formatted string or bytes.  
+
+    :param data str|bytes:  the JSON data to parse
+    :param ordered   bool:  if True (default), objects are returned as 
+                            OrderedDicts (as with jsonDecoder); otherwise, 
+                            they are returned as plain dicts (which preserve 
+                            order as well), decoded with the orjson codec if 
+                            it is installed.
+    """
+    if not ordered:
+        if orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return jsonDecoder.decode(data)
+
 def get_version():
     return JqCommand().version
 
@@ -56,27 +105,32 @@ class JqCommand(object):
             raise IOError(2, "jq Library Directory Not Found: "+libdir)
         self.libargs = ["-L"+libdir]
 
-    def process_data(self, jqfilter, datastr, args=None):
+    def process_data(self, jqfilter, datastr, args=None, ordered=True):
         """ 
         This executes jq with with given JSON data and returns the 
         converted output.
 
         :param jqfilter str:  The jq filter to apply to the input
-        :param datastr  str:  The input data as a JSON-formatted string
+        :param datastr  str:  The input data as a JSON-formatted string (or as
+                              UTF-8-encoded bytes)
         :param args    dict:  arguments to pass in via --argjson
+        :param ordered bool:  if False, the output is returned using plain dicts 
+                              rather than OrderedDicts (see loads())
         """
         argopts = self.form_argopts(args)
+        if not isinstance(datastr, bytes):
+            datastr = datastr.encode('utf-8')
 
         cmd = self.form_cmd(jqfilter, args)
         proc = subproc.Popen(cmd, stdout=subproc.PIPE, stderr=subproc.PIPE,
-                             stdin=subproc.PIPE, universal_newlines=True)
+                             stdin=subproc.PIPE)
         (out, err) = proc.communicate(datastr)
 
         if proc.returncode != 0:
-            raise RuntimeError(err + "\nFailed jq command: " +
+            raise RuntimeError(err.decode('utf-8', 'replace') + "\nFailed jq command: " +
                                self._format_cmd(cmd))
 
-        return jsonDecoder.decode(out)
+        return loads(out, ordered)
 
     def process_file(self, jqfilter, filepath, args=None):
         """ 
@@ -90,15 +144,14 @@ class JqCommand(object):
         argopts = self.form_argopts(args)
 
         cmd = self.form_cmd(jqfilter, args, filepath)
-        proc = subproc.Popen(cmd, stdout=subproc.PIPE, stderr=subproc.PIPE,
-                             universal_newlines=True)
+        proc = subproc.Popen(cmd, stdout=subproc.PIPE, stderr=subproc.PIPE)
         (out, err) = proc.communicate()
 
         if proc.returncode != 0:
-            raise RuntimeError(err + "\nFailed jq command: " +
+            raise RuntimeError(err.decode('utf-8', 'replace') + "\nFailed jq command: " +
                                self._format_cmd(cmd))
 
-        return jsonDecoder.decode(out)
+        return loads(out)
 
     def _format_cmd(self, cmd):
         for i in range(len(cmd)):
@@ -141,15 +194,308 @@ class JqCommand(object):
 
         return cmd
 
+def _form_imports(modules):
+    # format a list of module names as a jq import preface
+    modimport = ''
+    if modules:
+        for mod in modules:
+            pref = mod
+            if ':' in mod:
+                mod, pref = mod.rsplit(':')
+            modimport += 'import "{0}" as {1}; '.format(mod, pref)
+    return modimport
+
+class JqProcess(object):
+    """
+    a wrapper around a single, long-running jq process that transforms a 
+    stream of documents, one at a time.
+
+    Each document is written to the process's stdin together with its 
+    arguments, and jq writes back exactly one (compact) line of output for it.
+    A JqProcess is not thread-safe; use a JqPool to share processes across 
+    threads.
+    """
+
+    def __init__(self, cmd):
+        """
+        start the jq process
+
+        :param cmd list:  the jq command line to execute, as formed by 
+                          JqPool.form_cmd()
+        """
+        self.cmd = cmd
+        self._err = tempfile.TemporaryFile(mode='w+')
+        self._proc = subproc.Popen(cmd, stdin=subproc.PIPE, stdout=subproc.PIPE,
+                                   stderr=self._err, universal_newlines=True)
+
+    @property
+    def alive(self):
+        """
+        True if the jq process is still running and able to accept input
+        """
+        return self._proc is not None and self._proc.poll() is None
+
+    def send(self, datastr, argstr="null", timeout=None):
+        """
+        send a document through the jq process and return its raw output line
+
+        :param datastr str:  the input document as a JSON-formatted string; 
+                             this must be a single, well-formed JSON value, as
+                             otherwise, jq may wait for more input.
+        :param argstr  str:  the arguments for the document as a JSON-formatted
+                             object (or null)
+        :param timeout float:  the number of seconds to wait for the output;
+                             if exceeded, the process is killed.  If None, 
+                             wait indefinitely.
+        :raises RuntimeError:  if the jq process died while handling the input
+                             or did not respond in time
+        """
+        if not self.alive:
+            raise RuntimeError("jq process is not running: " +
+                               JqCommand()._format_cmd(list(self.cmd)))
+        try:
+            self._proc.stdin.write("[" + datastr + "," + argstr + "]\n")
+            self._proc.stdin.flush()
+            if timeout is not None and \
+               not select.select([self._proc.stdout], [], [], timeout)[0]:
+                self._proc.kill()
+                self.close()
+                raise RuntimeError("jq process did not respond within {0} seconds; killed: "
+                                   .format(timeout) + JqCommand()._format_cmd(list(self.cmd)))
+            line = self._proc.stdout.readline()
+        except (IOError, OSError) as ex:
+            line = ''
+
+        if not line:
+            msg = self._errmsg()
+            self.close()
+            raise RuntimeError(msg + "\nFailed jq command: " +
+                               JqCommand()._format_cmd(list(self.cmd)))
+        return line
+
+    def _errmsg(self):
+        try:
+            self._err.seek(0)
+            return self._err.read().strip() or "jq process exited unexpectedly"
+        except (IOError, OSError, ValueError):
+            return "jq process exited unexpectedly"
+
+    def close(self):
+        """
+        shut down the jq process
+        """
+        if self._proc:
+            try:
+                if self._proc.poll() is None:
+                    self._proc.stdin.close()
+                    try:
+                        self._proc.wait(5)
+                    except subproc.TimeoutExpired:
+                        self._proc.kill()
+                        self._proc.wait()
+                self._proc.stdout.close()
+            except (IOError, OSError):
+                pass
+            finally:
+                self._proc = None
+                self._err.close()
+
+class JqPool(object):
+    """
+    a pool of long-running jq processes that apply the same filter to many 
+    documents.  
+
+    Starting a jq process (and compiling the imported modules) typically costs
+    far more than applying the filter to a single document; a JqPool avoids 
+    that cost by keeping up to `size` jq processes running, each with the 
+    filter already compiled.  Documents are fed to an idle process one at a 
+    time, so a pool can be shared by multiple threads.  A filter error raised 
+    while transforming one document only affects that document.
+
+    Per-document argument values are made visible to the filter as variables
+    with the same names given to the pool's args at construction; note, 
+    however, that references to such variables from *within imported modules*
+    will always see the values given at construction.
+    """
+
+    def __init__(self, jqfilter, libpath=None, modules=None, args=None, size=1,
+                 jqpath=None, timeout=300):
+        """
+        create the pool.  No jq processes are started until they are needed.
+
+        :param jqfilter str:   the jq filter to apply to the input data
+        :param libpath str:    the path to the directory containing needed 
+                               jq module files
+        :param modules array of str:  a list of modules to import as a preface
+                               to the given filter
+        :param args dict:      a dictionary of default argument data; its keys
+                               define the names of the variables that can be 
+                               set for each document.
+        :param size int:       the maximum number of jq processes to run
+        :param jqpath str:     the path to the jq executable to use
+        :param timeout float:  the number of seconds to wait for a jq process
+                               to transform a document before killing it; if 
+                               None, wait indefinitely.
+        """
+        if modules and not libpath:
+            raise ValueError("Missing libpath argument; needed when modules is given")
+        if size < 1:
+            raise ValueError("JqPool: size must be a positive integer: "+str(size))
+        self.cmd = JqCommand(libpath, jqpath)
+        self.size = size
+        self.timeout = timeout
+        self.args = {}
+        if args:
+            if not isinstance(args, dict):
+                raise ValueError("args paramter not a dict: " + str(args))
+            self.args = args.copy()
+        self.filter = self._wrap_filter(_form_imports(modules), jqfilter,
+                                        list(self.args.keys()))
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._avail = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @classmethod
+    def _wrap_filter(cls, imports, jqfilter, argnames):
+        # Each input is a two-element array: the document and its arguments.
+        # The output is always exactly one line: [true, [results...]] or
+        # [false, errmsg]
+        bind = ''
+        if argnames:
+            bind = ".[1] as {{{0}}} | ".format(", ".join("$"+n for n in argnames))
+        return imports + bind + ".[0] | try ([" + jqfilter + "] | [true, .]) " + \
+               "catch [false, .]"
+
+    def form_cmd(self):
+        """
+        return the command line used to start each jq process in the pool
+        """
+        cmd = self.cmd.form_cmd(self.filter, self.args)
+        cmd[1:1] = ["-c", "--unbuffered"]
+        return cmd
+
+    def _checkout(self):
+        self._avail.acquire()
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("JqPool has been closed")
+                if self._idle:
+                    return self._idle.pop()
+            return JqProcess(self.form_cmd())
+        except:
+            self._avail.release()
+            raise
+
+    def _checkin(self, proc):
+        try:
+            with self._lock:
+                if proc.alive and not self._closed:
+                    self._idle.append(proc)
+                    proc = None
+            if proc:
+                proc.close()
+        finally:
+            self._avail.release()
+
+    def _form_argstr(self, args):
+        if not args:
+            return "null"
+        if not isinstance(args, dict):
+            raise ValueError("args paramter not a dict: " + str(args))
+        unknown = [k for k in args if k not in self.args]
+        if unknown:
+            raise ValueError("JqPool: argument names not set at construction: " +
+                             str(unknown))
+        return json.dumps(args)
+
+    def transform(self, datastr, args=None, ordered=True):
+        """
+        transform the given JSON-formatted data
+
+        :param datastr  str:  The input data as a JSON-formatted string
+        :param args dict:     argument data to use for this document, overriding
+                              the values set at construction.  
+        :param ordered bool:  if False, the output is returned using plain dicts 
+                              rather than OrderedDicts (see loads())
+        """
+        use = self.args.copy()
+        if args:
+            use.update(args)
+        argstr = self._form_argstr(use)
+
+        # jq would wait indefinitely for the rest of an incomplete document
+        try:
+            loads(datastr, False)
+        except ValueError as ex:
+            raise RuntimeError("jq: error: input is not valid JSON: " + str(ex) +
+                               "\nFailed jq filter: " + self.filter)
+
+        proc = self._checkout()
+        try:
+            line = proc.send(datastr, argstr, self.timeout)
+        finally:
+            self._checkin(proc)
+
+        ok, out = loads(line, ordered)
+        if not ok:
+            if not isinstance(out, str):
+                out = json.dumps(out)
+            raise RuntimeError("jq: error: " + out + "\nFailed jq filter: " +
+                               self.filter)
+        if len(out) != 1:
+            raise ValueError("jq filter produced {0} results (expected 1)"
+                             .format(len(out)))
+        return out[0]
+
+    def transform_file(self, filepath, args=None):
+        """
+        transform the JSON-formatted data in the given file
+
+        :param filepath str:   the path to a file containing the input JSON data
+                               to transform
+        :param args dict:      argument data to use for this document
+        """
+        with open(filepath) as fd:
+            return self.transform(fd.read(), args)
+
+    def close(self):
+        """
+        shut down all of the jq processes in this pool.  Further attempts to
+        transform data will raise a RuntimeError.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            proc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
 class Jq(object):
     """
     a machine for transforming JSON data using PDR modules
 
     A Jq instance is constructed with a filter so as to be applied multiple 
-    times over multiple documents of the same type.  
+    times over multiple documents of the same type.  If constructed with a 
+    poolsize, the transformations are carried out by persistent jq processes
+    (see JqPool) rather than a new jq process for each document.
     """
 
-    def __init__(self, jqfilter, libpath=None, modules=None, args=None):
+    def __init__(self, jqfilter, libpath=None, modules=None, args=None,
+                 poolsize=None):
         """
         create the Jq filter machine.  
 
@@ -162,20 +508,19 @@ class Jq(object):
                                to the given filter
         :param args dict:      a dictionary of data to pass into the jq filter
                                (via the jq --argjson option).
+        :param poolsize int:   if set to a positive number, transform data 
+                               via a pool of up to this many persistent jq
+                               processes.  Note that in this mode, imported 
+                               modules will only see the argument values given
+                               at construction.
         """
         if modules and not libpath:
             raise ValueError("Missing libpath argument; needed when modules is given")
         self.cmd = JqCommand(libpath)
+        self._modules = modules
+        self._body = jqfilter
 
-        modimport = ''
-        if modules:
-            for mod in modules:
-                pref = mod
-                if ':' in mod:
-                    mod, pref = mod.rsplit(':')
-                modimport += 'import "{0}" as {1}; '.format(mod, pref)
-
-        self.filter = modimport + jqfilter
+        self.filter = _form_imports(modules) + jqfilter
         
         self.args = {}
         if args:
@@ -183,6 +528,134 @@ class Jq(object):
                 raise ValueError("args paramter not a dict: " + str(args))
             self.args = args.copy()
 
+        self.poolsize = poolsize
+        self._pools = {}
+        self._poollock = threading.Lock()
+
+    def _pool_for(self, args):
+        # pools are specific to the set of argument names they support
+        names = tuple(sorted(args.keys()))
+        with self._poollock:
+            pool = self._pools.get(names)
+            if not pool:
+                poolargs = dict((n, None) for n in names)
+                poolargs.update(self.args)
+                pool = JqPool(self._body, self.cmd.library, self._modules,
+                              poolargs, self.poolsize, self.cmd.jqexe)
+                self._pools[names] = pool
+        return pool
+
+    def transform_many(self, datastrs, args=None):
+        """
+        transform a sequence of JSON-formatted documents through a single jq 
+        process, returning a generator that yields the transformed outputs 
+        in order.  
+
+        The documents are streamed into jq (from a separate thread) as they 
+        are pulled from the input iterable, and outputs are parsed as they are
+        produced, so neither the inputs nor the outputs need to be held in 
+        memory all at once.  If the filter fails for a document, a 
+        RuntimeError is raised when its output is requested.  
+
+        Note that argument values given per document are visible to the 
+        filter but not to the imported modules, which see only the values 
+        given at construction.  
+
+        :param datastrs iterable:  the input documents as JSON-formatted 
+                                   strings
+        :param args iterable:      a sequence of dictionaries, one for each 
+                                   document, containing additional data to 
+                                   pass into the transformation for that 
+                                   document (in addition to and overriding 
+                                   those set at construction).  All of the 
+                                   dictionaries must use the same names as 
+                                   the first one (or those set at construction).
+                                   If None, only the construction values are 
+                                   used.
+        """
+        if args is None:
+            args = repeat(None)
+        args = iter(args)
+        first = next(args, None)
+        args = chain([first], args)
+
+        poolargs = dict((n, None) for n in (first or {}))
+        poolargs.update(self.args)
+        pool = JqPool(self._body, self.cmd.library, self._modules, poolargs, 1,
+                      self.cmd.jqexe)
+        cmd = pool.form_cmd()
+        cmd.remove("--unbuffered")
+
+        err = tempfile.TemporaryFile(mode='w+')
+        proc = subproc.Popen(cmd, stdin=subproc.PIPE, stdout=subproc.PIPE,
+                             stderr=err, universal_newlines=True)
+        status = { "sent": 0, "error": None }
+
+        def feed():
+            try:
+                for datastr, docargs in zip(datastrs, args):
+                    use = self.args.copy()
+                    if docargs:
+                        use.update(docargs)
+                    proc.stdin.write("[" + datastr + "," + pool._form_argstr(use) + "]\n")
+                    status['sent'] += 1
+            except (IOError, OSError):
+                # jq has exited; the reader will report the error
+                pass
+            except Exception as ex:
+                status['error'] = ex
+            finally:
+                try:
+                    proc.stdin.close()
+                except (IOError, OSError):
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        try:
+            recvd = 0
+            for line in proc.stdout:
+                recvd += 1
+                ok, out = jsonDecoder.decode(line)
+                if not ok:
+                    if not isinstance(out, str):
+                        out = json.dumps(out)
+                    raise RuntimeError("jq: error (document #{0}): {1}"
+                                       .format(recvd, out))
+                if len(out) != 1:
+                    raise ValueError("jq filter produced {0} results for document #{1} "
+                                     "(expected 1)".format(len(out), recvd))
+                yield out[0]
+
+            feeder.join()
+            proc.wait()
+            if status['error']:
+                raise status['error']
+            if proc.returncode != 0 or recvd < status['sent']:
+                err.seek(0)
+                raise RuntimeError(err.read().strip() + "\nFailed jq command: " +
+                                   self.cmd._format_cmd(cmd))
+
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            feeder.join()
+            err.close()
+
+    def close(self):
+        """
+        shut down any persistent jq processes used by this instance.  This 
+        instance can still be used afterward; new processes will be started 
+        as needed.
+        """
+        with self._poollock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+
     def transform(self, datastr, args=None):
         """
         transform the given JSON-formatted data
@@ -197,8 +670,33 @@ class Jq(object):
             if not isinstance(args, dict):
                 raise ValueError("args paramter not a dict: " + str(args))
             use.update(args)
+        if self.poolsize:
+            return self._pool_for(use).transform(datastr, use)
         return self.cmd.process_data(self.filter, datastr, use)
 
+    def transform_data(self, data, args=None, ordered=True):
+        """
+        transform the given (parsed) JSON data.  The data is handed to jq as
+        UTF-8-encoded bytes, serialized (and, if ordered is False, the output 
+        parsed) with the orjson codec when it is installed.  
+
+        :param data:           The input data as parsed JSON (e.g. a dict)
+        :param args dict:      additional data to pass into the transformation,
+                               in addition to (and overriding) those set at 
+                               construction.  
+        :param ordered bool:   if False, the output is returned using plain 
+                               dicts rather than OrderedDicts, which is faster 
+                               to parse.
+        """
+        use = self.args.copy()
+        if args:
+            if not isinstance(args, dict):
+                raise ValueError("args paramter not a dict: " + str(args))
+            use.update(args)
+        if self.poolsize:
+            return self._pool_for(use).transform(dumps(data), use, ordered)
+        return self.cmd.process_data(self.filter, dumpb(data), use, ordered)
+
     def transform_file(self, filepath, args=None):
         """
         transform the given JSON-formatted data
@@ -214,6 +712,8 @@ class Jq(object):
             if not isinstance(args, dict):
                 raise ValueError("args paramter not a dict: " + str(args))
             use.update(args)
+        if self.poolsize:
+            return self._pool_for(use).transform_file(filepath, use)
         return self.cmd.process_file(self.filter, filepath, use)
         
     
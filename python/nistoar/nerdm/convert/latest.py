@@ -4,7 +4,7 @@ Module for converting a NERDm record to the latest schema versions.
 import re
 from collections import OrderedDict
 from collections.abc import Mapping
-from copy import deepcopy
+from copy import copy, deepcopy
 from urllib.parse import urlparse
 
 from .. import constants as NERDM_CONST
@@ -12,6 +12,7 @@ from .. import utils
 
 _nrdpat = re.compile(r"^("+NERDM_CONST.core_schema_base+"\S+/)v\d[\w\.]*((#.*)?)$")
 _oldnrdpat = re.compile(r"^https?://www.nist.gov/od/dm/nerdm-schema/")
+_dcreftype_re = re.compile("#/definitions/DCiteDocumentRef")
 def _schuripatfor(uribase):
     return re.compile(r"^("+uribase+")v\d[\w\.]*((#.*)?)$")
 
@@ -24,6 +25,63 @@ VERSION_EXTENSION_RE = re.compile(RELHIST_EXTENSION+r"/\d+(\.\d+)*$")
 def to_version_ext(version):
     return RELHIST_EXTENSION + '/' + version
 
+class _SchemaURIMatcher(object):
+    """
+    a function that updates the version field of a NERDm schema URI according to a set of requested
+    versions, returning None if the URI should not be changed.  The URI bases for all of the 
+    extension schemas are matched with a single compiled pattern, and results are memoized by URI.
+    """
+    memo_limit = 10000
+
+    def __init__(self, byext, defver):
+        """
+        :param dict byext:   the versions to update to, keyed by extension field or URI base (see
+                             NERDm2Latest); an empty version means URIs for that extension should not
+                             be changed.
+        :param str defver:   the version to update all other NERDm schema URIs to
+        """
+        self.byext = byext
+        self.defver = defver
+        self._vers = []
+        alts = []
+        for i, ext in enumerate(byext):
+            uribase = ext
+            parsed = urlparse(ext)
+            if not parsed.scheme:
+                uribase = NERDM_CONST.core_schema_base+ext
+                if ext:
+                    uribase += "/"
+            alts.append("(?P<e%d>%s)" % (i, uribase))
+            self._vers.append(byext[ext])
+        self._re = re.compile(r"^(?:" + "|".join(alts) + r")v\d[\w\.]*(?P<frag>(#.*)?)$")
+        self._memo = {}
+
+    def __call__(self, schuri):
+        try:
+            return self._memo[schuri]
+        except KeyError:
+            pass
+        out = self._update(schuri)
+        if len(self._memo) >= self.memo_limit:
+            self._memo.clear()
+        self._memo[schuri] = out
+        return out
+
+    def _update(self, schuri):
+        schuri = _oldnrdpat.sub(NERDM_CONST.core_schema_base, schuri)
+        match = self._re.match(schuri)
+        if match:
+            for i, ver in enumerate(self._vers):
+                base = match.group("e%d" % i)
+                if base is not None:
+                    if ver:
+                        return base+ver+match.group("frag")
+                    return None
+        match = _nrdpat.match(schuri)
+        if match and self.defver:
+            return match.group(1)+self.defver+match.group(2)
+        return None
+
 class NERDm2Latest(object):
     """
     a transformation engine for converting NERDm records to conform to the latest schema versions.
@@ -80,8 +138,9 @@ class NERDm2Latest(object):
         if unkn:
             raise ValueError("Undefined convention massagers: "+str(unkn))
         self._defconv = defconv
+        self._matchers = {}
 
-    def convert(self, nerdmd, conv=[], version=None, byext=None, inplace=False):
+    def convert(self, nerdmd, conv=[], version=None, byext=None, inplace=False, copy_on_write=False):
         """
         convert the nerdm record to conform to the latest schemas
         :param dict nerdmd:   the NERDm record to upgrade
@@ -91,27 +150,42 @@ class NERDm2Latest(object):
         :param str version:   the version to update to; this overrides the value set at construction time.  
         :param dict  byext:   a dictionary of extension versions by label; this overrides the set
                               set at construction time.
+        :param bool inplace:  if True, the input record will be edited directly; otherwise, the 
+                              input record will not be changed.
+        :param bool copy_on_write:  if True (and inplace is False), rather than deep-copying the input 
+                              record, only the nodes that must change are copied; the output will share
+                              all other nodes with the input.  Callers should then not edit the output
+                              in place below its top level.  This is ignored if any conventions are
+                              applied.
         """
         if conv is None:
             conv = self._defconv
 
-        if not inplace:
+        cow = copy_on_write and not inplace and not conv
+        if not inplace and not cow:
             nerdmd = deepcopy(nerdmd)
 
         # update the schema references
-        self.update_nerdm_schema(nerdmd, version, byext, inplace=True)
+        nerdmd = self.update_nerdm_schema(nerdmd, version, byext, inplace=not cow, copy_on_write=cow)
 
         # handle version-specific changes
         schver = utils.get_nerdm_schema_version(nerdmd)
         if utils.cmp_versions(schver, "0.5") >= 0 and \
            'versionHistory' in nerdmd and 'releaseHistory' not in nerdmd:
             # change from versionHistory to releaseHistory
+            if cow:
+                nerdmd['versionHistory'] = list(nerdmd['versionHistory'])
             nerdmd['releaseHistory'] = self.create_release_history(nerdmd)
             del nerdmd['versionHistory']
 
         if utils.cmp_versions(schver, "0.1") >= 0:
             if 'references' in nerdmd:
-                for i, ref in enumerate(nerdmd['references']):
+                refs = nerdmd['references']
+                if cow:
+                    refs = nerdmd['references'] = list(refs)
+                for i, ref in enumerate(refs):
+                    if cow and ('refid' in ref or not ref.get('@id')):
+                        ref = refs[i] = copy(ref)
                     if 'refid' in ref:
                         if '@id' not in ref:
                             ref['@id'] = ref['refid']
@@ -197,7 +271,7 @@ class NERDm2Latest(object):
 
         return out
 
-    def update_nerdm_schema(self, nerdmd, version=None, byext=None, inplace=False):
+    def update_nerdm_schema(self, nerdmd, version=None, byext=None, inplace=False, copy_on_write=False):
         """
         return a converted version of the input record that is updated to the latest (or specified)
         versions of the NERDm schema.  The "_schema" property of the output record will reflect
@@ -209,6 +283,8 @@ class NERDm2Latest(object):
                               set at construction time.
         :param inplace bool:  if True, the input record will be edited directly; otherwise, the 
                               input record will not be changed.
+        :param copy_on_write bool:  if True (and inplace is False), only the nodes that must change
+                              are copied; the output will share all other nodes with the input.
         :return:  the converted record
         """
         # detect the metatag character and do an initial sanity check on the input
@@ -219,58 +295,73 @@ class NERDm2Latest(object):
         if not version:
             defver = self.defver
 
-        # prep the byext map
-        if byext is None:
-            byext = self.byext
-        byext = dict(byext)
-        if "pub" not in byext:
-            byext["pub"] = version or NERDM_CONST.pub_ver
-        if "bib" not in byext:
-            byext["bib"] = version or NERDM_CONST.bib_ver
-        if "rls" not in byext:
-            byext["rls"] = version or NERDM_CONST.rls_ver
-        if "exp" not in byext:
-            byext["exp"] = version or NERDM_CONST.exp_ver
-        if "sip" not in byext:
-            byext["sip"] = version or NERDM_CONST.sip_ver
-        if "agg" not in byext:
-            byext["agg"] = version or NERDM_CONST.agg_ver
-        if "" not in byext:
-            byext[""] = defver
-
-        matchrs = {}
-        for ext in byext:
-            uribase = ext
-            parsed = urlparse(ext)
-            if not parsed.scheme:
-                uribase = NERDM_CONST.core_schema_base+ext
-                if ext:
-                    uribase += "/"
-            matchrs[ _schuripatfor(uribase) ] = byext[ext]
+        matchr = self._matcher_for(version, byext)
 
-        if not inplace:
+        cow = copy_on_write and not inplace
+        if cow:
+            orig = nerdmd
+            nerdmd = self._upd_schema_ver_on_node_cow(nerdmd, mtc+"extensionSchemas", matchr, defver)
+            if nerdmd is orig:
+                nerdmd = copy(nerdmd)
+        elif not inplace:
             nerdmd = deepcopy(nerdmd)
 
         # update the core schema
-        updated = self._upd_schema_ver(nerdmd[mtc+"schema"], matchrs, defver)
+        updated = matchr(nerdmd[mtc+"schema"])
         if updated:
             nerdmd[mtc+"schema"] = updated
-        self._upd_schema_ver_on_node(nerdmd, mtc+"extensionSchemas", matchrs, defver)
+        if not cow:
+            self._upd_schema_ver_on_node(nerdmd, mtc+"extensionSchemas", matchr, defver)
 
         # correct to start using bib extension if needed
-        _dcreftype_re = re.compile("#/definitions/DCiteDocumentRef")
         if any(mtc+"extensionSchemas" in r for r in nerdmd.get('references',[])):
+            if cow:
+                nerdmd['references'] = [self._copy_ext_schemas(r, mtc+"extensionSchemas")
+                                        for r in nerdmd['references']]
             for ref in nerdmd['references']:
                 for i, ext in enumerate(ref.get(mtc+"extensionSchemas", [])):
                     if ext.startswith(NERDM_CONST.core_schema_base+"v") and '#/definitions/DCite' in ext:
                         ref[mtc+"extensionSchemas"][i] = _dcreftype_re.sub("#/definitions/DCiteRef",
                                                                            ref[mtc+"extensionSchemas"][i])
                         ext = ref[mtc+"extensionSchemas"][i]
-                        ref[mtc+"extensionSchemas"][i] = NERDM_CONST.core_schema_base+"bib/" + byext['bib'] + \
+                        ref[mtc+"extensionSchemas"][i] = NERDM_CONST.core_schema_base+"bib/" + \
+                                                         matchr.byext['bib'] + \
                                                          ext[ext.index('#'):]
 
         return nerdmd
 
+    def _matcher_for(self, version=None, byext=None):
+        # return the (cached) _SchemaURIMatcher that implements the updates requested by the given 
+        # update_nerdm_schema() parameters
+        if byext is None:
+            byext = self.byext
+        defver = version or self.defver
+        key = (version, defver, tuple(byext.items()))
+        matchr = self._matchers.get(key)
+        if matchr:
+            return matchr
+
+        # prep the byext map
+        byext = dict(byext)
+        if "pub" not in byext:
+            byext["pub"] = version or NERDM_CONST.pub_ver
+        if "bib" not in byext:
+            byext["bib"] = version or NERDM_CONST.bib_ver
+        if "rls" not in byext:
+            byext["rls"] = version or NERDM_CONST.rls_ver
+        if "exp" not in byext:
+            byext["exp"] = version or NERDM_CONST.exp_ver
+        if "sip" not in byext:
+            byext["sip"] = version or NERDM_CONST.sip_ver
+        if "agg" not in byext:
+            byext["agg"] = version or NERDM_CONST.agg_ver
+        if "" not in byext:
+            byext[""] = defver
+
+        matchr = _SchemaURIMatcher(byext, defver)
+        self._matchers[key] = matchr
+        return matchr
+
     def _upd_schema_ver_on_node(self, node, schprop, byext, defver):
         # node - a JSON node to examine
         # schprop - the property, e.g. "_extensionSchemas" or "_schema" to examime
@@ -288,11 +379,11 @@ class NERDm2Latest(object):
                 if updated:
                     node[schprop] = updated
 
-        for prop in node:
-            if isinstance(node[prop], Mapping):
-                self._upd_schema_ver_on_node(node[prop], schprop, byext, defver)
-            elif isinstance(node[prop], (list, tuple)):
-                self._upd_schema_ver_on_array(node[prop], schprop, byext, defver)
+        for val in node.values():
+            if isinstance(val, Mapping):
+                self._upd_schema_ver_on_node(val, schprop, byext, defver)
+            elif isinstance(val, (list, tuple)):
+                self._upd_schema_ver_on_array(val, schprop, byext, defver)
 
     def _upd_schema_ver_on_array(self, array, schprop, byext, defver):
         for el in array:
@@ -301,7 +392,60 @@ class NERDm2Latest(object):
             elif isinstance(el, (list, tuple)):
                 self._upd_schema_ver_on_array(el, schprop, byext, defver)
 
+    def _upd_schema_ver_on_node_cow(self, node, schprop, byext, defver):
+        # like _upd_schema_ver_on_node() except that node is not edited; instead, if any of its 
+        # schema URIs need updating, a copy is returned that shares its unchanged subtrees with node.
+        # If no updates are needed, node itself is returned.
+        out = node
+        for prop, val in node.items():
+            newval = None
+            if prop == schprop and isinstance(val, (list, tuple)):
+                for i, uri in enumerate(val):
+                    updated = self._upd_schema_ver(uri, byext, defver)
+                    if updated:
+                        if newval is None:
+                            newval = list(val)
+                        newval[i] = updated
+            elif prop == schprop:
+                newval = self._upd_schema_ver(val, byext, defver)
+            elif isinstance(val, Mapping):
+                newval = self._upd_schema_ver_on_node_cow(val, schprop, byext, defver)
+            elif isinstance(val, (list, tuple)):
+                newval = self._upd_schema_ver_on_array_cow(val, schprop, byext, defver)
+
+            if newval is not None and newval is not val:
+                if out is node:
+                    out = copy(node)
+                out[prop] = newval
+        return out
+
+    def _upd_schema_ver_on_array_cow(self, array, schprop, byext, defver):
+        out = array
+        for i, el in enumerate(array):
+            if isinstance(el, Mapping):
+                newel = self._upd_schema_ver_on_node_cow(el, schprop, byext, defver)
+            elif isinstance(el, (list, tuple)):
+                newel = self._upd_schema_ver_on_array_cow(el, schprop, byext, defver)
+            else:
+                continue
+            if newel is not el:
+                if out is array:
+                    out = list(array)
+                out[i] = newel
+        return out
+
+    def _copy_ext_schemas(self, node, schprop):
+        # return a shallow copy of node with its own copy of its schprop list (if it has one)
+        if schprop not in node:
+            return node
+        node = copy(node)
+        node[schprop] = list(node[schprop])
+        return node
+
     def _upd_schema_ver(self, schuri, byext, defver):
+        # byext is either a _SchemaURIMatcher or a map of compiled URI patterns to versions
+        if isinstance(byext, _SchemaURIMatcher):
+            return byext(schuri)
         schuri = _oldnrdpat.sub(NERDM_CONST.core_schema_base, schuri)
         for r in byext:
             match = r.search(schuri)
@@ -343,12 +487,20 @@ def update_nerdm_schema(nerdmd, version=None, byext={}):
                           string for the value means that the version for that
                           extension should not be changed.
     """
-    return NERDm2Latest().update_nerdm_schema(nerdmd, version=version, byext=byext, inplace=True)
+    return _default_converter().update_nerdm_schema(nerdmd, version=version, byext=byext, inplace=True)
 
 def update_to_latest_schema(nerdmd, inplace=True):
     """
     update the given NERDm record to the latest versions of the NERDm schemas, transforming the 
     data for compliance.
     """
-    return NERDm2Latest().convert(nerdmd, inplace=inplace)
+    return _default_converter().convert(nerdmd, inplace=inplace)
+
+_defcvtr = None
+def _default_converter():
+    # a shared converter lets the module functions reuse its compiled URI matchers
+    global _defcvtr
+    if not _defcvtr:
+        _defcvtr = NERDm2Latest()
+    return _defcvtr
 
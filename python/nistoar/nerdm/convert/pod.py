@@ -4,12 +4,14 @@ Classes and functions for converting from and to the NERDm schema
 import os, json, re
 from collections import OrderedDict
 from collections.abc import Mapping
+from copy import deepcopy
 
 from ... import jq
+from . import pod2nerdm
 from .doi import DOIResolver
 from ...doi import is_DOI
 from ..constants import TAXONOMY_VOCAB_BASE_URI, TAXONOMY_VOCAB_URI
-from ..taxonomy import ResearchTopicsTaxonomy
+from ..taxonomy import ResearchTopicsTaxonomy, get_taxonomy
 
 # a taxonony URI with www.nist.gov instead of data.nist.gov got out into
 # the wild
@@ -36,9 +38,15 @@ class PODds2Res(object):
                                of DOIResolver.from_config().  If enrich_refs 
                                is True, then it is recommended that 
                                doi_resolver.client_info be set.  
+    :prop jq_poolsize   int:   if set to a positive number, conversions will 
+                               be carried out by a pool of up to this many 
+                               persistent jq processes rather than starting a
+                               new jq process for each record.  
     """
 
-    def __init__(self, jqlibdir, config=None, logger=None, schemadir=None):
+    ENGINES = ("jq", "python")
+
+    def __init__(self, jqlibdir, config=None, logger=None, schemadir=None, engine="jq"):
         """
         create the converter
 
@@ -50,11 +58,22 @@ class PODds2Res(object):
                                messages 
         :param schemadir str:  path to the directory containing the taxonomy
                                definitions
-        """
-        self.jqt = jq.Jq('nerdm::podds2resource', jqlibdir, ["pod2nerdm:nerdm"])
+        :param engine    str:  the conversion engine to use:  "jq" (default) 
+                               runs the conversion via the pod2nerdm jq module;
+                               "python" uses an equivalent native Python 
+                               implementation (see 
+                               :py:mod:`~nistoar.nerdm.convert.pod2nerdm`).
+        """
+        if engine not in self.ENGINES:
+            raise ValueError("PODds2Res: unsupported engine: "+str(engine))
+        self.engine = engine
         if config is None:
             config = {}
         self.cfg = config
+        self.jqt = None
+        if self.engine == "jq":
+            self.jqt = jq.Jq('nerdm::podds2resource_for($id)', jqlibdir, ["pod2nerdm:nerdm"],
+                             poolsize=self.cfg.get('jq_poolsize'))
         self._log = logger
         self._doires = DOIResolver.from_config(self.cfg.get('doi_resolver', {}))
 
@@ -66,13 +85,19 @@ class PODds2Res(object):
                 if not os.path.exists(schemadir):
                     schemadir = os.path.join(jqlibdir, "..", "..", "etc", "schemas")
         if os.path.exists(schemadir):
-            self.taxon = ResearchTopicsTaxonomy.from_schema_dir(schemadir)
+            self.taxon = get_taxonomy(schemadir)
         elif self._log:
             self._log.warning("PODds2Res: taxonomy definition data not available")
             if schemadir:
                 self._log.warning("PODds2Res: schema directory not found: %s",
                                   schemadir)
 
+    def _pyconvert(self, podds, id):
+        try:
+            return pod2nerdm.podds2resource(podds, id)
+        except (ValueError, TypeError, KeyError, AttributeError) as ex:
+            raise RuntimeError("Failed to convert POD record: "+str(ex))
+
     def convert(self, podds, id):
         """
         convert JSON-encoded data to a resource object
@@ -81,7 +106,10 @@ class PODds2Res(object):
                             Dataset record
         :param id str:      The identifier to assign to the output NERDm resource
         """
-        out = self.jqt.transform(podds, {"id": id})
+        if self.engine == "python":
+            out = self._pyconvert(jq.jsonDecoder.decode(podds), id)
+        else:
+            out = self.jqt.transform(podds, {"id": id})
         if 'theme' in out:
             out['topic'] = self.themes2topics(out['theme'])
         if self.should_massage:
@@ -96,13 +124,38 @@ class PODds2Res(object):
                             Dataset record
         :param id str:      The identifier to assign to the output NERDm resource
         """
-        out = self.jqt.transform(json.dumps(podds), {"id": id})
+        if self.engine == "python":
+            out = self._pyconvert(deepcopy(podds), id)
+        else:
+            out = self.jqt.transform_data(podds, {"id": id})
         if 'theme' in out:
             out['topic'] = self.themes2topics(out['theme'])
         if self.should_massage:
             self.massage(out)
         return out
 
+    def convert_data_many(self, poddss, ids):
+        """
+        convert a sequence of parsed POD records to resource objects, returning
+        a generator that yields the converted records in order.  All of the 
+        records are converted via a single jq process.  
+
+        :param poddss iterable:  the parsed POD Dataset records to convert
+        :param ids    iterable:  the identifiers to assign to the output NERDm 
+                                 resources, one for each input record
+        """
+        if self.engine == "python":
+            outs = (self._pyconvert(deepcopy(d), id) for d, id in zip(poddss, ids))
+        else:
+            outs = self.jqt.transform_many((jq.dumps(d) for d in poddss),
+                                           ({"id": id} for id in ids))
+        for out in outs:
+            if 'theme' in out:
+                out['topic'] = self.themes2topics(out['theme'])
+            if self.should_massage:
+                self.massage(out)
+            yield out
+
     def convert_file(self, poddsfile, id):
         """
         convert parsed POD record data to a resource object
@@ -111,7 +164,11 @@ class PODds2Res(object):
                             Dataset record
         :param id str:      The identifier to assign to the output NERDm resource
         """
-        out = self.jqt.transform_file(poddsfile, {"id": id})
+        if self.engine == "python":
+            with open(poddsfile) as fd:
+                out = self._pyconvert(json.load(fd, object_pairs_hook=OrderedDict), id)
+        else:
+            out = self.jqt.transform_file(poddsfile, {"id": id})
         if 'theme' in out:
             out['topic'] = self.themes2topics(out['theme'])
         if self.should_massage:
@@ -285,11 +342,191 @@ def topics2themes(topics, incl_unrec=True):
     return out
 
 
+_ws_re = re.compile(r'[^ \t\n\r]')
+_struct_re = re.compile(r'["{}\[\]]')
+_strspecial_re = re.compile(r'["\\]')
+_scalar_end_re = re.compile(r'[ \t\n\r,}\]]')
+
+class PODCatalogReader(object):
+    """
+    an incremental reader of the Dataset records in a POD catalog document
+    (such as the NIST PDL).  Rather than loading the whole catalog into memory,
+    this reader scans the document a buffer at a time, parsing only the
+    Dataset records it is asked to return; thus, peak memory use depends only
+    on the size of the largest record.
+
+    Syntax errors are reported as ValueErrors.
+    """
+
+    def __init__(self, fd, bufsize=65536):
+        """
+        wrap a catalog document for reading.
+
+        :param fd      file:  a file object open (in text mode) to the catalog
+                              document
+        :param bufsize  int:  the number of characters to read at a time
+        """
+        self._fd = fd
+        self._bufsz = bufsize
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+        #: the number of Dataset records scanned so far (whether returned or
+        #: skipped)
+        self.scanned = 0
+
+    def _more(self):
+        # append more data to the buffer; return False at the end of the file
+        if self._eof:
+            return False
+        data = self._fd.read(self._bufsz)
+        if not data:
+            self._eof = True
+            return False
+        self._buf += data
+        return True
+
+    def _compact(self):
+        # drop the data that has already been consumed
+        if self._pos > self._bufsz:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def _syntax_error(self, msg):
+        return ValueError("POD catalog syntax error: " + msg)
+
+    def _next_char(self):
+        # advance to (but not past) the next non-whitespace character, and
+        # return it (or None at the end of the file)
+        while True:
+            m = _ws_re.search(self._buf, self._pos)
+            if m:
+                self._pos = m.start()
+                return m.group()
+            self._pos = len(self._buf)
+            if not self._more():
+                return None
+
+    def _expect(self, chars):
+        c = self._next_char()
+        if c is None or c not in chars:
+            raise self._syntax_error("expected one of '{0}', found {1}"
+                                     .format(chars, repr(c) if c else "EOF"))
+        self._pos += 1
+        return c
+
+    def _value_end(self):
+        # return the position just past the JSON value starting at the
+        # current position, reading more data as necessary.
+        i = self._pos
+        if i >= len(self._buf):
+            raise self._syntax_error("unexpected end of document")
+        if self._buf[i] not in '{["':
+            while True:
+                m = _scalar_end_re.search(self._buf, i)
+                if m:
+                    return m.start()
+                i = len(self._buf)
+                if not self._more():
+                    return i
+
+        depth = 0
+        instr = False
+        while True:
+            m = (_strspecial_re if instr else _struct_re).search(self._buf, i)
+            if not m or (m.group() == '\\' and m.end() >= len(self._buf)):
+                if not self._more():
+                    raise self._syntax_error("unexpected end of document")
+                continue
+            c = m.group()
+            i = m.end()
+            if instr:
+                if c == '\\':
+                    i += 1
+                    continue
+                instr = False
+            elif c == '"':
+                instr = True
+                continue
+            elif c in '{[':
+                depth += 1
+                continue
+            else:
+                depth -= 1
+            if depth <= 0:
+                return i
+
+    def _skip_value(self):
+        self._pos = self._value_end()
+        self._compact()
+
+    def _read_value(self):
+        end = self._value_end()
+        try:
+            out, i = self._decoder.raw_decode(self._buf[:end], self._pos)
+        except ValueError as ex:
+            raise self._syntax_error(str(ex))
+        self._pos = end
+        self._compact()
+        return out
+
+    def _find_datasets(self):
+        # position the reader just inside the catalog's dataset array
+        self._expect('{')
+        if self._next_char() == '}':
+            raise ValueError("POD catalog document is missing its 'dataset' property")
+        while True:
+            if self._next_char() != '"':
+                raise self._syntax_error("expected property name")
+            key = self._read_value()
+            self._expect(':')
+            if key == 'dataset':
+                self._expect('[')
+                return
+            self._next_char()
+            self._skip_value()
+            if self._expect(',}') == '}':
+                raise ValueError("POD catalog document is missing its 'dataset' property")
+
+    def datasets(self, start=0, count=-1):
+        """
+        iterate through the Dataset records in the catalog.  This can be
+        called only once per reader.
+
+        :param start int:  the number of records to skip over before returning
+                           records; skipped records are scanned but not parsed.
+        :param count int:  the maximum number of records to return; if negative,
+                           all remaining records will be returned.
+        """
+        self._find_datasets()
+        if self._next_char() == ']':
+            return
+        returned = 0
+        while count < 0 or returned < count:
+            if self._next_char() is None:
+                raise self._syntax_error("unexpected end of document")
+            if self.scanned < start:
+                self._skip_value()
+                self.scanned += 1
+            else:
+                ds = self._read_value()
+                self.scanned += 1
+                returned += 1
+                yield ds
+            if self._expect(',]') == ']':
+                return
+
 class Res2PODds(object):
     """
     a class for converting a NERDm Resource object to a POD Dataset object.
 
-    Currently, there are no configuration parameters supported.
+    This converter supports the following optional configuration parameters:
+    :prop jq_poolsize   int:   if set to a positive number, conversions will 
+                               be carried out by a pool of up to this many 
+                               persistent jq processes rather than starting a
+                               new jq process for each record.  
     """
 
     _flavor = {
@@ -304,26 +541,28 @@ class Res2PODds(object):
         :param jqlibdir str:   path to the directory containing the nerdm jq
                                modules
         :param config  dict:   a dictionary with conversion configuration data
-                               in it; currently, no paramters are supported.
+                               in it (see class documentation)
         :param logger Logger:  a logger object that can be used to write warning
                                messages 
         """
-        self.jqt = {
-            "midas": jq.Jq('nerdm::resource2midaspodds', jqlibdir,
-                           ["nerdm2pod:nerdm"])
-        }
         if config is None:
             config = {}
         self.cfg = config
         self._log = logger
+        self._jqlibdir = jqlibdir
+        self.jqt = {
+            "midas": jq.Jq('nerdm::resource2midaspodds', jqlibdir,
+                           ["nerdm2pod:nerdm"], poolsize=self.cfg.get('jq_poolsize'))
+        }
 
     def _jq4flavor(self, flavor):
         if flavor in self.jqt:
             return self.jqt[flavor]
 
-        if flavor in self._flavors:
-            flavor = self._flavors[flavor]
-        self.jqt[flavor] = jq.Jq('nerdm::'+flavor, jqlibdir, ["nerdm2pod:nerdm"])
+        if flavor in self._flavor:
+            flavor = self._flavor[flavor]
+        self.jqt[flavor] = jq.Jq('nerdm::'+flavor, self._jqlibdir, ["nerdm2pod:nerdm"],
+                                 poolsize=self.cfg.get('jq_poolsize'))
         return self.jqt[flavor]
 
     def convert(self, nerdm, flavor="midas"):
@@ -349,7 +588,7 @@ class Res2PODds(object):
                             recognized names include "midas" and "pdr" 
                             (default: "midas")
         """
-        return self.convert(json.dumps(nerdm))
+        return self._jq4flavor(flavor).transform_data(nerdm)
 
     def convert_file(self, nerdmfile, flavor="midas"):
         """
@@ -368,31 +607,64 @@ class Res2PODds(object):
 
 class ComponentCounter(object):
     """
-    a class for calculating inventories using the jq conversion macros
+    a class for calculating inventories using the jq conversion macros or, 
+    alternatively, an equivalent native implementation (see 
+    :py:class:`~nistoar.nerdm.convert.pod2nerdm.ComponentIndex`).
+
+    With the "python" engine, the methods of this class will also accept a 
+    :py:class:`~nistoar.nerdm.convert.pod2nerdm.ComponentIndex` in place of a 
+    components list; this allows several inventories of a large list to be 
+    computed from a single index.
     """
 
-    def __init__(self, jqlibdir):
+    def __init__(self, jqlibdir, poolsize=None, engine="jq"):
         """
         create the counter
 
         :param jqlibdir str:   path to the directory containing the nerdm jq
                                modules
-        """
+        :param poolsize int:   if set to a positive number, run the jq macros 
+                               via a pool of up to this many persistent jq 
+                               processes.
+        :param engine   str:   the engine to use:  "jq" (default) or "python"
+        """
+        if engine not in PODds2Res.ENGINES:
+            raise ValueError("ComponentCounter: unsupported engine: "+str(engine))
+        self.engine = engine
         self._modules = ["pod2nerdm:nerdm"]
         self._jqlibdir = jqlibdir
+        self._poolsize = poolsize
 
-        self._inv_jqt = self._make_jqt('nerdm::inventory_components')
+        if self.engine == "jq":
+            self._inv_jqt = self._make_jqt('nerdm::inventory_components')
+            self._coll_jqt = self._make_jqt('nerdm::inventory_collection($coll)')
+            self._type_jqt = self._make_jqt('nerdm::inventory_by_type($coll)')
                               
     def _make_jqt(self, macro):
-        return jq.Jq(macro, self._jqlibdir, self._modules)
+        return jq.Jq(macro, self._jqlibdir, self._modules, poolsize=self._poolsize)
+
+    def index(self, components):
+        """
+        return a ComponentIndex for the given list of components that can be 
+        passed to this counter's methods.
+        """
+        if isinstance(components, pod2nerdm.ComponentIndex):
+            return components
+        return pod2nerdm.ComponentIndex(components)
+
+    def _data(self, components):
+        if isinstance(components, pod2nerdm.ComponentIndex):
+            return components.components
+        return components
 
     def inventory(self, components):
         """
         return an inventory NERDm property value that reflects the make-up of 
         the given array of component data.
         """
-        datastr = json.dumps(components)
-        return self._inv_jqt.transform(datastr)
+        if self.engine == "python":
+            return self.index(components).inventory()
+        return self._inv_jqt.transform_data(self._data(components))
 
     def inventory_collection(self, components, collpath):
         """
@@ -403,10 +675,9 @@ class ComponentCounter(object):
         :param collpath    str:  the filepath for the desired subcollection to 
                                  inventory
         """
-        macro = 'nerdm::inventory_collection("{0}")'.format(collpath)
-        jqt = self._make_jqt(macro)
-        datastr = json.dumps(components)
-        return jqt.transform(datastr)
+        if self.engine == "python":
+            return self.index(components).inventory_collection(collpath)
+        return self._coll_jqt.transform_data(self._data(components), {"coll": collpath})
 
     def inventory_by_type(self, components, collpath):
         """
@@ -417,38 +688,55 @@ class ComponentCounter(object):
         :param collpath    str:  the filepath for the desired subcollection to 
                                  inventory
         """
-        macro = 'nerdm::inventory_by_type("{0}")'.format(collpath)
-        jqt = self._make_jqt(macro)
-        datastr = json.dumps(components)
-        return jqt.transform(datastr)
+        if self.engine == "python":
+            return self.index(components).inventory_by_type(collpath)
+        return self._type_jqt.transform_data(self._data(components), {"coll": collpath})
 
 class HierarchyBuilder(object):
     """
-    a class for calculating data hierarchies using the jq conversion macros
+    a class for calculating data hierarchies using the jq conversion macros or, 
+    alternatively, an equivalent native implementation (see 
+    :py:class:`~nistoar.nerdm.convert.pod2nerdm.ComponentIndex`).
     """
 
-    def __init__(self, jqlibdir):
+    def __init__(self, jqlibdir, poolsize=None, engine="jq"):
         """
         create the builder.
 
         :param jqlibdir str:   path to the directory containing the nerdm jq
                                modules
-        """
+        :param poolsize int:   if set to a positive number, run the jq macros 
+                               via a pool of up to this many persistent jq 
+                               processes.
+        :param engine   str:   the engine to use:  "jq" (default) or "python"
+        """
+        if engine not in PODds2Res.ENGINES:
+            raise ValueError("HierarchyBuilder: unsupported engine: "+str(engine))
+        self.engine = engine
         self._modules = ["pod2nerdm:nerdm"]
         self._jqlibdir = jqlibdir
+        self._poolsize = poolsize
 
-        self._hier_jqt = self._make_jqt('nerdm::hierarchy("")')
+        if self.engine == "jq":
+            self._hier_jqt = self._make_jqt('nerdm::hierarchy("")')
                               
     def _make_jqt(self, macro):
-        return jq.Jq(macro, self._jqlibdir, self._modules)
+        return jq.Jq(macro, self._jqlibdir, self._modules, poolsize=self._poolsize)
 
     def build_hierarchy(self, components):
         """
         return an array representing the data hierarchy for a given set of 
         components.
 
-        This is implemented via the appropriate jq translation macros.  
-        """
-        datastr = json.dumps(components)
-        return self._hier_jqt.transform(datastr)
+        This is implemented via the appropriate jq translation macros (or a 
+        :py:class:`~nistoar.nerdm.convert.pod2nerdm.ComponentIndex` with the 
+        "python" engine).  
+        """
+        if isinstance(components, pod2nerdm.ComponentIndex):
+            if self.engine == "python":
+                return components.hierarchy()
+            components = components.components
+        if self.engine == "python":
+            return pod2nerdm.ComponentIndex(components).hierarchy()
+        return self._hier_jqt.transform_data(components)
 
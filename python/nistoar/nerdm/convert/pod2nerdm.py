@@ -0,0 +1,728 @@
+"""
+a native Python implementation of the POD-to-NERDm conversion provided by the
+``pod2nerdm.jq`` jq library.
+
+The functions in this module mirror the jq macros of the same name, producing
+the same output (including the order of the properties) without the cost of
+running the jq executable.  See :py:class:`~nistoar.nerdm.convert.pod.PODds2Res`
+(with ``engine="python"``) for the primary interface to this conversion.
+
+Note that, as with the jq library, a property value is considered "set" if it
+is not None (null) or False; in particular, empty strings and arrays count as
+set.
+"""
+import re
+from collections import OrderedDict
+
+__all__ = [ 'podds2resource', 'dist2comp', 'filepath', 'component_id',
+            'insert_subcoll_comps', 'inventory_components', 'inventory_collection',
+            'inventory_by_type', 'hierarchy', 'ComponentIndex' ]
+
+NERDM_SCHEMA = "https://data.nist.gov/od/dm/nerdm-schema/v0.7#"
+NERDM_PUB_SCHEMA = "https://data.nist.gov/od/dm/nerdm-schema/pub/v0.7#"
+NERDM_BIB_SCHEMA = "https://data.nist.gov/od/dm/nerdm-schema/bib/v0.7#"
+NERDM_CONTEXT = "https://data.nist.gov/od/dm/nerdm-pub-context.jsonld"
+DCITE_REF_TYPE = NERDM_BIB_SCHEMA + "/definitions/DCiteReference"
+PDR_LANDING_PAGE_BASE_URL = "https://data.nist.gov/od/id/"
+
+def _isset(val):
+    # jq's notion of truthiness
+    return val is not None and val is not False
+
+def _contains(a, b):
+    # jq's contains(): substring match for strings, recursive for containers
+    if isinstance(a, dict) and isinstance(b, dict):
+        return all(k in a and _contains(a[k], v) for k, v in b.items())
+    if isinstance(a, list) and isinstance(b, list):
+        return all(any(_contains(ae, be) for ae in a) for be in b)
+    if isinstance(a, str) and isinstance(b, str):
+        return b in a
+    if type(a) != type(b) and not (_isnum(a) and _isnum(b)):
+        raise ValueError("{0} and {1} cannot have their containment checked"
+                         .format(_jqtype(a), _jqtype(b)))
+    return a == b
+
+def _isnum(v):
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+def _jqtype(v):
+    if v is None:
+        return "null"
+    if isinstance(v, bool):
+        return "boolean"
+    if _isnum(v):
+        return "number"
+    if isinstance(v, str):
+        return "string"
+    if isinstance(v, list):
+        return "array"
+    return "object"
+
+def _sortkey(v):
+    # jq's ordering of values (as used by unique):
+    #   null < false < true < numbers < strings < arrays < objects
+    if v is None:
+        return (0,)
+    if isinstance(v, bool):
+        return (1, v)
+    if _isnum(v):
+        return (2, v)
+    if isinstance(v, str):
+        return (3, v)
+    if isinstance(v, list):
+        return (4, [_sortkey(e) for e in v])
+    return (5, sorted((k, _sortkey(e)) for k, e in v.items()))
+
+def _unique(vals):
+    out = []
+    for v in sorted(vals, key=_sortkey):
+        if not out or out[-1] != v:
+            out.append(v)
+    return out
+
+_urlpath_re = re.compile(r"^\w+:(//\w+\.\w+(\.\w+)*(:\d+)?)?")
+_ltrim_re = re.compile(r"^\s+")
+_rtrim_re = re.compile(r"\s+$")
+_doiurl_re = re.compile(r"https?://.*doi.org/(doi:)?")
+_isSRD_re = re.compile(r" - SRD \d")
+_ediid_ark_re = re.compile(r"ark:/\d+/")
+_ediid_arkpfx_re = re.compile(r"^ark:/\d+/")
+_ext_test_re = re.compile(r"\w\.")
+
+def urlpath(url):
+    """
+    extract the path component from a URI
+    """
+    return _urlpath_re.sub("", url, 1)
+
+def trimsp(s):
+    """
+    trim whitespace from both ends of a string
+    """
+    return _rtrim_re.sub("", _ltrim_re.sub("", s, 1), 1)
+
+def dirname(path):
+    """
+    given a string that looks like a file path, return the path to the file's
+    parent directory
+    """
+    path = re.sub(r"/$", "", path, 1)
+    if "/" in path:
+        return re.sub(r"/[^/]+$", "", path, 1)
+    return ""
+
+def basename(path):
+    """
+    given a string that looks like a file path, return the unqualified file name.
+    """
+    path = re.sub(r"/$", "", path, 1)
+    if "/" in path:
+        return re.sub(r"^.*/", "", path, 1)
+    return path
+
+def remove_extension(name):
+    """
+    remove the filename extension from the input
+    """
+    if _ext_test_re.search(name):
+        return re.sub(r"\.[^\.]*$", "", name, 1)
+    return name
+
+def extension(name):
+    """
+    return the filename extension from a file name or path or an empty string
+    if none exists
+    """
+    if _ext_test_re.search(name):
+        return re.sub(r"^.*\.", "", name, 1)
+    return ""
+
+def ansc_coll_paths(filepaths):
+    """
+    given a list of filepaths, return a unique (sorted) list of ancestor
+    collection filepaths
+    """
+    out = []
+    for path in filepaths:
+        path = dirname(path)
+        while len(path) > 0:
+            out.append(path)
+            path = dirname(path)
+    return _unique(out)
+
+def shorten_doi(doi):
+    """
+    convert a DOI resolver URL to the "doi:"-prefixed form
+    """
+    if _isset(doi):
+        return _doiurl_re.sub("doi:", doi, 1)
+    return doi
+
+def ediid2localid(ediid):
+    """
+    extract the local identifier from the EDI-ID, dropping the scheme and
+    prefix if it is an ARK identifier.
+    """
+    if _ediid_arkpfx_re.search(ediid):
+        return _ediid_ark_re.sub("", ediid, 1)
+    return ediid
+
+def pdr_landing_page_url(ediid):
+    """
+    return the full URL for PDR-generated landing page, given the EDI-ID
+    """
+    return PDR_LANDING_PAGE_BASE_URL + ediid2localid(ediid)
+
+def _hexval(digits):
+    # mirrors to_i(16) from urldecode.jq, including its handling of non-hex
+    # characters
+    out = 0
+    for c in digits:
+        c = ord(c)
+        if 65 <= c <= 90:
+            c += 32
+        out = out * 16 + ((c - 87) if c > 96 else (c - 48))
+    return out
+
+def url_decode(s):
+    """
+    replace all url-encodings (%XX) in an input string with their unencoded
+    characters.  As with the jq library, each encoded byte is converted to the
+    character with that code point.
+    """
+    if '%' not in s:
+        return s
+    out = []
+    i = 0
+    while i < len(s):
+        if s[i] == '%':
+            out.append(chr(_hexval(s[i+1:i+3])))
+            i += 3
+        else:
+            out.append(s[i])
+            i += 1
+    return "".join(out)
+
+def url_decode_plus(s):
+    """
+    replace url-encodings, including pluses (+), with their corresponding
+    characters.
+    """
+    return url_decode(s.replace("+", " "))
+
+def cvtref(url):
+    """
+    convert a POD reference URL to a NERDm DCiteReference object
+    """
+    return OrderedDict([
+        ("@type", ["deo:BibliographicReference"]),
+        ("@id", "#ref:" + re.sub(r"^/", "", urlpath(url), 1)),
+        ("refType", "IsSupplementTo"),
+        ("location", url),
+        ("_extensionSchemas", [ DCITE_REF_TYPE ])
+    ])
+
+def component_id(comp, prefix):
+    """
+    create a relative identifier for a component based on its metadata
+
+    :param dict comp:   the component node
+    :param str prefix:  a prefix to insert
+    """
+    if _isset(comp.get('filepath')):
+        id = comp['filepath']
+    elif _isset(comp.get('accessURL')):
+        id = re.sub(r"^/doi:", "/", urlpath(comp['accessURL']), 1)
+    elif _isset(comp.get('downloadURL')):
+        id = urlpath(comp['downloadURL'])
+    else:
+        raise ValueError("component has no filepath, accessURL, or downloadURL")
+    return prefix + re.sub(r"^/", "", id, 1)
+
+_fp_patterns = [
+    re.compile(r"https?://s3.amazonaws.com/nist-srd/\w+/"),
+    re.compile(r"https?://s3.amazonaws.com/nist-\w+/\w+/"),
+    re.compile(r"https?://opendata.nist.gov/\w+/")
+]
+_fp_ds_re = re.compile(r"https?://[\w\.:]+/od/ds/")
+
+def filepath(url):
+    """
+    convert a downloadURL into a filepath value.  This will recognize special
+    URL forms corresponding to NIST's S3 buckets and the data distribution
+    service.
+    """
+    for patt in _fp_patterns:
+        if patt.search(url):
+            return url_decode_plus(patt.sub("", url, 1))
+
+    if _fp_ds_re.search(url):
+        out = _fp_ds_re.sub("", url, 1)
+        out = re.sub(r"ark:/\w+/", "", out, 1)
+        out = re.sub(r"^[\w+-]+/", "", out, 1)
+    else:
+        out = re.sub(r".*/", "", url, 1)
+    return url_decode_plus(out)
+
+def _set_format(comp):
+    if _isset(comp.get('format')):
+        comp['format'] = OrderedDict([("description", comp['format'])])
+
+def dist2download(dist):
+    """
+    convert a POD distribution with a downloadURL to a DataFile component
+    """
+    out = OrderedDict(dist)
+    out['filepath'] = filepath(out['downloadURL'])
+    out['@type'] = [ "nrdp:DataFile", "nrdp:DownloadableFile", "dcat:Distribution" ]
+    out['@id'] = component_id(out, "cmps/")
+    out['_extensionSchemas'] = [ NERDM_PUB_SCHEMA + "/definitions/DataFile" ]
+    _set_format(out)
+    return out
+
+def dist2checksum(dist):
+    """
+    convert a POD distribution with a .sha256 downloadURL to a ChecksumFile
+    component
+    """
+    out = OrderedDict(dist)
+    out['filepath'] = filepath(out['downloadURL'])
+    out['@type'] = [ "nrdp:ChecksumFile", "nrdp:DownloadableFile", "dcat:Distribution" ]
+    out['@id'] = component_id(out, "cmps/")
+    out['_extensionSchemas'] = [ NERDM_PUB_SCHEMA + "/definitions/ChecksumFile" ]
+    out['mediaType'] = "text/plain"
+    out['algorithm'] = OrderedDict([("@type", "Thing"), ("tag", extension(out['filepath']))])
+    if not _isset(out.get('description')):
+        out['description'] = "SHA-256 checksum value for " + \
+                             remove_extension(basename(out['filepath']))
+    _set_format(out)
+    return out
+
+def dist2hidden(dist):
+    """
+    convert a POD distribution to a Hidden component
+    """
+    out = OrderedDict(dist)
+    pfx = "#doi:" if re.search(r"doi.org", out['accessURL']) else "#hdn:"
+    out['@type'] = [ "nrd:Hidden", "dcat:Distribution" ]
+    out['@id'] = component_id(out, pfx)
+    return out
+
+def dist2inaccess(dist):
+    """
+    convert a POD distribution with neither an accessURL nor a downloadURL to
+    an Inaccessible component
+    """
+    out = OrderedDict(dist)
+    out['@type'] = [ "nrd:Inaccessible", "dcat:Distribution" ]
+    return out
+
+def dist2accesspage(dist):
+    """
+    convert a POD distribution to a generic AccessPage component
+    """
+    out = OrderedDict(dist)
+    out['@type'] = [ "nrdp:AccessPage", "dcat:Distribution" ]
+    out['@id'] = component_id(out, "#")
+    out['_extensionSchemas'] = [ NERDM_PUB_SCHEMA + "/definitions/AccessPage" ]
+    _set_format(out)
+    return out
+
+def dist2comp(dist, doi):
+    """
+    convert a POD distribution to a component of a type appropriate for its
+    content.
+
+    :param dict dist:  the POD Distribution object
+    :param str   doi:  the "doi:"-prefixed form of the DOI assigned to the
+                       resource, used to identify the DOI access distribution
+    """
+    if _isset(dist.get('downloadURL')):
+        if dist['downloadURL'].endswith(".sha256"):
+            return dist2checksum(dist)
+        return dist2download(dist)
+    if _isset(dist.get('accessURL')):
+        if shorten_doi(dist['accessURL']) == doi:
+            return dist2hidden(dist)
+        return dist2accesspage(dist)
+    return dist2inaccess(dist)
+
+def _within_prefix(within):
+    return within + "/" if within else ""
+
+def select_comp_within(comps, within):
+    """
+    select the components that appear (deeply) below a subcollection in a
+    hierarchy, based on their filepaths
+    """
+    pfx = _within_prefix(within)
+    if not pfx:
+        return list(comps)
+    return [c for c in comps if _isset(c.get('filepath')) and c['filepath'].startswith(pfx)]
+
+def select_comp_children(comps, within):
+    """
+    select the direct children of a particular subcollection in a hierarchy
+    """
+    childre = re.compile("^" + _within_prefix(within) + "[^/]+/?$")
+    return [c for c in comps if (childre.search(c['filepath']) if _isset(c.get('filepath'))
+                                 else not within)]
+
+def select_obj_type(objs, type):
+    """
+    select the objects whose @type matches the given type
+    """
+    return [o for o in objs if _contains(o.get('@type'), [type])]
+
+def obj_types(objs):
+    """
+    return a unique list of the @type values from all objects in an array
+    """
+    out = []
+    for o in objs:
+        t = o.get('@type')
+        if isinstance(t, list):
+            out.extend(t)
+        else:
+            out.append(t)
+    return _unique(out)
+
+def create_subcoll_for(path):
+    """
+    create a default Subcollection component for a given filepath
+    """
+    return OrderedDict([
+        ("@id", "cmps/" + path),
+        ("@type", [ "nrdp:Subcollection" ]),
+        ("filepath", path),
+        ("_extensionSchemas", [ NERDM_PUB_SCHEMA + "/definitions/Subcollection" ])
+    ])
+
+def insert_subcoll_comps(comps):
+    """
+    create Subcollection components for the filepaths found in a given list of
+    components and insert them into the beginning of that list.
+    """
+    subcolls = [c['filepath'] for c in select_obj_type(comps, "nrdp:Subcollection")
+                              if _isset(c.get('filepath'))]
+    paths = [c['filepath'] for c in comps if _isset(c.get('filepath'))]
+    return [create_subcoll_for(p) for p in ansc_coll_paths(paths) if p not in subcolls] + \
+           list(comps)
+
+def inventory_by_type(comps, within=""):
+    """
+    create a list of TypeInventories summarizing the given list of components
+    within a subcollection
+    """
+    comps = select_comp_within(comps, within)
+    children = select_comp_children(comps, within)
+    return [ OrderedDict([("forType", t),
+                          ("childCount", len(select_obj_type(children, t))),
+                          ("descCount", len(select_obj_type(comps, t)))])
+             for t in obj_types(comps) ]
+
+def inventory_collection(comps, within):
+    """
+    create a NERDm inventory object for a subcollection of the given components
+    """
+    bytype = inventory_by_type(comps, within)
+    comps = select_comp_within(comps, within)
+    children = select_comp_children(comps, within)
+    return OrderedDict([
+        ("forCollection", within),
+        ("childCount", len(children)),
+        ("descCount", len(comps)),
+        ("byType", bytype),
+        ("childCollections", [c.get('filepath') for c in
+                              select_obj_type(children, "nrdp:Subcollection")])
+    ])
+
+def inventory_components(comps):
+    """
+    return a NERDm inventory property value that reflects the make-up of the
+    given list of components
+    """
+    colls = [""] + [c.get('filepath') for c in select_obj_type(comps, "nrdp:Subcollection")]
+    return [inventory_collection(comps, coll) for coll in colls]
+
+def hierarchy(comps, within=""):
+    """
+    create a hierarchy description of the components within a subcollection
+
+    :param list comps:   the components to describe
+    :param str  within:  the filepath of the subcollection of interest; an empty
+                         string refers to the root collection.
+    """
+    desc = [c for c in select_comp_within(comps, within) if _isset(c.get('filepath'))]
+    out = []
+    for child in select_comp_children(desc, within):
+        node = OrderedDict([("filepath", child['filepath'])])
+        ctype = child.get('@type')
+        if _isset(ctype) and _contains(ctype, ["Subcollection"]):
+            node['children'] = hierarchy(desc, child['filepath'])
+        out.append(node)
+    return out
+
+def _parent_path(fp):
+    # return the filepath of the collection that a component with the given
+    # filepath is a direct child of (in the sense of select_comp_children()),
+    # or None if it is not a child of any collection.
+    s = fp[:-1] if fp.endswith("/") else fp
+    i = s.rfind("/")
+    if not s[i+1:] or i == 0:
+        return None
+    return s[:i] if i > 0 else ""
+
+def _has_type(sig, type):
+    # equivalent to _contains(sig, [type]) for a tuple of strings
+    return any(type in t for t in sig)
+
+class _TrieNode(object):
+    __slots__ = ('kids', 'count', 'sigs')
+    def __init__(self):
+        self.kids = {}
+        self.count = 0
+        self.sigs = {}      # @type signature -> number of descendants with it
+
+    def add(self, sig):
+        self.count += 1
+        self.sigs[sig] = self.sigs.get(sig, 0) + 1
+
+class ComponentIndex(object):
+    """
+    an index over a list of components--organized as a trie over their
+    filepaths--that can answer inventory and hierarchy queries for any
+    subcollection without rescanning the list.  The results are the same as
+    those from the corresponding module functions (:py:func:`inventory_components`,
+    :py:func:`inventory_collection`, :py:func:`inventory_by_type`, and
+    :py:func:`hierarchy`), except that filepaths are always matched literally
+    (the jq macros interpret a subcollection's filepath as a regular expression
+    when selecting its children).
+
+    The index reflects the component list at the time the index was created;
+    it must be recreated if the list changes.  If any component has an
+    ``@type`` that is not a list of strings or a ``filepath`` that is not a
+    string, queries are passed through to the module functions.
+    """
+
+    def __init__(self, comps):
+        """
+        index the given list of components
+        """
+        self.components = comps
+        self._root = _TrieNode()
+        self._children = {}        # parent filepath -> list of child components
+        self._indexed = True
+        for comp in comps:
+            if not self._add(comp):
+                self._indexed = False
+                break
+
+    def _add(self, comp):
+        types = comp.get('@type')
+        if not isinstance(types, list) or not all(isinstance(t, str) for t in types):
+            return False
+        sig = tuple(types)
+
+        fp = comp.get('filepath')
+        self._root.add(sig)
+        if not _isset(fp):
+            self._children.setdefault("", []).append(comp)
+            return True
+        if not isinstance(fp, str):
+            return False
+
+        node = self._root
+        for seg in fp.split("/")[:-1]:
+            node = node.kids.setdefault(seg, _TrieNode())
+            node.add(sig)
+        parent = _parent_path(fp)
+        if parent is not None:
+            self._children.setdefault(parent, []).append(comp)
+        return True
+
+    def _node_for(self, within):
+        node = self._root
+        if within:
+            for seg in within.split("/"):
+                node = node.kids.get(seg)
+                if node is None:
+                    return _TrieNode()
+        return node
+
+    def children(self, within=""):
+        """
+        return the components that are direct children of the given subcollection
+        """
+        if not self._indexed:
+            return select_comp_children(select_comp_within(self.components, within), within)
+        return list(self._children.get(within or "", []))
+
+    def inventory_by_type(self, within=""):
+        """
+        create a list of TypeInventories summarizing the components within a
+        subcollection
+        """
+        if not self._indexed:
+            return inventory_by_type(self.components, within)
+        return self._by_type(self._node_for(within), self._children.get(within or "", []))
+
+    def _by_type(self, node, children):
+        childsigs = {}
+        for c in children:
+            sig = tuple(c['@type'])
+            childsigs[sig] = childsigs.get(sig, 0) + 1
+
+        out = []
+        for t in _unique([t for sig in node.sigs for t in sig]):
+            out.append(OrderedDict([
+                ("forType", t),
+                ("childCount", sum(n for s, n in childsigs.items() if _has_type(s, t))),
+                ("descCount", sum(n for s, n in node.sigs.items() if _has_type(s, t)))
+            ]))
+        return out
+
+    def inventory_collection(self, within):
+        """
+        create a NERDm inventory object for a subcollection
+        """
+        if not self._indexed:
+            return inventory_collection(self.components, within)
+        node = self._node_for(within)
+        children = self._children.get(within or "", [])
+        return OrderedDict([
+            ("forCollection", within),
+            ("childCount", len(children)),
+            ("descCount", node.count),
+            ("byType", self._by_type(node, children)),
+            ("childCollections", [c.get('filepath') for c in children
+                                  if _has_type(c['@type'], "nrdp:Subcollection")])
+        ])
+
+    def inventory(self):
+        """
+        return a NERDm inventory property value that reflects the make-up of
+        the indexed components
+        """
+        if not self._indexed:
+            return inventory_components(self.components)
+        colls = [""] + [c.get('filepath') for c in self.components
+                                          if _has_type(c['@type'], "nrdp:Subcollection")]
+        return [self.inventory_collection(coll) for coll in colls]
+
+    def hierarchy(self, within=""):
+        """
+        create a hierarchy description of the components within a subcollection
+
+        :param str  within:  the filepath of the subcollection of interest; an
+                             empty string refers to the root collection.
+        """
+        if not self._indexed:
+            return hierarchy(self.components, within)
+        out = []
+        for child in self._children.get(within or "", []):
+            if not _isset(child.get('filepath')):
+                continue
+            node = OrderedDict([("filepath", child['filepath'])])
+            if _has_type(child['@type'], "Subcollection"):
+                node['children'] = self.hierarchy(child['filepath'])
+            out.append(node)
+        return out
+
+def resource_types(podds):
+    """
+    return the list of NERDm resource types that a POD Dataset matches
+    """
+    title = podds.get('title')
+    if not isinstance(title, str):
+        raise ValueError("POD Dataset title is not a string: " + repr(title))
+    out = [ "nrdp:PublicDataResource", "dcat:Dataset" ]
+    if _isSRD_re.search(title):
+        out.insert(0, "nrd:SRD")
+    return out
+
+def cvtstatus(status):
+    """
+    convert a POD status to a NERDm status
+    """
+    return "removed" if status == "deactivated" else "available"
+
+def podds2resource(podds, id=None):
+    """
+    convert a (parsed) POD Dataset record to a NERDm Resource record.
+
+    The input record is not altered; however, values not transformed by the
+    conversion may be shared between the input and the output.
+
+    :param dict podds:  the POD Dataset record to convert
+    :param str     id:  the identifier to assign to the output resource
+    :raises ValueError:  if the input is not sufficiently POD-compliant to be
+                         converted
+    """
+    description = podds.get('description')
+    if not isinstance(description, str):
+        raise ValueError("POD Dataset description is not a string: " + repr(description))
+
+    out = OrderedDict([
+        ("@context", NERDM_CONTEXT),
+        ("_schema", NERDM_SCHEMA),
+        ("_extensionSchemas", [ NERDM_PUB_SCHEMA + "/definitions/PublicDataResource" ]),
+        ("@type", resource_types(podds)),
+        ("@id", id if _isset(id) else None),
+        ("doi", shorten_doi(podds.get('doi'))),
+        ("title", podds.get('title')),
+        ("contactPoint", podds.get('contactPoint')),
+        ("issued", podds.get('issued')),
+        ("modified", podds.get('modified')),
+        ("status", cvtstatus(podds.get('status'))),
+        ("ediid", podds.get('identifier')),
+        ("landingPage", podds.get('landingPage')),
+        ("description", [d for d in (trimsp(p) for p in description.split("\n\n"))
+                           if len(d) > 0]),
+        ("keyword", podds.get('keyword')),
+        ("theme", podds.get('theme')),
+        ("topic", []),
+        ("references", podds.get('references')),
+        ("accessLevel", podds.get('accessLevel')),
+        ("license", podds.get('license')),
+        ("rights", podds.get('rights')),
+        ("inventory", [OrderedDict([("forCollection", ""), ("childCount", 0),
+                                    ("descCount", 0), ("byType", []),
+                                    ("childCollections", [])])]),
+        ("components", podds.get('distribution')),
+        ("publisher", podds.get('publisher')),
+        ("language", podds.get('language')),
+        ("bureauCode", podds.get('bureauCode')),
+        ("programCode", podds.get('programCode'))
+    ])
+
+    doi = out['doi']
+    if _isset(out['references']):
+        out['references'] = [cvtref(r) for r in out['references']]
+    else:
+        del out['references']
+    if _isset(out['components']):
+        out['components'] = insert_subcoll_comps([dist2comp(d, doi) for d in out['components']])
+    else:
+        del out['components']
+    if not _isset(out['doi']):
+        del out['doi']
+    if not _isset(out['landingPage']):
+        out['landingPage'] = pdr_landing_page_url(out['ediid'])
+    if _isset(out['theme']):
+        out['theme'] = [t.replace("->", ":") for t in out['theme']]
+    else:
+        del out['theme']
+    if not _isset(out['rights']):
+        del out['rights']
+    if not _isset(out['issued']):
+        del out['issued']
+    if 'components' in out:
+        cmpidx = ComponentIndex(out['components'])
+        out['inventory'] = cmpidx.inventory()
+        if any(_isset(c.get('filepath')) for c in out['components']):
+            out['dataHierarchy'] = cmpidx.hierarchy("")
+    if _isset(out['@id']):
+        out['@context'] = [ out['@context'], OrderedDict([("@base", out['@id'])]) ]
+
+    return out
@@ -20,7 +20,7 @@ import re
 from collections import OrderedDict
 from collections.abc import Mapping
 from urllib.parse import urljoin
-from copy import deepcopy
+from copy import copy
 
 from .. import validate
 from .. import utils
@@ -34,6 +34,8 @@ class NERDmForRMM(object):
     """
     _pfxre = re.compile("^[^:]+:")
     _verextre = VERSION_EXTENSION_RE
+    _lpre = re.compile(r'^https?://[^/]+/od/id/(ark:/\d+/)?([^/]+)')
+    _dsre = re.compile(r'^https?://[^/]+/od/ds/(ark:/\d+/)?([^/]+)')
 
     def __init__(self, logger=None, schemadir=None, pubeps={}):
         """
@@ -64,7 +66,7 @@ class NERDmForRMM(object):
 
         self._valid8r = None
         if schemadir:
-            self._valid8r = validate.create_validator(schemadir, "_")
+            self._valid8r = validate.get_validator(schemadir, "_", compiled=True)
 
         self._2latest = NERDm2Latest()
 
@@ -87,6 +89,12 @@ class NERDmForRMM(object):
                           version indicated by the ``version`` property.  If the ``version`` property 
                           is not present, the value of the defval parameter will be used. 
 
+        To keep the cost of converting large records low, the three renditions (and the input record)
+        share all of the nodes that do not differ between them; only the nodes that get rewritten 
+        (e.g. ``@id``, ``landingPage``, the ``releaseHistory``, and component ``downloadURL``s) are 
+        copied.  Thus, the input record should not be edited while the output is in use, and the 
+        output renditions should not be edited in place below their top levels.
+
         :param dict nerdm:   the NERDm resource record to convert
         :param str defver:   the default version to assume if the record does not include a ``version``
                              property
@@ -101,10 +109,13 @@ class NERDmForRMM(object):
         if utils.is_type(nerdm, "ReleaseCollection") or nerdm.get('version', '').endswith(RELHIST_EXTENSION):
             raise ValueError("Input NERDm must not be a ReleaseCollection resource")
 
-        rec = self._2latest.convert(nerdm)
+        rec = self._2latest.convert(nerdm, copy_on_write=True)
         if 'version' not in rec:
             rec['version'] = defver
         if 'releaseHistory' in rec:
+            rec['releaseHistory'] = copy(rec['releaseHistory'])
+            if 'hasRelease' in rec['releaseHistory']:
+                rec['releaseHistory']['hasRelease'] = [copy(r) for r in rec['releaseHistory']['hasRelease']]
             for vref in rec['releaseHistory'].get('hasRelease',[]):
                 vext = to_version_ext(vref['version']) if vref.get('version') else None
                 if not vref.get('@id') or not self._verextre.search(vref['@id']):
@@ -119,7 +130,7 @@ class NERDmForRMM(object):
         
         out = {
             'record': rec,
-            'version': deepcopy(rec)  # deep copy
+            'version': copy(rec)  # shares all but the nodes changed below
         }
 
         # massage the identifiers to match the PDR convention for "latest" and "versioned"
@@ -130,17 +141,23 @@ class NERDmForRMM(object):
         # massage URLs to point to versioned copies
         # tweak the PDR landing page
         if out['version'].get('landingPage'):
-            m = re.match(r'^https?://[^/]+/od/id/(ark:/\d+/)?([^/]+)',
-                         out['version']['landingPage'])
+            m = self._lpre.match(out['version']['landingPage'])
             if m and not out['version']['landingPage'][m.end():].startswith(RELHIST_EXTENSION):
                 out['version']['landingPage'] += to_version_ext(rec['version'])
 
         # tweak PDR download URLs
-        dsre = re.compile(r'^https?://[^/]+/od/ds/(ark:/\d+/)?([^/]+)')
-        for cmp in [c for c in out['version'].get('components', []) if c.get('downloadURL')]:
-            m = dsre.match(cmp['downloadURL'])
-            if m and not cmp['downloadURL'][m.end():].startswith("_v/"):
-                cmp['downloadURL'] = m.group() + "/_v/" + rec['version'] + cmp['downloadURL'][m.end():]
+        if out['version'].get('components'):
+            comps = None
+            for i, cmp in enumerate(out['version']['components']):
+                if not isinstance(cmp, Mapping) or not cmp.get('downloadURL'):
+                    continue
+                m = self._dsre.match(cmp['downloadURL'])
+                if m and not cmp['downloadURL'][m.end():].startswith("_v/"):
+                    if comps is None:
+                        comps = out['version']['components'] = list(out['version']['components'])
+                    comps[i] = copy(cmp)
+                    comps[i]['downloadURL'] = m.group() + "/_v/" + rec['version'] + \
+                                              cmp['downloadURL'][m.end():]
 
         def fromkeys(fromdict, todict, keys):
             for key in keys:
@@ -178,6 +195,8 @@ class NERDmForRMM(object):
         """
         validate each of the objects under the "record", "version", and "releaseSet" are valid.  In 
         particular, this ensures that a NERDm record of the proper type appears under each property.  
+        The parts of the "version" object that are shared with the "record" object (as produced by 
+        to_rmm()) are only validated once.
         :param dict rmmmd:  the RMM-format record, as is returned by to_rmm().  
         :raise ValidationError: if there any of the objects under the three properties are invalid.
         """
@@ -197,7 +216,11 @@ class NERDmForRMM(object):
             if not utils.is_any_type(rmmmd['version'], ["Resource", "PublicDataResource", "DataPublication"]):
                 raise validate.ValidationError("Unexpected @type for 'version': "
                                                +str(rmmmd['version']['@type']))
-            self._valid8r.validate(rmmmd['version'])
+            if 'record' in rmmmd:
+                # the version shares most of its content with the (now validated) record
+                validate.validate_rendition(self._valid8r, rmmmd['version'], rmmmd['record'])
+            else:
+                self._valid8r.validate(rmmmd['version'])
         if 'releaseSet' in rmmmd:
             if not isinstance(rmmmd['releaseSet'], Mapping):
                 raise validate.ValidationError("'releaseSet' property does not contain a NERDm record (type: "+
@@ -174,45 +174,65 @@ class ArrayMergeByMultiId(Strategy):
         if not idRef:
             idRef = [ "@id" ]
 
-        def iter_index_key_item(jv):
-            for i, item in enumerate(jv):
-                key = {}
-                for ref in idRef:
-                    try:
-                        key[ref] = walk.resolver.resolve_fragment(item.val, ref)
-                    except jsonschema.RefResolutionError:
-                        pass
-
-                yield i, key, item
+        def get_key(val):
+            key = {}
+            for ref in idRef:
+                try:
+                    key[ref] = walk.resolver.resolve_fragment(val, ref)
+                except jsonschema.RefResolutionError:
+                    pass
+            return key
 
         # ensure that the items in the head array are unique based on
         # the key
-        for i, key_1, item_1 in iter_index_key_item(head):
-            for j, key_2, item_2 in iter_index_key_item(head):
-                if j < i:
-                    if key_1 == key_2:
-                        raise HeadInstanceError("Id was not unique")
-                else:
-                    break
+        headkeys = [get_key(item.val) for item in head]
+        seen = set()
+        for key in headkeys:
+            hkey = _hashable(key)
+            if hkey in seen:
+                raise HeadInstanceError("Id was not unique")
+            seen.add(hkey)
+
+        # index the base items by key; as merged items can change their keys,
+        # an index entry only names candidates that are confirmed against the
+        # current key (basekeys[j]) of the item.
+        basekeys = []
+        index = {}
+        def set_key(j, key):
+            if j == len(basekeys):
+                basekeys.append(key)
+            else:
+                basekeys[j] = key
+            for ik in self.index_keys(key):
+                index.setdefault(ik, []).append(j)
 
-        for i, head_key, head_item in iter_index_key_item(head):
+        for j, item in enumerate(base):
+            set_key(j, get_key(item.val))
+
+        for i, head_item in enumerate(head):
+            head_key = headkeys[i]
 
             if ignoreId and self.keys_match(head_key, ignoreId):
                 continue
 
-            key_count = 0
-            for j, base_key, base_item in iter_index_key_item(base):
+            candidates = set()
+            for ik in self.index_keys(head_key):
+                candidates.update(index.get(ik, []))
 
-                if self.keys_match(base_key, head_key):
+            key_count = 0
+            for j in sorted(candidates):
+                if self.keys_match(basekeys[j], head_key):
                     key_count += 1
                     # If there was a match, we replace with a merged item
-                    base.val[j] = walk.descend(subschema, base_item,
+                    base.val[j] = walk.descend(subschema, base[j],
                                                head_item, meta).val
+                    set_key(j, get_key(base.val[j]))
 
             if key_count == 0:
                 # If there wasn't a match, we append a new object
                 base.val.append(walk.descend(subschema, JSONValue(undef=True),
                                              head_item, meta).val)
+                set_key(len(base.val)-1, get_key(base.val[-1]))
             if key_count > 1:
                 raise BaseInstanceError("Id was not unique")
 
@@ -222,10 +242,19 @@ class ArrayMergeByMultiId(Strategy):
         """
         return True if the two given keys match.  
 
-        A subclass can override this function to have more nuanced comparisons.
+        A subclass can override this function to have more nuanced comparisons;
+        such a subclass must also override index_keys() to be consistent with it.
         """
         return basekey == headkey
 
+    def index_keys(self, key):
+        """
+        return the hashable values that an array item with the given key should
+        be indexed under.  Two keys can only match (according to keys_match())
+        if they have at least one of these values in common.
+        """
+        return [ _hashable(key) ]
+
     def get_schema(self, walk, schema, meta, **kwargs):
         subschema = schema.get('items')
 
@@ -262,6 +291,16 @@ class TopicArray(ArrayMergeByMultiId):
     def _altkey(self, key):
         return { "scheme": key.get("scheme"), "tag": key.get("tag") }
 
+    def index_keys(self, key):
+        # a match requires either equal @ids or equal scheme-tag combinations
+        out = []
+        if "@id" in key:
+            out.append(("@id", _hashable(key["@id"])))
+        altkey = self._altkey(key)
+        if any(v is not None for v in altkey.values()):
+            out.append(("alt", _hashable(altkey)))
+        return out
+
     def keys_match(self, key1, key2):
 
         # if both have @id, use that solely
@@ -347,42 +386,60 @@ class BaseArrayAsDefault(Strategy):
             idRef = "@id"
 
         # ensure that the entries in the base are uniquely identified
-        for i, key_1, item_1 in self.iter_index_key_item(walk, base, idRef):
-            for j, key_2, item_2 in self.iter_index_key_item(walk, base, idRef):
-                if j < i:
-                    if key_1 == key_2:
-                        raise BaseInstanceError("Id '%s' was not unique in base"
-                                                % (key_1,), item_1)
-                else:
-                    break
+        baseitems = list(self.iter_index_key_item(walk, base, idRef))
+        seen = set()
+        for i, key, item in baseitems:
+            hkey = _hashable(key)
+            if hkey in seen:
+                raise BaseInstanceError("Id '%s' was not unique in base"
+                                        % (key,), item)
+            seen.add(hkey)
+
+        # index the head items by key; as merged items can change their keys,
+        # an index entry only names candidates that are confirmed against the
+        # current key of the item (or _NOKEY if it has none).
+        headkeys = []
+        index = {}
+        def set_key(j):
+            try:
+                key = self.get_key(walk, head[j], idRef)
+            except jsonschema.RefResolutionError:
+                key = _NOKEY
+            if j == len(headkeys):
+                headkeys.append(key)
+            else:
+                headkeys[j] = key
+            if key is not _NOKEY:
+                index.setdefault(_hashable(key), []).append(j)
+
+        for j in range(len(head.val)):
+            set_key(j)
 
         # merge base items into head array
-        for i, base_key, base_item in self.iter_index_key_item(walk,base, idRef):
+        for i, base_key, base_item in baseitems:
 
             if base_key == ignoreId:
                 continue
 
-            matching_j = []
-            for j, head_key, head_item in self.iter_index_key_item(walk, head,
-                                                                   idRef):
-                if head_key == base_key:
-                    matching_j.append(j)
-                    matched_item = head_item
+            matching_j = [j for j in sorted(set(index.get(_hashable(base_key), [])))
+                            if headkeys[j] is not _NOKEY and headkeys[j] == base_key]
 
             if len(matching_j) == 1:
                 # If there was exactly one match, we replace it with a merged
                 # item
                 j = matching_j[0]
                 head.val[j] = walk.descend(subschema, base_item,
-                                           matched_item, meta).val
+                                           head[j], meta).val
+                set_key(j)
 
             elif len(matching_j) == 0:
                 # If there wasn't a match, we append the default object
                 head.val.append(base_item.val)
+                set_key(len(head.val)-1)
             else:
                 j = matching_j[1]
                 raise HeadInstanceError("Id '%s' was not unique in head" %
-                                        (head_key,), head[j])
+                                        (base_key,), head[j])
 
         return head
 
@@ -395,6 +452,16 @@ class BaseArrayAsDefault(Strategy):
 
 
 
+def _hashable(key):
+    # return a hashable value that is equal to that of another key if and only
+    # if the keys are equal
+    if isinstance(key, dict):
+        return (dict, frozenset((k, _hashable(v)) for k, v in key.items()))
+    if isinstance(key, list):
+        return (list, tuple(_hashable(v) for v in key))
+    return key
+
+_NOKEY = object()
     
 STRATEGIES = {
     "keepBase": KeepBase(),
@@ -7,12 +7,32 @@ See the use of the deprecated :py:class:`ResearchTopicsTaxonomy` in
 """
 import os, re, json
 from collections import OrderedDict
+from functools import lru_cache
+
+from ..base.cache import FileDependentCache
+
+_taxonomies = FileDependentCache()
+
+def get_taxonomy(schemadir):
+    """
+    return a ResearchTopicsTaxonomy instance for the taxonomy definition found in the given schema
+    directory that is shared across the process.  The instance will be reloaded if the definition
+    file changes.
+    :param str schemadir:  the directory containing the taxonomy data description file 
+                           (``theme-taxonomy.json``)
+    """
+    vocabfile = os.path.join(os.path.abspath(schemadir), "theme-taxonomy.json")
+    return _taxonomies.get(vocabfile, lambda: ResearchTopicsTaxonomy.from_file(vocabfile),
+                           [vocabfile])
 
 class ResearchTopicsTaxonomy(object):
     """
     a container and interface to the NIST research topic taxonomy
     """
 
+    #: the maximum number of theme matches to remember (see match_theme())
+    MATCH_CACHE_SIZE = 2048
+
     def __init__(self, taxjson):
         """
         initialize the instance by wrapping the JSON-encoded taxonomy description
@@ -46,13 +66,30 @@ class ResearchTopicsTaxonomy(object):
     def _mklus(self):
         self.taillu = OrderedDict()
         self.fulllu = OrderedDict()
-        for termdef in self.data['vocab']:
+
+        # for near matches:  for both the 'term' and 'fullterm' forms, the
+        # values with the ignored characters removed and an index of the 
+        # (lower-cased) words they contain to the vocab positions of the terms
+        self._normed = { 'term': [], 'fullterm': [] }
+        self._wordidx = { 'term': {}, 'fullterm': {} }
+
+        for i, termdef in enumerate(self.data['vocab']):
             termdef['fullterm'] = self.TaxonomyTerm.make_full_term(termdef)
             self.taillu[termdef['term']] = termdef
             self.fulllu[termdef['fullterm']] = termdef
 
+            for prop in self._normed:
+                normed = self._ignore_chars.sub(' ', termdef[prop])
+                self._normed[prop].append(normed)
+                for word in self._word_re.findall(normed):
+                    self._wordidx[prop].setdefault(word.lower(), set()).add(i)
+
+        self._cached_match = lru_cache(self.MATCH_CACHE_SIZE)(self._match_theme)
+
     _match_ignore = "& / and or".split()
     _ignore_chars = re.compile(r"[()/:]")
+    _word_re = re.compile(r"\w+")
+    _plainword_re = re.compile(r"^\w+$")
     
     def match_theme(self, theme, latest=True):
         """
@@ -61,9 +98,37 @@ class ResearchTopicsTaxonomy(object):
         capitalization, extra words, missing parent terms--to be converted
         to exact taxonomy terms.  It can also convert deprecated terms to 
         their latest counterparts.  
+
+        Near matches are found with the help of a word index built at 
+        construction, and the results are remembered (for up to 
+        MATCH_CACHE_SIZE distinct theme/latest combinations).  
         :param str theme:  the theme value of interest
         :rtype TaxonomyTerm:  the vocabulary terms definition data
         """
+        out = self._cached_match(theme, latest)
+        if out:
+            out = self.TaxonomyTerm(out, self.data)
+        return out
+
+    def _candidates(self, words, matchagainst):
+        # return the vocab positions of the terms that contain all of the given
+        # words; a term can only match a word pattern (\bword\b) if the word
+        # appears as a whole word in the term.  (Words that are not simple 
+        # words are left to the regular expression match.)
+        cands = None
+        idx = self._wordidx[matchagainst]
+        for word in words:
+            if self._plainword_re.match(word):
+                found = idx.get(word.lower(), set())
+                cands = found if cands is None else cands & found
+                if not cands:
+                    return []
+        if cands is None:
+            return range(len(self.data['vocab']))
+        return sorted(cands)
+
+    def _match_theme(self, theme, latest):
+        # match_theme() without the caching; returns the term definition
         out = None
 
         # try an exact match
@@ -78,37 +143,34 @@ class ResearchTopicsTaxonomy(object):
                        if w not in self._match_ignore]
 
             # find the theme words in the same order
-            patt = r"\b" + r"\b.*\b".join(words) + r"\b"
+            patt = re.compile(r"\b" + r"\b.*\b".join(words) + r"\b", re.I)
             matchagainst = (':' in theme and 'fullterm') or 'term'
-            matches = [t for t in self.data['vocab']
-                         if re.search(patt,
-                                      self._ignore_chars.sub(' ', t[matchagainst]),
-                                      re.I)]
+            normed = self._normed[matchagainst]
+            matches = [i for i in self._candidates(words, matchagainst)
+                         if patt.search(normed[i])]
 
             # find the best match: pull out the matching words, the match 
             # with the least left is considered the best match    
+            wordpats = [re.compile(r'\b'+word+r'\b', re.I) for word in words]
             min = 20
             best = -1
             for i,m in enumerate(matches):
-                stripped = self._ignore_chars.sub(' ', m[matchagainst]).strip()
-                for word in words:
-                    stripped = re.sub(r'\b'+word+r'\b', '', stripped, flags=re.I)\
-                                 .strip()
+                stripped = normed[m].strip()
+                for wordpat in wordpats:
+                    stripped = wordpat.sub('', stripped).strip()
                 stripped = stripped.split() # to look at the number of words
                 if len(stripped) < min:
                     min = len(stripped)
                     best = i
 
             if best >= 0:
-                out = matches[best]
+                out = self.data['vocab'][matches[best]]
 
         if out and latest and 'deprecatedBy' in out and \
            out['deprecatedBy'] in self.fulllu:
             # replace deprecated term with latest
             out = self.fulllu[out['deprecatedBy']]
 
-        if out:
-            out = self.TaxonomyTerm(out, self.data)
         return out
 
     def themes2topics(self, themes, latest=True, incl_unrec=True):
@@ -1,12 +1,27 @@
 """
 tools for validating NERDm metadata
 """
-from collections import OrderedDict
+import os, json, threading
+from copy import copy
+from collections import OrderedDict, deque
 from collections.abc import Mapping
+from urllib.parse import urldefrag
+from concurrent.futures import ProcessPoolExecutor
 
 import ejsonschema as ejs
 from ejsonschema import ValidationError, RefResolutionError
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+from ..base.cache import FileDependentCache
+
+_validators = FileDependentCache()
+
+JSON_SCHEMA_DRAFT4_URI = "http://json-schema.org/draft-04/schema#"
+
 def get_mdval_flavor(data):
     """
     return the prefix used to identify meta-properties used for validation 
@@ -32,10 +47,210 @@ def validate(nerdm, schemadir, typeuri=None, strict=True):
                              provided in nerdm.  If not provided, the _schema
                              property will be used.  
     """
-    valid8r = create_validator(schemadir, nerdm)
+    valid8r = get_validator(schemadir, nerdm, compiled=True)
     return valid8r.validate(nerdm, schemauri=typeuri, strict=strict,
                             raiseex=False)
 
+def validate_update(valid8r, record, prev, schemauri=None, strict=False, raiseex=True):
+    """
+    validate a NERDm Resource record that is an update of a previously validated record, checking 
+    only what has changed.  The components of the two records are compared (matching them by their 
+    ``@id``), and the record is checked with only its new or changed components included; each of 
+    those is validated against the core Component definition and its own extension schemas.  The 
+    unchanged components are only checked for uniqueness within the components array.  If the two 
+    records use different schemas, or if a problem is found, the whole record is validated (the 
+    latter in order to report the complete list of errors).
+
+    This gives the same verdict as validating the entire record, given that the NERDm schemas 
+    constrain the components array only through its items and its uniqueness requirement.
+
+    :param valid8r:  the validator to use (e.g. as returned by get_validator())
+    :param Mapping record:  the NERDm record to validate
+    :param Mapping prev:    the previous NERDm record; this must have already been found valid 
+                            against the same schema (and with the same strictness)
+    :param str schemauri:  the URI of the schema to validate against; if not given, the
+                           record's schema metaproperty is used.
+    :param bool strict:    if True, fail if an extension schema cannot be found
+    :param bool raiseex:   if True, raise an exception if the record is invalid; otherwise,
+                           return the list of errors.
+    """
+    probe = _changed_components_probe(record, prev, valid8r._epfx)
+    if probe is not None and \
+       not valid8r.validate(probe[0], schemauri=schemauri, strict=strict, raiseex=False) and \
+       _components_unique(probe[0]['components'], probe[1]):
+        return []
+    return valid8r.validate(record, schemauri=schemauri, strict=strict, raiseex=raiseex)
+
+def validate_rendition(valid8r, rendition, base, schemauri=None, strict=False, raiseex=True):
+    """
+    validate a NERDm Resource record that is a rendition of another, already validated record and
+    that shares with it (i.e. refers to the very same objects) the component descriptions that are
+    the same in both, as is the case for the parts produced by NERDmForRMM.to_rmm().  This is 
+    validate_update() applied to the two renditions; the shared components are recognized as 
+    unchanged without being compared.  See validate_update() for the parameters.
+    """
+    return validate_update(valid8r, rendition, base, schemauri, strict, raiseex)
+
+def _changed_components_probe(record, prev, epfx):
+    # return a shallow copy of record that only includes the components that are not found in 
+    # prev, along with the list of the unchanged ones, or None if the records are not suitable for
+    # a partial validation
+    if not isinstance(record, Mapping) or not isinstance(prev, Mapping):
+        return None
+    comps = record.get('components')
+    if not isinstance(comps, list) or not isinstance(prev.get('components'), list):
+        return None
+    for prop in (epfx+"schema", epfx+"extensionSchemas"):
+        if record.get(prop) != prev.get(prop):
+            return None
+
+    byid = {}
+    for c in prev['components']:
+        byid.setdefault(_compkey(c), []).append(c)
+    changed = []
+    unchanged = []
+    for c in comps:
+        match = next((p for p in byid.get(_compkey(c), []) if c is p or _json_equal(c, p)), None)
+        if match is None:
+            changed.append(c)
+        else:
+            unchanged.append((c, match))
+
+    probe = copy(record)
+    probe['components'] = changed
+    return probe, unchanged
+
+def _compkey(comp):
+    # equal components necessarily have the same key
+    k = isinstance(comp, Mapping) and comp.get('@id')
+    return k if isinstance(k, str) else None
+
+def _json_equal(a, b):
+    # return True if the two JSON values are the same, comparing types strictly:  unlike with ==,
+    # True, 1, and 1.0 are all different.
+    if isinstance(a, Mapping):
+        return isinstance(b, Mapping) and len(a) == len(b) and \
+               all(k in b and _json_equal(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(map(_json_equal, a, b))
+    return type(a) is type(b) and a == b
+
+def _components_unique(changed, unchanged):
+    # return True if the changed and the unchanged components are all distinct, given that the 
+    # changed ones are distinct from each other.  unchanged is a list of (component, previous 
+    # component) pairs where each is the same as (per _json_equal()) the previous one; as the 
+    # previous components are distinct from each other, so are the unchanged ones unless two 
+    # match the same previous one.
+    if len(set(id(p) for c, p in unchanged)) < len(unchanged):
+        return False
+
+    # Validators differ on whether, say, 1 and True are distinct items, so components that are 
+    # the same under either comparison are reported as not distinct; this only means that the 
+    # whole record gets validated to settle it.
+    byid = {}
+    for c, p in unchanged:
+        byid.setdefault(_compkey(c), []).append(c)
+    return not any(_json_equal(c, u) or c == u
+                   for c in changed for u in byid.get(_compkey(c), []))
+
+def validate_many(items, schemadir, workers=None, typeuri=None, strict=True, batch_size=20):
+    """
+    validate a set of NERDm records, yielding the results in the order the records are given.  
+    With workers > 1, the records are validated by a pool of processes, each holding its own 
+    (compiled) validators for the life of the pool.
+
+    Each item can be a NERDm record (a dict), the path to a file containing one, or an (id, item)
+    pair that sets the identifier reported with the result.  By default, a file record is 
+    identified by its path, and any other record by its ``@id`` (or, failing that, its position in 
+    the input).  
+
+    :param items:          an iterable of the NERDm records to validate
+    :param str schemadir:  the directory where the NERDm schemas are cached
+    :param int workers:    the number of processes to validate with; if None or less than 2, 
+                           validation is done in the current process.
+    :param str typeuri:    the URI of the schema to validate each record against; if not provided,
+                           each record's _schema property will be used.  
+    :param bool strict:    if True, fail records that use an extension schema that cannot be found
+    :param int batch_size: the number of records to hand to a worker at a time
+    :return:  a generator yielding an (id, errors) pair for each record, where errors is a list of
+              dictionaries (as returned by error_to_dict()); the list is empty if the record is 
+              valid.
+    """
+    schemadir = os.path.abspath(schemadir)
+
+    def batches():
+        batch = []
+        for i, item in enumerate(items):
+            if isinstance(item, tuple):
+                id, item = item
+            elif isinstance(item, str):
+                id = item
+            else:
+                id = (isinstance(item, Mapping) and item.get('@id')) or i
+            batch.append((id, item))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if not workers or workers < 2:
+        settings = (schemadir, typeuri, strict, {})
+        for batch in batches():
+            for res in _validate_batch(batch, settings):
+                yield res
+        return
+
+    pending = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_validate_worker,
+                             initargs=(schemadir, typeuri, strict)) as pool:
+        for batch in batches():
+            pending.append(pool.submit(_validate_batch, batch))
+            if len(pending) >= 2 * workers:
+                for res in pending.popleft().result():
+                    yield res
+        while pending:
+            for res in pending.popleft().result():
+                yield res
+
+def error_to_dict(err):
+    """
+    return a JSON-serializable description of a validation error: a dictionary with a ``message``
+    property and, if the location of the error is known, a ``path`` property giving a JSON pointer
+    to the offending value.
+    """
+    out = OrderedDict([("message", getattr(err, 'message', None) or str(err))])
+    path = getattr(err, 'path', None)
+    if path is not None:
+        out['path'] = "/" + "/".join(str(p) for p in path)
+    return out
+
+# the settings used by validate_many() in the current (worker) process
+_vm_settings = None
+
+def _init_validate_worker(schemadir, typeuri, strict):
+    global _vm_settings
+    _vm_settings = (schemadir, typeuri, strict, {})
+
+def _validate_batch(batch, settings=None):
+    schemadir, typeuri, strict, valid8rs = settings or _vm_settings
+    out = []
+    for id, rec in batch:
+        try:
+            if isinstance(rec, str):
+                with open(rec) as fd:
+                    rec = json.load(fd)
+            pfx = (isinstance(rec, Mapping) and get_mdval_flavor(rec)) or "_"
+            if pfx not in valid8rs:
+                valid8rs[pfx] = get_validator(schemadir, pfx, compiled=True)
+            errs = valid8rs[pfx].validate(rec, schemauri=typeuri, strict=strict, raiseex=False)
+            out.append((id, [error_to_dict(e) for e in errs]))
+        except (IOError, ValueError) as ex:
+            out.append((id, [OrderedDict([("message", "Unable to read record: "+str(ex))])]))
+        except Exception as ex:
+            out.append((id, [OrderedDict([("message", "Unable to validate record: "+str(ex))])]))
+    return out
+
 def create_validator(schemadir, forprefix="_"):
     """
     return a validator instance (ejsonschema.ExtValidator) that can validate
@@ -61,3 +276,146 @@ def create_validator(schemadir, forprefix="_"):
 
     return ejs.ExtValidator.with_schema_dir(schemadir, forprefix)
 
+
+def get_validator(schemadir, forprefix="_", compiled=False):
+    """
+    return a validator instance (ejsonschema.ExtValidator) that can validate NERDm records and 
+    that is shared across the process.  Unlike create_validator(), this will only load the schemas 
+    from the schema directory once (for a given prefix) unless the contents of the directory 
+    change.  
+
+    :param str schemadir:  the directory where the NERDm schemas are cached
+    :param forprefix:      Either a single character ("_" or "$") or a NERDm 
+                           data record used to determine the metaproperty 
+                           convention (see create_validator()).
+    :param bool compiled:  if True, return a CompiledValidator that wraps the shared 
+                           ExtValidator.
+    """
+    if isinstance(forprefix, Mapping):
+        forprefix = get_mdval_flavor(forprefix) or "_"
+    if not isinstance(forprefix, str):
+        raise TypeError("get_validator: forprefix: not a str or dict")
+
+    schemadir = os.path.abspath(schemadir)
+    if compiled:
+        extval = get_validator(schemadir, forprefix)
+        return _validators.get((schemadir, forprefix, "compiled"), 
+                               lambda: CompiledValidator(extval, schemadir), [schemadir])
+    return _validators.get((schemadir, forprefix), 
+                           lambda: create_validator(schemadir, forprefix), [schemadir])
+
+class CompiledValidator(object):
+    """
+    a validator for NERDm records that compiles, via fastjsonschema, each combination of a core 
+    schema and a set of extension schemas into a Python function once and reuses it for all records 
+    with that combination.  A record that passes the compiled checks is valid; otherwise (or if
+    the schemas cannot be compiled or fastjsonschema is not installed), the record is validated 
+    by the wrapped ejsonschema.ExtValidator, which provides the complete list of errors.  
+    """
+
+    def __init__(self, extvalidator, schemadir):
+        """
+        :param ExtValidator extvalidator:  the validator to fall back on
+        :param str schemadir:  the directory containing the schemas to compile
+        """
+        self.fallback = extvalidator
+        self._epfx = extvalidator._epfx
+        self._schemas = None
+        self._schemadir = schemadir
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _load_schemas(self):
+        # index the JSON schemas in the schema directory by their (fragment-less) identifiers
+        schemas = {}
+        for f in sorted(os.listdir(self._schemadir)):
+            if not f.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._schemadir, f)) as fd:
+                    schema = json.load(fd)
+            except (IOError, ValueError):
+                continue
+            if isinstance(schema, Mapping) and "$schema" in schema:
+                id = schema.get("id", schema.get("$id"))
+                if isinstance(id, str):
+                    schemas[urldefrag(id)[0]] = schema
+        return schemas
+
+    def _resolve(self, uri):
+        try:
+            return self._schemas[urldefrag(uri)[0]]
+        except KeyError:
+            raise RefResolutionError("Schema not available locally: "+uri)
+
+    def _compile(self, uris):
+        # return a function that validates an instance against all of the given schemas (or None 
+        # if it cannot be compiled)
+        with self._lock:
+            if uris in self._compiled:
+                return self._compiled[uris]
+            if self._schemas is None:
+                self._schemas = self._load_schemas()
+
+            schema = {
+                "$schema": JSON_SCHEMA_DRAFT4_URI,
+                "allOf": [ {"$ref": u} for u in uris ]
+            }
+            handlers = dict((scheme, self._resolve) for scheme in "http https file urn".split())
+            try:
+                # ejsonschema (via jsonschema) neither checks formats nor sets defaults
+                func = fastjsonschema.compile(schema, handlers=handlers, use_default=False, 
+                                              use_formats=False)
+            except Exception:
+                func = None
+            self._compiled[uris] = func
+            return func
+
+    def _passes(self, instance, schemauri):
+        # return True if the instance is valid according to the compiled schemas; False means
+        # that the instance is possibly invalid.
+        if not fastjsonschema or not isinstance(instance, Mapping):
+            return False
+        if not schemauri:
+            schemauri = instance.get(self._epfx+"schema")
+            if not schemauri:
+                return False
+
+        todo = [(instance, (schemauri,))]
+        while todo:
+            node, uris = todo.pop()
+            if isinstance(node, Mapping):
+                exts = node.get(self._epfx+"extensionSchemas")
+                if exts:
+                    if not isinstance(exts, list) or not all(isinstance(u, str) for u in exts):
+                        return False
+                    uris += tuple(exts)
+                if uris:
+                    func = self._compile(uris)
+                    if not func:
+                        return False
+                    try:
+                        func(node)
+                    except Exception:
+                        return False
+                todo.extend((v, ()) for v in node.values() if isinstance(v, (Mapping, list)))
+            else:
+                todo.extend((v, ()) for v in node if isinstance(v, (Mapping, list)))
+        return True
+
+    def validate(self, instance, minimally=False, strict=False, schemauri=None, raiseex=True):
+        """
+        validate the given instance against its schemas.  See ejsonschema.ExtValidator.validate().
+
+        :param instance:         the JSON data to validate
+        :param bool minimally:   if True, ignore extension schemas
+        :param bool strict:      if True, fail if an extension schema cannot be found
+        :param str schemauri:    the URI of the schema to validate the instance against; if not
+                                 given, the instance's schema metaproperty is used.
+        :param bool raiseex:     if True, raise an exception if the instance is invalid; otherwise,
+                                 return the list of errors.
+        """
+        if not minimally and self._passes(instance, schemauri):
+            return []
+        return self.fallback.validate(instance, minimally=minimally, strict=strict, 
+                                      schemauri=schemauri, raiseex=raiseex)
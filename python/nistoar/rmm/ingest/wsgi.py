@@ -13,6 +13,7 @@ from wsgiref.headers import Headers
 
 from ..mongo.nerdm import (NERDmLoader, LoadLog,
                            RecordIngestError, JSONEncodingError)
+from ..mongo import client as mongoclient
 from nistoar.base.config import ConfigurationException
 
 log = logging.getLogger("RMM").getChild("ingest")
@@ -35,6 +36,10 @@ class RMMRecordIngestApp(object):
     :param str db_authn.rm_config_loc:  the name of a configuration set to retrieve to load authentication 
                            in from.  The values found there (which should include `user` and `pass`) will 
                            be loaded into the `db_authn` configuration.
+    :param dict db_client: options for the (MongoDB) database client that is shared by all requests, 
+                           including `maxPoolSize`, `connectTimeoutMS`, `socketTimeoutMS`, 
+                           `serverSelectionTimeoutMS`, `w`, and `wTimeoutMS`; see 
+                           nistoar.rmm.mongo.client.CLIENT_OPTIONS for the full list.
     :param str auth_key:   the Bearer token that must be presented as client credentials to the service;
                            if an incorrect token is included with service requests, the request will 
                            rejected with a 401 status.  
@@ -100,6 +105,12 @@ class RMMRecordIngestApp(object):
             raise RuntimeError("Schema directory doesn't exists: " +
                                self.schemadir)
 
+        # all loaders will share a pooled client configured with these options
+        try:
+            mongoclient.configure(config.get('db_client'))
+        except ValueError as ex:
+            raise ConfigurationException("Config: "+str(ex))
+
         self._loaders = {}
         self._loaders['nerdm'] = NERDmLoader(self.dburl, self.schemadir, self.metrics_dburl,
                                              onupdate='quiet', log=log)
@@ -0,0 +1,79 @@
+"""
+a shared source of MongoDB clients for the RMM loaders.
+
+A pymongo MongoClient is thread-safe and maintains its own pool of connections, so a process needs
+only one client per database URL.  The functions here hand out a single client per URL (and per
+process), so that all loaders--including those used across requests to the ingest service--reuse
+pooled connections rather than each establishing (and authenticating) their own.
+"""
+import os, threading
+from collections.abc import Mapping
+
+from pymongo import MongoClient
+
+# the MongoClient options that can be set via configuration
+CLIENT_OPTIONS = ( "maxPoolSize", "minPoolSize", "maxIdleTimeMS", "waitQueueTimeoutMS",
+                   "connectTimeoutMS", "socketTimeoutMS", "serverSelectionTimeoutMS",
+                   "w", "wTimeoutMS", "journal", "retryWrites", "retryReads", "appname" )
+
+_defopts = {}
+_clients = {}
+_lock = threading.Lock()
+
+def options_from_config(config):
+    """
+    extract the MongoClient options from a configuration dictionary.  Keys not listed in
+    CLIENT_OPTIONS are ignored.
+    :param dict config:  the configuration (e.g. the `db_client` parameter of the ingest service)
+    :rtype: dict
+    """
+    if not config:
+        return {}
+    if not isinstance(config, Mapping):
+        raise ValueError("MongoDB client configuration is not a dictionary: "+str(config))
+    return dict((k, v) for k, v in config.items() if k in CLIENT_OPTIONS)
+
+def configure(config):
+    """
+    set the default options for the clients subsequently created by get_client().  Clients that
+    have already been created are not affected.
+    :param dict config:  a dictionary of MongoClient options; see CLIENT_OPTIONS for the
+                         supported keys (others are ignored).
+    """
+    global _defopts
+    _defopts = options_from_config(config)
+
+def get_client(dburl, **options):
+    """
+    return the shared MongoClient for the given database URL, creating it if necessary.  The
+    client should not be closed by the caller; use close_all() to close all clients.
+    :param str dburl:  the URL of the MongoDB database, 'mongodb://[USER:PASS@]HOST[:PORT]/DBNAME'
+    :param options:    MongoClient options that override the configured defaults
+    """
+    opts = dict(_defopts)
+    opts.update(options)
+
+    # clients must not be shared across a fork
+    key = (os.getpid(), dburl, tuple(sorted(opts.items())))
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(dburl, **opts)
+
+            # the proper method to use depends on pymongo version
+            if not hasattr(client, 'get_database'):
+                client.get_database = client.get_default_database
+
+            _clients[key] = client
+        return client
+
+def close_all():
+    """
+    close all of the clients created by this process
+    """
+    pid = os.getpid()
+    with _lock:
+        clients = [c for k, c in _clients.items() if k[0] == pid]
+        _clients.clear()
+    for client in clients:
+        client.close()
@@ -9,6 +9,8 @@ into the database.
 """
 import json
 
+from pymongo import IndexModel, ASCENDING
+
 from .loader import (Loader, RecordIngestError, JSONEncodingError,
                      UpdateWarning, LoadLog)
 from .loader import ValidationError, SchemaError, RefResolutionError
@@ -23,6 +25,7 @@ class FieldLoader(Loader):
     a class for validating and loading field documentation into the Mongo 
     database.
     """
+    INDEXES = [ IndexModel([("name", ASCENDING)], unique=True) ]
 
     def __init__(self, dburl, schemadir, onupdate='quiet', log=None,
                  defschema=DEF_SCHEMA):
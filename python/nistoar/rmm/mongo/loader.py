@@ -1,22 +1,39 @@
 """
 common code for validating and loading data into the MongoDB database
 """
-import json, re, warnings
+import json, re, warnings, threading
 from abc import ABCMeta, abstractmethod
-from pymongo import MongoClient
+from collections.abc import Mapping
+from .client import get_client
 
 from ejsonschema import ExtValidator
 from ejsonschema import ValidationError, SchemaError, RefResolutionError
 
+from nistoar.nerdm.validate import get_validator
 from ..exceptions import RMMException, DatabaseStateError
 
 _dburl_re = re.compile(r"^mongodb://(\w+(:\S+)?@)?\w+(\.\w+)*(:\d+)?/\w+$")
 
+# the (dburl, collection) pairs whose indexes have been ensured by this process
+_indexes_ensured = set()
+_indexes_lock = threading.Lock()
+
+def _index_key(key):
+    # return a comparable form of an index's key specification
+    return tuple((k, int(d) if isinstance(d, float) else d) for k, d in key)
+
 class Loader(object, metaclass=ABCMeta):
     """
     an abstract base class for loading data
     """
 
+    # the indexes that should exist on the primary collection to support loading (and searching);
+    # subclasses should override this.
+    INDEXES = []
+
+    # if True, missing indexes will be created the first time this process connects to a collection
+    auto_ensure_indexes = True
+
     def __init__(self, dburl, collname=None, schemadir=None, log=None):
         """
         create the loader.  Validation will always be skipped if a schemadir
@@ -42,10 +59,12 @@ class Loader(object, metaclass=ABCMeta):
         self.log = log
 
         if schemadir:
-            self._val = ExtValidator.with_schema_dir(schemadir, ejsprefix='_')
+            # validators are shared across the process (per schema directory)
+            self._val = get_validator(schemadir, '_', compiled=True)
 
         self._client = None
         self._db = None
+        self._unique_keys = {}
 
     def validate(self, data, schemauri=None, strict=True):
         """
@@ -65,24 +84,101 @@ class Loader(object, metaclass=ABCMeta):
         """
         establish a connection to the database.
         """
-        self._client = MongoClient(self._dburl)
-
-        # the proper method to use depends on pymongo version
-        if not hasattr(self._client, 'get_database'):
-            self._client.get_database = self._client.get_default_database
-
+        # the client (and its connection pool) is shared across the process
+        self._client = get_client(self._dburl)
         self._db = self._client.get_database()
+        self._unique_keys = {}
+        self._ensure_indexes_once()
+
+    def _index_specs(self):
+        # return a list of (dburl, Database, collection name, IndexModel list) tuples describing
+        # the indexes needed by this loader
+        return [(self._dburl, self._db, self.coll, self.INDEXES)]
+
+    def _missing_indexes(self, specs):
+        out = []
+        for dburl, db, coll, indexes in specs:
+            have = set(_index_key(info['key']) for info in db[coll].index_information().values())
+            missing = [ix for ix in indexes if _index_key(ix.document['key'].items()) not in have]
+            out.append((dburl, db, coll, missing))
+        return out
+
+    def missing_indexes(self):
+        """
+        return the names of the indexes needed by this loader that are missing from the database.
+        :return:  a dictionary mapping collection names to lists of the missing index names 
+                  (collections that are not missing any are not included)
+                  :rtype: dict
+        """
+        if not self._client:
+            self.connect()
+        return dict((coll, [ix.document['name'] for ix in missing])
+                    for dburl, db, coll, missing in self._missing_indexes(self._index_specs())
+                    if missing)
+
+    def ensure_indexes(self):
+        """
+        create the indexes needed by this loader that are missing from the database.  
+        This is called automatically the first time a connection is made to a database within 
+        the current process.
+        :return:  a dictionary mapping collection names to lists of the names of the indexes 
+                  that were created (collections without new indexes are not included)
+                  :rtype: dict
+        """
+        if not self._client:
+            self.connect()
+        return self._ensure_indexes(self._index_specs())
+
+    def _ensure_indexes(self, specs):
+        out = {}
+        for dburl, db, coll, missing in self._missing_indexes(specs):
+            if missing:
+                out[coll] = db[coll].create_indexes(missing)
+            with _indexes_lock:
+                _indexes_ensured.add((dburl, coll))
+        return out
+
+    def _ensure_indexes_once(self):
+        # ensure the indexes the first time a loader connects to a collection in this process
+        if not self.auto_ensure_indexes:
+            return
+        with _indexes_lock:
+            specs = [s for s in self._index_specs()
+                       if s[1] is not None and s[3] and (s[0], s[2]) not in _indexes_ensured]
+        if not specs:
+            return
+        try:
+            created = self._ensure_indexes(specs)
+            if created and self.log:
+                self.log.info("Created missing indexes: %s", str(created))
+        except Exception as ex:
+            msg = "Unable to ensure indexes on %s: %s" % \
+                  (", ".join(s[2] for s in specs), str(ex))
+            if self.log:
+                self.log.warning(msg)
+            else:
+                warnings.warn(msg, IndexWarning)
 
     def disconnect(self):
         """
-        close the connection to the database.
+        release the connection to the database.  As the underlying client is shared, its 
+        connections remain pooled for use by other loaders; see client.close_all().
         """
-        if self._client:
-            try:
-                self._client.close()
-            finally:
-                self._client = None
-                self._db = None
+        self._client = None
+        self._db = None
+
+    def _key_is_unique(self, coll, key):
+        # return True if a unique index on the collection guarantees that the key query can 
+        # match at most one record (i.e. one covers some of the properties queried by value).  
+        # The answer is cached for the life of the connection.
+        if any(isinstance(v, Mapping) for v in key.values()):
+            return False     # e.g. a query operator
+        props = frozenset(key.keys())
+        if props not in self._unique_keys:
+            self._unique_keys[props] = any(info.get('unique') and
+                                           all(k in props for k, d in info['key'])
+                                           for info in coll.index_information().values())
+        return self._unique_keys[props]
         
     def load_data(self, data, key=None, onupdate='quiet') -> int:
         """
@@ -95,16 +191,20 @@ class Loader(object, metaclass=ABCMeta):
 
         :param data dict:   the data document to load into the collection
         :param key  dict:   a MongoDB search query that should result in either
-                            one or zero records from the collection and which 
-                            should be run prior to insert.  If one record is
-                            returned, loading the new data would be considered an
-                            update that replaces the previous record; otherwise,
+                            one or zero records from the collection.  If a 
+                            record matches, loading the new data would be 
+                            considered an update that replaces the previous 
+                            record (atomically, via an upsert); otherwise,
                             it is a simple insert.  If key is not provided, 
-                            no uniqueness constraint 
+                            no uniqueness constraint is enforced.  If more 
+                            than one record matches, the collection is 
+                            considered corrupted and nothing is loaded; this 
+                            check is skipped when a unique index on the 
+                            collection already prevents it.
         :param onupdate str or func:  an indication of what to do if the load
                             request appears to be an update.  A str value of 
                             'quiet' (default) will cause the matching record
-                            to be removed before loading the new data.  If 
+                            to be replaced by the new data.  If 
                             set to 'warn', the data will be replace, but a 
                             warning will be issued.  If set to 'fail', an 
                             exception will be raised.  If it is a function, it 
@@ -124,45 +224,41 @@ class Loader(object, metaclass=ABCMeta):
 
             coll = self._db[self.coll]
 
-            if key:
-                count = coll.count_documents(key);
-                if count > 1:
-                    # key should have returned no more than 1 record
-                    raise DatabaseStateError("unique key query returns "
-                                             "multiple records")
-                if count > 0:
+            if not key:
+                coll.insert_one(data)
+                return 1
+
+            if not self._key_is_unique(coll, key) and coll.count_documents(key, limit=2) > 1:
+                # key should have returned no more than 1 record
+                raise DatabaseStateError("unique key query returns multiple records")
+
+            if onupdate == 'fail' or hasattr(onupdate, '__call__'):
+                # we need to know about the previous record before writing
+                prev = coll.find_one(key, None if hasattr(onupdate, '__call__') else {"_id": 1})
+                if prev is not None:
                     # a previous record with matching key exists
                     if onupdate == 'fail':
                         raise RecordIngestError("Existing record with key "
                                                 "value; updates not allowed")
-
-                    doload = True
-                    if hasattr(onupdate, '__call__'):
-                        c = coll.find(key)
-                        try:
-                            doload = onupdate(c[0], key)
-                        finally:
-                            c.close()
-
-                    if doload:
-                        if isinstance(onupdate, str) and onupdate != 'quiet':
-                            msg = "Updating previously loaded record into %s: %s" % \
-                                  (self.coll, str(key))
-                            if self.log:
-                                self.log.warn(msg)
-                            else:
-                                warnings.warn(msg, UpdateWarning)
-
-                        result = coll.delete_one(key)
-                        if result.deleted_count == 0:
-                            raise RecordIngestError("Failed to remove previous "
-                                                   +"record with key="+key)
-                        assert result.deleted_count == 1
-
-                    else:
-                        return 0    
-                    
-            result = coll.insert_one(data)
+                    if not onupdate(prev, key):
+                        return 0
+
+                    # replace exactly the record that was examined
+                    result = coll.replace_one({"_id": prev["_id"]}, data)
+                    if result.matched_count == 0:
+                        raise RecordIngestError("Previous record with key="+str(key)+
+                                                " was removed during update")
+                    return 1
+
+            # replace the previous record (if it exists) in a single atomic operation
+            result = coll.replace_one(key, data, upsert=True)
+            if result.matched_count > 0 and isinstance(onupdate, str) and onupdate != 'quiet':
+                msg = "Updating previously loaded record into %s: %s" % \
+                      (self.coll, str(key))
+                if self.log:
+                    self.log.warn(msg)
+                else:
+                    warnings.warn(msg, UpdateWarning)
             return 1
 
         except RecordIngestError as ex:
@@ -195,10 +291,12 @@ class LoadResult(object):
     """
     a summary of an attempt to load a record
     """
+    __slots__ = ('key', 'errs', 'unchanged')
 
-    def __init__(self, key, errs= None):
+    def __init__(self, key, errs= None, unchanged=False):
         self.key = key
         self.errs = errs
+        self.unchanged = unchanged
 
     @property
     def successful(self):
@@ -212,6 +310,17 @@ class LoadResult(object):
         return "{0}(key={1}, errs={2})".format(nm, str(self.key), str(self.errs))
     
 
+def _hashable(key):
+    # return a hashable form of a result key such that two keys that are equal have equal forms.
+    # Keys are sometimes dictionaries (e.g. MongoDB queries).
+    if isinstance(key, Mapping):
+        return (dict, frozenset((k, _hashable(v)) for k, v in key.items()))
+    if isinstance(key, (list, tuple)):
+        return (type(key), tuple(_hashable(v) for v in key))
+    if isinstance(key, (set, frozenset)):
+        return (frozenset, frozenset(_hashable(v) for v in key))
+    return key
+
 class LoadLog(object):
     """
     a class for keeping track of the results of record loading, including 
@@ -221,6 +330,9 @@ class LoadLog(object):
     def __init__(self, desc=None):
         self.description = desc
         self._results = []
+        self._bykey = {}
+        self._failcount = 0
+        self._unchcount = 0
 
     @property
     def attempt_count(self):
@@ -234,23 +346,35 @@ class LoadLog(object):
         """
         return the number of record loadings attempted (successful or failed)
         """
-        return len([r for r in self._results if not r.successful])
+        return self._failcount
 
     @property
     def success_count(self):
         """
         return the number of record loadings attempted (successful or failed)
         """
-        return len([r for r in self._results if r.successful])
+        return len(self._results) - self._failcount
+
+    @property
+    def unchanged_count(self):
+        """
+        return the number of successful record loadings that were skipped because the record was 
+        already loaded with the same content
+        """
+        return self._unchcount
+
+    def _results_for(self, key):
+        try:
+            return self._bykey.get(_hashable(key), [])
+        except TypeError:
+            # key is not hashable; resort to a scan
+            return [r for r in self._results if r.key == key]
 
     def succeeded(self, key):
         """
         return True if the record with the given key was successfully loaded
         """
-        for r in self._results:
-            if r.key == key and r.successful:
-                return True
-        return False
+        return any(r.successful for r in self._results_for(key))
 
     def failed(self, key):
         """
@@ -258,10 +382,14 @@ class LoadLog(object):
         to load.  Note that it is possible that a key can appear as both failed
         and succeeded if it was attempted more than once.
         """
-        for r in self._results:
-            if r.key == key and not r.successful:
-                return True
-        return False
+        return any(not r.successful for r in self._results_for(key))
+
+    def unchanged(self, key):
+        """
+        return True if the record with the given key was found to be already loaded with the same 
+        content (and so was not reloaded).  
+        """
+        return any(r.unchanged for r in self._results_for(key))
 
     def failures(self, key=None):
         """
@@ -269,21 +397,34 @@ class LoadLog(object):
         key.  
         """
         if key:
-            return [r for r in self._results if r.key == key and
-                                                not r.successful]
+            return [r for r in self._results_for(key) if not r.successful]
         else:
             return [r for r in self._results if not r.successful]
 
-    def add(self, key, errs=None):
+    def _append(self, res):
+        self._results.append(res)
+        if not res.successful:
+            self._failcount += 1
+        elif res.unchanged:
+            self._unchcount += 1
+        try:
+            self._bykey.setdefault(_hashable(res.key), []).append(res)
+        except TypeError:
+            # key is not hashable; it can only be found by scanning
+            pass
+
+    def add(self, key, errs=None, unchanged=False):
         """
         add a new result with a given key.  If errors are provided, the result
-        will be registered as failed.
+        will be registered as failed.  If unchanged is True (and no errors are 
+        given), the result will be registered as successful but as not requiring 
+        a reload as the record was already loaded with the same content.
 
         :return self:
         """
         if errs is not None and not isinstance(errs, list):
             errs = [errs]
-        self._results.append(LoadResult(key, errs))
+        self._append(LoadResult(key, errs, unchanged and not errs))
         return self
 
     def merge(self, otherlog):
@@ -294,7 +435,7 @@ class LoadLog(object):
         """
         if otherlog:
             for res in otherlog._results:
-                self._results.append(res)
+                self._append(res)
         return self
 
 class RecordIngestError(RMMException):
@@ -367,3 +508,9 @@ class UpdateWarning(Warning):
     """
     pass
 
+class IndexWarning(Warning):
+    """
+    a warning indicating that the indexes needed for efficient loading could not be created
+    """
+    pass
+
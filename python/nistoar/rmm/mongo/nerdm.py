@@ -2,17 +2,21 @@
 load NERDm records into the RMM's MongoDB database
 """
 # import pandas as pd
-import json, os, sys, warnings
-from collections import OrderedDict
+import json, os, sys, warnings, threading, hashlib
+from collections import OrderedDict, deque
 from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from .loader import (Loader, RecordIngestError, JSONEncodingError,
                      UpdateWarning, LoadLog)
 from .loader import ValidationError, SchemaError, RefResolutionError
 from nistoar.nerdm import utils
+from nistoar.nerdm.validate import validate_rendition
 from nistoar.nerdm.convert.rmm import NERDmForRMM
 
-from pymongo import MongoClient
+from .client import get_client
+from pymongo import ReplaceOne, UpdateOne, IndexModel, ASCENDING
+from pymongo.errors import BulkWriteError
 
 DEF_BASE_SCHEMA = "https://data.nist.gov/od/dm/nerdm-schema/v0.5#"
 DEF_SCHEMA = DEF_BASE_SCHEMA + "/definitions/Resource"
@@ -21,6 +25,24 @@ LATEST_COLLECTION_NAME="record"
 VERSIONS_COLLECTION_NAME="versions"
 RELEASES_COLLECTION_NAME="releasesets"
 
+DEF_BATCH_SIZE=100
+
+# the property of a versions record that holds the content hash of the record it was loaded from
+CONTENT_HASH_PROP = "_contentHash"
+
+METRICS_INDEXES = {
+    "recordMetrics": [ IndexModel([("ediid", ASCENDING)], unique=True) ],
+    "fileMetrics":   [ IndexModel([("ediid", ASCENDING), ("filepath", ASCENDING)]) ]
+}
+
+def content_hash(rec):
+    """
+    return a hash of the content of the given JSON record.  The hash is independent of the order 
+    of the properties within objects.
+    """
+    data = json.dumps(rec, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
 class _NERDmRenditionLoader(Loader):
     """
     a base class for loading a rendition of a NERDm record into one of the data collections holding 
@@ -100,7 +122,11 @@ class NERDmLoader(_NERDmRenditionLoader):
     a class for validating and loading NERDm records into the Mongo database.
     """
 
+    INDEXES = [ IndexModel([("@id", ASCENDING), ("version", ASCENDING)], unique=True) ]
+
     class LatestLoader(_NERDmRenditionLoader):
+        INDEXES = [ IndexModel([("@id", ASCENDING)], unique=True) ]
+
         def __init__(self, dburl, schemadir, metrics_dburl=None, log=None):
             super(NERDmLoader.LatestLoader, self).__init__(LATEST_COLLECTION_NAME, dburl, schemadir, log)
 
@@ -112,16 +138,22 @@ class NERDmLoader(_NERDmRenditionLoader):
         def connect(self):
             super().connect()
             self.connect_metrics()
+            self._ensure_indexes_once()
+
+        def _index_specs(self):
+            out = super()._index_specs()
+            if self._db_metrics is not None:
+                out.extend(self._metrics_index_specs())
+            return out
+
+        def _metrics_index_specs(self):
+            dburl = self._dburl_metrics or self._dburl
+            return [(dburl, self._db_metrics, coll, METRICS_INDEXES[coll]) for coll in METRICS_INDEXES]
             
         def connect_metrics(self):
             # set up metrics connection, too
             if self._dburl_metrics:
-                self._client_metrics = MongoClient(self._dburl_metrics)
-
-                # the proper method to use depends on pymongo version
-                if not hasattr(self._client_metrics, 'get_database'):
-                    self._client_metrics.get_database = self._client_metrics.get_default_database
-        
+                self._client_metrics = get_client(self._dburl_metrics)
                 self._db_metrics = self._client_metrics.get_database()
             else:
                 self._db_metrics = self._db
@@ -133,38 +165,44 @@ class NERDmLoader(_NERDmRenditionLoader):
             finally:
                 super().disconnect()
 
-        def diconnect_metrics(self):
-            try:
-                if self._client_metrics:
-                    self._client_metrics.close()
-            finally:
-                self._client_metrics = None
-                self._db_metrics = None
+        def disconnect_metrics(self):
+            # the client is shared; just release it
+            self._client_metrics = None
+            self._db_metrics = None
 
             
         def load_data(self, data, key=None, onupdate='quiet'):
             added = super().load_data(data, key, onupdate)
             if added:
-                # initialize the metrics collections as needed
-                try:
-                    init_metrics_for(self._db_metrics, data)
-                except Exception as ex:
-                    msg = "Failure detected while initializing Metric data for %s: %s" % \
-                        (data.get("@id", "unknown record"), str(ex))
-                    if self.log:
-                        self.log.warning(msg)
-                    else:
-                        warnings.warn(msg, UpdateWarning)
+                self.init_metrics(data)
             return added
 
+        def init_metrics(self, data):
+            # initialize the metrics collections as needed
+            self.init_metrics_many([data])
+
+        def init_metrics_many(self, recs):
+            # initialize the metrics collections for many records as needed
+            try:
+                init_metrics_for_many(self._db_metrics, recs)
+            except Exception as ex:
+                msg = "Failure detected while initializing Metric data for %s: %s" % \
+                    (", ".join(r.get("@id", "unknown record") for r in recs), str(ex))
+                if self.log:
+                    self.log.warning(msg)
+                else:
+                    warnings.warn(msg, UpdateWarning)
+
     class ReleaseSetLoader(_NERDmRenditionLoader):
+        INDEXES = [ IndexModel([("@id", ASCENDING)], unique=True) ]
+
         def __init__(self, dburl, schemadir, log=None):
             super(NERDmLoader.ReleaseSetLoader, self).__init__(RELEASES_COLLECTION_NAME, dburl,
                                                                schemadir, log)
 
 
     def __init__(self, dburl, schemadir, metrics_dburl=None, onupdate='quiet',
-                 log=None, defschema=DEF_SCHEMA):
+                 log=None, defschema=DEF_SCHEMA, skip_unchanged=True):
         """
         create the loader.  
 
@@ -185,9 +223,16 @@ class NERDmLoader(_NERDmRenditionLoader):
                               issued via the warnings module.  
         :param defschema str:  the URI for the schema to validated new records 
                                against by default. 
+        :param skip_unchanged bool:  if True (default), a record that was previously loaded from 
+                               identical content (as determined by its content hash) will not be 
+                               validated or loaded again; it will instead be reported as unchanged. 
+                               This is not done when onupdate is 'fail'.
         """
         super(NERDmLoader, self).__init__(VERSIONS_COLLECTION_NAME, dburl, schemadir, log, defschema)
         self.onupdate = onupdate
+        self.skip_unchanged = skip_unchanged
+        self._schemadir = schemadir
+        self._metrics_dburl = metrics_dburl
 
         self.lateloadr = self.LatestLoader(dburl, schemadir, metrics_dburl, log)
         self.relloadr  = self.ReleaseSetLoader(dburl, schemadir, log)
@@ -203,6 +248,15 @@ class NERDmLoader(_NERDmRenditionLoader):
         self.lateloadr.connect_metrics()
         self.relloadr._client = self._client
         self.relloadr._db = self._db
+        self._ensure_indexes_once()
+
+    def _index_specs(self):
+        out = super()._index_specs()
+        for loadr in (self.lateloadr, self.relloadr):
+            out.append((self._dburl, self._db, loadr.coll, loadr.INDEXES))
+        if self.lateloadr._db_metrics is not None:
+            out.extend(self.lateloadr._metrics_index_specs())
+        return out
 
     def disconnect(self):
         """
@@ -239,14 +293,32 @@ class NERDmLoader(_NERDmRenditionLoader):
         """
         if not results:
             results = self._mkloadlog()
+
+        prepared = self._prepare(rec, False, id)
+        if prepared[1] is not None:
+            # skip validating and loading a record that is already loaded
+            if self._is_unchanged(prepared[1], prepared[4]):
+                return results.add(prepared[0], None, unchanged=True)
+            if validate:
+                prepared[3].update(self._validate_parts(prepared[2]))
+
+        return self._load_prepared(prepared, results)
+
+    def _prepare(self, rec, validate=True, id=None):
+        # convert the input into its three parts and (optionally) validate them.  This returns a 
+        # tuple, (id, key, parts, errs, hash): if key is None, the record cannot be loaded and errs 
+        # holds the errors to register under id; otherwise, errs maps each part name to its 
+        # validation errors, and hash is the content hash of the input record.  This does not 
+        # touch the database.
         errs = []
+        hash = content_hash(rec)
 
         # the input is a versioned Resource record; convert it into its three parts for the three
         # collections (record, versions, releaseSets)
         try:
             parts = self.tormm.convert(rec, validate=False)
         except (ValueError, ValidationError) as ex:
-            return results.add(id or json.dumps({'@id': rec.get('@id','?')}), ex)
+            return (id or json.dumps({'@id': rec.get('@id','?')}), None, None, ex, None)
 
         for prop in "record version releaseSet".split():
             if prop not in parts or not isinstance(parts[prop], Mapping):
@@ -256,10 +328,8 @@ class NERDmLoader(_NERDmRenditionLoader):
         if errs:
             if id is None:
                 id = json.dumps({'@id': rec.get('@id','?')})
-            return results.add(id, errs)
+            return (id, None, None, errs, None)
             
-        # now load the versioned record first; if that's successful, we'll load the others
-
         # determine the versions udpate key
         try:
             key = self._get_upd_key(parts['version'])
@@ -267,25 +337,64 @@ class NERDmLoader(_NERDmRenditionLoader):
         except KeyError as ex:
             if id is None:
                 id = json.dumps({'@id': '?'})
-            return results.add(id, RecordIngestError("Data is missing input key value, @id"))
+            return (id, None, None, RecordIngestError("Data is missing input key value, @id"), None)
 
-        if id is None:
-            id = key
-
-        # validate the versions record (if requested)
-        errs = None
+        # validate the parts (if requested)
+        verrs = {}
         if validate:
-            schemauri = parts['version'].get("_schema")
+            verrs = self._validate_parts(parts)
+
+        return (id, key, parts, verrs, hash)
+
+    def _validate_parts(self, parts):
+        # validate the three parts of a record, returning the errors for each.  The record part
+        # shares most of its content with the version part, so that content is only validated once.
+        errs = {}
+        schemauris = {}
+        for prop, loadr in (('version', self), ('record', self.lateloadr),
+                            ('releaseSet', self.relloadr)):
+            schemauri = parts[prop].get("_schema")
             if not schemauri:
-                schemauri = self._schema
+                schemauri = loadr._schema
+            if prop == 'record' and schemauri == schemauris['version']:
+                errs[prop] = validate_rendition(loadr._val, parts[prop], parts['version'],
+                                                schemauri, strict=True, raiseex=False)
+            else:
+                errs[prop] = loadr.validate(parts[prop], schemauri)
+            schemauris[prop] = schemauri
+            if prop == 'version' and errs[prop]:
+                break
+        return errs
+
+    def _checks_unchanged(self):
+        # True if records already loaded with the same content should be skipped.  (When updates 
+        # are not allowed, reloading a record is always an error.)
+        return self.skip_unchanged and self.onupdate != 'fail'
+
+    def _is_unchanged(self, key, hash):
+        # return True if the versions record with the given key was loaded from a record with the
+        # given content hash
+        if not hash or not self._checks_unchanged():
+            return False
+        if not self._client:
+            self.connect()
+        prev = self._db[self.coll].find_one(key, { CONTENT_HASH_PROP: 1, "_id": 0 })
+        return prev is not None and prev.get(CONTENT_HASH_PROP) == hash
+
+    def _load_prepared(self, prepared, results):
+        # load the parts of a record as returned by _prepare()
+        id, key, parts, errs, hash = prepared
+        if key is None:
+            return results.add(id, errs)
 
-            errs = self.validate(parts['version'], schemauri)
-            if errs:
-                return results.add(id, errs)
+        # now load the versioned record first; if that's successful, we'll load the others
+        if errs.get('version'):
+            return results.add(id, errs['version'])
 
         # load the version record
         try:
-            if self.load_data(parts['version'], key, self._get_onupdate(parts['version'])):
+            loaded = self.load_data(parts['version'], key, self._get_onupdate(parts['version']))
+            if loaded:
                 results.add(id, None)
         except Exception as ex:
             errs = [ex]
@@ -294,9 +403,220 @@ class NERDmLoader(_NERDmRenditionLoader):
 
         # now (conditionally) load the other parts.  (These will not get loaded if the version is not
         # new enough)
-        self.lateloadr.load(parts['record'], validate, results, key)
-        self.relloadr.load(parts['releaseSet'], validate, results, key)
+        failures = results.failure_count
+        for prop, loadr in (('record', self.lateloadr), ('releaseSet', self.relloadr)):
+            if errs.get(prop):
+                results.add(key, errs[prop])
+            else:
+                loadr.load(parts[prop], False, results, key)
+
+        # remember the content the record was loaded from only once all of its parts are loaded, 
+        # so that a failed load is not later skipped as unchanged
+        if hash and loaded and results.failure_count == failures:
+            self._set_content_hashes([(key, hash)])
         return results
+
+    def _set_content_hashes(self, keyhashes):
+        # record the content hash on each of the versions records with the given keys
+        if not keyhashes:
+            return
+        try:
+            self._db[self.coll].bulk_write([UpdateOne(key, {"$set": {CONTENT_HASH_PROP: hash}})
+                                            for key, hash in keyhashes], ordered=False)
+        except Exception as ex:
+            # this just means the record will be reloaded next time
+            msg = "Failed to record content hashes in %s: %s" % (self.coll, str(ex))
+            if self.log:
+                self.log.warning(msg)
+            else:
+                warnings.warn(msg, UpdateWarning)
+
+    def load_many(self, recs, validate=True, results=None, batch_size=DEF_BATCH_SIZE, ordered=False):
+        """
+        load a sequence of NERDm resource records into the database in bulk.  The records are 
+        processed in batches: for each batch, the three renditions of each record are computed, the 
+        previously loaded versions are fetched with a single query per collection, and each collection 
+        is written to with a single bulk request.  The update rules are the same as for load(): the 
+        versions collection is updated according to this loader's onupdate policy, and the record and
+        releaseSet collections are only updated if the version being loaded is the same or newer than 
+        the one already loaded.  
+
+        :param recs:            an iterable of NERDm JSON records to load
+        :param bool validate:   False if validation should be skipped before loading; otherwise, 
+                                invalid records will not be loaded.
+        :param LoadLog results: the results object to add loading results to; if not provided, a 
+                                new one will be created.  
+        :param int batch_size:  the maximum number of records to write in a single bulk request
+        :param bool ordered:    if True, writes within a bulk request are applied in order and 
+                                stop at the first failure; otherwise (default), the server may apply 
+                                them in any order and will attempt all of them.
+        :return LoadLog:  the per-record outcomes, registered under the JSON-encoded versions key 
+                          (as with load())
+        """
+        if batch_size < 1:
+            raise ValueError("load_many: batch_size must be a positive integer")
+        if not results:
+            results = self._mkloadlog()
+
+        batch = []
+        for rec in recs:
+            batch.append(rec)
+            if len(batch) >= batch_size:
+                self._load_batch(batch, validate, results, ordered)
+                batch = []
+        if batch:
+            self._load_batch(batch, validate, results, ordered)
+
+        return results
+
+    def _load_batch(self, recs, validate, results, ordered):
+        if not self._client:
+            self.connect()
+
+        # convert the records into their three parts
+        todo = []
+        for rec in recs:
+            prepared = self._prepare(rec, False)
+            if prepared[1] is None:
+                results.add(prepared[0], prepared[3])
+            else:
+                todo.append(prepared)
+
+        if not todo:
+            return
+
+        # load the version records
+        coll = self._db[self.coll]
+        prev = self._fetch_existing(coll, [p[1]['@id'] for p in todo],
+                                    full=hasattr(self.onupdate, '__call__'),
+                                    fields=[CONTENT_HASH_PROP])
+        ops = []
+        loading = []
+        for id, key, parts, errs, hash in todo:
+            old = prev.get(key['@id'])
+            if old is not None:
+                # skip validating and loading a record that is already loaded
+                if self._checks_unchanged() and old.get(CONTENT_HASH_PROP) == hash:
+                    results.add(id, None, unchanged=True)
+                    continue
+
+                if self.onupdate == 'fail':
+                    results.add(id, RecordIngestError("Existing record with key value; "
+                                                      "updates not allowed"))
+                    continue
+                if hasattr(self.onupdate, '__call__'):
+                    try:
+                        if not self.onupdate(old, key):
+                            continue
+                    except Exception as ex:
+                        results.add(id, ex)
+                        continue
+
+            if validate:
+                errs = self._validate_parts(parts)
+                if errs.get('version'):
+                    results.add(id, errs['version'])
+                    continue
+
+            if old is not None and isinstance(self.onupdate, str) and self.onupdate != 'quiet':
+                msg = "Updating previously loaded record into %s: %s" % (self.coll, str(key))
+                if self.log:
+                    self.log.warn(msg)
+                else:
+                    warnings.warn(msg, UpdateWarning)
+
+            # (the content hash is recorded once all of the parts are loaded)
+            prev[key['@id']] = dict(parts['version'], **{CONTENT_HASH_PROP: hash})
+            ops.append(ReplaceOne(key, parts['version'], upsert=True))
+            loading.append((id, key, parts, errs, hash))
+
+        todo = [loading[i] for i in self._bulk_replace(coll, ops, [t[0] for t in loading],
+                                                       results, ordered)]
+
+        # now (conditionally) load the other parts.  (These will not get loaded if the version is not
+        # new enough)
+        failed = set()
+        for loadr, prop in ((self.lateloadr, 'record'), (self.relloadr, 'releaseSet')):
+            coll = self._db[loadr.coll]
+            prev = self._fetch_existing(coll, [t[2][prop].get('@id') for t in todo])
+            ops = []
+            loading = []
+            for i, (id, key, parts, errs, hash) in enumerate(todo):
+                data = parts[prop]
+                try:
+                    upkey = loadr._get_upd_key(data)
+                except KeyError as ex:
+                    results.add(id, RecordIngestError("Data is missing input key value, @id"))
+                    failed.add(i)
+                    continue
+
+                if errs.get(prop):
+                    results.add(id, errs[prop])
+                    failed.add(i)
+                    continue
+
+                old = prev.get(upkey['@id'])
+                if old is not None and \
+                   utils.cmp_versions(data.get('version', '1.0.0'), old.get('version', '1.0.0')) < 0:
+                    continue
+
+                prev[upkey['@id']] = data
+                ops.append(ReplaceOne(upkey, data, upsert=True))
+                loading.append((id, data, i))
+
+            loaded = self._bulk_replace(coll, ops, [t[0] for t in loading], results, ordered)
+            ok = set(loaded)
+            failed.update(t[2] for j, t in enumerate(loading) if j not in ok)
+            if loadr is self.lateloadr and loaded:
+                loadr.init_metrics_many([loading[i][1] for i in loaded])
+
+        # remember the content the records were loaded from only for those whose parts all loaded,
+        # so that a failed load is not later skipped as unchanged
+        self._set_content_hashes([(t[1], t[4]) for i, t in enumerate(todo)
+                                  if i not in failed and t[4]])
+
+    def _fetch_existing(self, coll, ids, full=False, fields=[]):
+        # return the previously loaded records with the given @id values, indexed by @id.  Unless 
+        # full=True, only the version (and the given fields) of each record is retrieved.
+        ids = list(set(id for id in ids if id is not None))
+        if not ids:
+            return {}
+        proj = None
+        if not full:
+            proj = { "@id": 1, "version": 1, "_id": 0 }
+            proj.update((f, 1) for f in fields)
+        return dict((d['@id'], d) for d in coll.find({ "@id": { "$in": ids } }, proj))
+
+    def _bulk_replace(self, coll, ops, ids, results, ordered):
+        # write the given ReplaceOne operations in one bulk request, recording the outcome for each 
+        # in results under the corresponding id; return the indexes of the successful operations
+        if not ops:
+            return []
+
+        failed = {}
+        try:
+            coll.bulk_write(ops, ordered=ordered)
+        except BulkWriteError as ex:
+            for err in ex.details.get('writeErrors', []):
+                failed[err['index']] = RecordIngestError("Failed to load record: "+
+                                                         err.get('errmsg', "unknown error"))
+            if ordered and failed:
+                for i in range(min(failed)+1, len(ops)):
+                    failed[i] = RecordIngestError("Record not loaded due to previous error in batch")
+        except Exception as ex:
+            if self.log:
+                self.log.exception("Unexpected loading error: "+str(ex))
+            for i in range(len(ops)):
+                failed[i] = RecordIngestError("Failed to load record: "+str(ex), ex)
+
+        loaded = []
+        for i, id in enumerate(ids):
+            if i in failed:
+                results.add(id, failed[i])
+            else:
+                results.add(id, None)
+                loaded.append(i)
+        return loaded
     
 
     def load_from_file(self, filepath, validate=True, results=None):
@@ -315,11 +635,40 @@ class NERDmLoader(_NERDmRenditionLoader):
 
         return self.load(data, validate=validate, results=results, id=filepath)
 
-    def load_from_dir(self, dirpath, validate=True, results=None):
+    def load_from_dir(self, dirpath, validate=True, results=None, workers=None, onload=None):
         """
         load all the records found in a directory.  This will attempt to load
         all files in the given directory with the extension, '.json'
+
+        If workers is greater than 1, the files are loaded concurrently:  reading, converting, and 
+        validating the records (which is CPU-bound) is done in a pool of that many processes while 
+        the database writes are done via a pool of that many threads sharing this loader's 
+        connection.  (Versions of the same resource are never written concurrently.)  
+
+        :param str dirpath:     the directory to search for NERDm files
+        :param bool validate:   False if validation should be skipped before loading
+        :param LoadLog results: the results object to add loading results to
+        :param int workers:     the number of worker processes and threads to use; if not greater 
+                                than 1, the files are loaded serially.  
+        :param func onload:     a function that will be called after the parts of each file are 
+                                loaded (only when workers > 1); it is called with three arguments:
+                                the file path, the dict holding the "record", "version", and 
+                                "releaseSet" parts loaded, and a LoadLog containing just the results 
+                                for that file.  
         """
+        if not results:
+            results = self._mkloadlog()
+
+        if workers and workers > 1:
+            return self._load_files_parallel(self._find_files(dirpath), validate, results,
+                                             workers, onload)
+
+        for f in self._find_files(dirpath):
+            results = self.load_from_file(f, validate, results)
+                                                  
+        return results
+
+    def _find_files(self, dirpath):
         for root, dirs, files in os.walk(dirpath):
             # don't look in .directorys
             for i in range(len(dirs)-1, -1, -1):
@@ -329,14 +678,100 @@ class NERDmLoader(_NERDmRenditionLoader):
             for f in files:
                 if f.startswith('.') or not f.endswith('.json'):
                     continue
-                f = os.path.join(root, f) 
-                results = self.load_from_file(f, validate, results)
-                                                  
-        if not results:
-            results = self._mkloadlog()
-            
+                yield os.path.join(root, f) 
+
+    def _load_files_parallel(self, filepaths, validate, results, workers, onload=None):
+        locks = {}
+        lockslock = threading.Lock()
+
+        def write(filepath, prepared, validated):
+            # executed within a thread
+            out = self._mkloadlog()
+            parts = prepared[2]
+            if parts is None:
+                out.add(prepared[0], prepared[3])
+            else:
+                # serialize the loading of versions of the same resource
+                with lockslock:
+                    lock = locks.setdefault(parts['record'].get('@id'), threading.Lock())
+                with lock:
+                    if self._is_unchanged(prepared[1], prepared[4]):
+                        out.add(prepared[0], None, unchanged=True)
+                    else:
+                        if validate and not validated:
+                            # the record was found to be unchanged when it was prepared, but it
+                            # has since been updated
+                            prepared[3].update(self._validate_parts(parts))
+                        self._load_prepared(prepared, out)
+                if onload:
+                    onload(filepath, parts, out)
+            return out
+
+        def harvest(writes, limit):
+            while len(writes) > limit:
+                results.merge(writes.popleft().result())
+
+        with ProcessPoolExecutor(workers, initializer=_init_prep_worker,
+                                 initargs=(self._dburl, self._schemadir, self._metrics_dburl, 
+                                           self._schema)) as procs, \
+             ThreadPoolExecutor(workers) as threads:
+            preps = deque()
+            writes = deque()
+            for f in filepaths:
+                preps.append((f, procs.submit(_prep_file, f, validate)))
+
+                # connect after the worker processes have been started (to avoid forking an open
+                # connection)
+                if not self._client:
+                    self.connect()
+
+                if len(preps) > 2 * workers:
+                    f, fut = preps.popleft()
+                    writes.append(threads.submit(write, f, *_prepared_result(f, fut)))
+                    harvest(writes, 2 * workers)
+
+            while preps:
+                f, fut = preps.popleft()
+                writes.append(threads.submit(write, f, *_prepared_result(f, fut)))
+                harvest(writes, 2 * workers)
+            harvest(writes, 0)
+
         return results
 
+# the loader used by each process of a parallel load
+_prep_loader = None
+
+def _init_prep_worker(dburl, schemadir, metrics_dburl, defschema):
+    global _prep_loader
+    _prep_loader = NERDmLoader(dburl, schemadir, metrics_dburl, defschema=defschema)
+
+def _prep_file(filepath, validate):
+    # executed within a worker process.  This returns the prepared record (see 
+    # NERDmLoader._prepare()) and whether it was validated (if requested); a record that is 
+    # already loaded (with the same content) is not validated.
+    with open(filepath) as fd:
+        try:
+            data = json.load(fd)
+        except ValueError as ex:
+            return (filepath, None, None, JSONEncodingError(ex), None), True
+    prepared = _prep_loader._prepare(data, False, filepath)
+    if not validate or prepared[1] is None:
+        return prepared, True
+    try:
+        if _prep_loader._is_unchanged(prepared[1], prepared[4]):
+            return prepared, False
+    except Exception:
+        pass   # (leave database problems to the writer)
+    prepared[3].update(_prep_loader._validate_parts(prepared[2]))
+    return prepared, True
+
+def _prepared_result(filepath, fut):
+    try:
+        return fut.result()
+    except Exception as ex:
+        return (filepath, None, None, RecordIngestError("Failed to prepare record: "+str(ex), ex),
+                None), True
+
 def init_metrics_for(db_metrics, nerdm):
     """
     initialize the metrics-related collections for dataset described in the given NERDm record
@@ -350,9 +785,22 @@ def init_metrics_for(db_metrics, nerdm):
                          connected to a backend server.
     :param dict  nerdm:  the NERDm record to initialize for.
     """
-    #Convert nderm dict to an array of dict
-    #nerdm_use = [nerdm]
-    
+    init_metrics_for_many(db_metrics, [nerdm])
+
+def init_metrics_for_many(db_metrics, nerdms):
+    """
+    initialize the metrics-related collections for the datasets described in the given NERDm 
+    records as needed.  Existing metrics entries are looked up with one query per metrics 
+    collection, and the missing entries are added with one bulk upsert request per collection.
+
+    This function assumes that the given NERDm records are the latest descriptions of their 
+    datasets.  It should not be called with NERDm records describing earlier versions of a dataset.  
+
+    :param Database db:  the MongoDB Database instance the contains the metrics collections.  
+                         This instance will have come from a MongoDB client that is already 
+                         connected to a backend server.
+    :param list nerdms:  the NERDm records to initialize for.
+    """
     record_collection_fields = { 
                                 "pdrid": None,
                                 "ediid":None, 
@@ -381,34 +829,55 @@ def init_metrics_for(db_metrics, nerdm):
                         "last_time_logged" : None,
                         "downloadURL": None
                         }
-    
-    nerdm['pdrid'] = nerdm.pop('@id')
-    records = {}
-    #Copy fields
-    for field in record_fields:
-        records[field] = nerdm[field]
-        
-     #Initialize record fields
-    for col in record_collection_fields.keys():
-        if col not in records.keys():
-            records[col] = record_collection_fields[col]
-    
-    if db_metrics["recordMetrics"].find_one({"ediid": nerdm["ediid"]}) is None:
-        db_metrics["recordMetrics"].insert_one(records)
-    
-    #Get files from record components
-    files = flatten_records(nerdm, files_collection_fields)
-    files_to_update = []
-    
-    current_files = db_metrics["fileMetrics"].find({"ediid": nerdm["ediid"]})
-    current_files_filepaths = [x["filepath"] for x in current_files]
-    for file_item in files:
-        if 'filepath' in file_item.keys():
-            if file_item['filepath'] not in current_files_filepaths:
-                files_to_update.append(file_item)
-                
-    if len(files_to_update)>0:            
-        db_metrics["fileMetrics"].insert_many(files_to_update)
+
+    recs = []
+    for nerdm in nerdms:
+        # don't alter the caller's record
+        nerdm = dict(nerdm)
+        nerdm['pdrid'] = nerdm.pop('@id')
+        recs.append(nerdm)
+    if not recs:
+        return
+    ediids = list(set(r["ediid"] for r in recs))
+
+    # find the entries that already exist (retrieving only the identifying fields)
+    have_recs = set(d["ediid"] for d in
+                    db_metrics["recordMetrics"].find({"ediid": {"$in": ediids}},
+                                                     {"ediid": 1, "_id": 0}))
+    have_files = set((d.get("ediid"), d.get("filepath")) for d in
+                     db_metrics["fileMetrics"].find({"ediid": {"$in": ediids}},
+                                                    {"ediid": 1, "filepath": 1, "_id": 0}))
+
+    recops = []
+    fileops = []
+    for nerdm in recs:
+        if nerdm["ediid"] not in have_recs:
+            records = {}
+            #Copy fields
+            for field in record_fields:
+                records[field] = nerdm[field]
+
+            #Initialize record fields
+            for col in record_collection_fields.keys():
+                if col not in records.keys():
+                    records[col] = record_collection_fields[col]
+
+            have_recs.add(nerdm["ediid"])
+            recops.append(UpdateOne({"ediid": nerdm["ediid"]}, {"$setOnInsert": records}, upsert=True))
+
+        #Get files from record components
+        for file_item in flatten_records(nerdm, files_collection_fields):
+            if 'filepath' in file_item:
+                fkey = (nerdm["ediid"], file_item['filepath'])
+                if fkey not in have_files:
+                    have_files.add(fkey)
+                    fileops.append(UpdateOne({"ediid": fkey[0], "filepath": fkey[1]},
+                                             {"$setOnInsert": file_item}, upsert=True))
+
+    if recops:
+        db_metrics["recordMetrics"].bulk_write(recops, ordered=False)
+    if fileops:
+        db_metrics["fileMetrics"].bulk_write(fileops, ordered=False)
     
 # This takes a nerdm record and collect the files related data from components.
 # Inputs are record=nerdm to be updated
@@ -3,6 +3,8 @@ load Taxonomy records into the RMM's MongoDB database
 """
 import json, os, sys
 
+from pymongo import IndexModel, ASCENDING
+
 from .loader import (Loader, RecordIngestError, JSONEncodingError,
                      UpdateWarning, LoadLog)
 from .loader import ValidationError, SchemaError, RefResolutionError
@@ -16,6 +18,7 @@ class TaxonomyLoader(Loader):
     """
     a class for validating and loading the SDP taxonomy into the Mongo database.
     """
+    INDEXES = [ IndexModel([("term", ASCENDING), ("parent", ASCENDING)], unique=True) ]
 
     def __init__(self, dburl, schemadir, onupdate='quiet', log=None,
                  defschema=DEF_SCHEMA):
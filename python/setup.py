@@ -65,7 +65,8 @@ setup(name='nistoar',
       scripts=[os.path.join("..","scripts",s) for s in 
                ["pdl2resources.py", "ingest-nerdm-res.py",
                 "ingest-field-info.py", "ingest-taxonomy.py",
-                "ingest-uwsgi.py", "logserver" ]],
+                "ingest-uwsgi.py", "ensure-rmm-indexes.py",
+                "upgrade-nerdm-schema.py", "nerdm-validate.py", "logserver" ]],
       cmdclass={'build_py': build},
       classifiers=[
           'Programming Language :: Python :: 3 :: Only'
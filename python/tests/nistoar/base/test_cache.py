@@ -0,0 +1,87 @@
+import os, sys, pdb, shutil, time
+import unittest as test
+from nistoar.testing import *
+
+from nistoar.base.cache import FileDependentCache
+
+tmpd = None
+
+def setUpModule():
+    global tmpd
+    ensure_tmpdir()
+    tmpd = tmpdir()
+
+def tearDownModule():
+    rmtmpdir()
+
+def touch(path, content="{}", mtime=None):
+    with open(path, 'w') as fd:
+        fd.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+class TestFileDependentCache(test.TestCase):
+
+    def setUp(self):
+        self.dir = os.path.join(tmpd, "cachetest")
+        os.mkdir(self.dir)
+        self.file = os.path.join(self.dir, "a.json")
+        touch(self.file, mtime=1000000)
+        self.cache = FileDependentCache()
+        self.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def build(self):
+        self.builds += 1
+        return {"build": self.builds}
+
+    def test_get_file(self):
+        out = self.cache.get("a", self.build, [self.file])
+        self.assertEqual(out, {"build": 1})
+        self.assertIs(self.cache.get("a", self.build, [self.file]), out)
+        self.assertEqual(self.builds, 1)
+        self.assertIn("a", self.cache)
+        self.assertEqual(len(self.cache), 1)
+
+        touch(self.file, mtime=2000000)
+        self.assertEqual(self.cache.get("a", self.build, [self.file]), {"build": 2})
+        self.assertEqual(self.cache.get("a", self.build, [self.file]), {"build": 2})
+
+        self.cache.remove("a")
+        self.assertNotIn("a", self.cache)
+        self.assertEqual(self.cache.get("a", self.build, [self.file]), {"build": 3})
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_get_dir(self):
+        os.utime(self.dir, (1000000, 1000000))
+        out = self.cache.get(("a", "_"), self.build, [self.dir])
+        self.assertIs(self.cache.get(("a", "_"), self.build, [self.dir]), out)
+        self.assertEqual(self.cache.get(("a", "$"), self.build, [self.dir]), {"build": 2})
+
+        touch(self.file, mtime=2000000)
+        self.assertEqual(self.cache.get(("a", "_"), self.build, [self.dir]), {"build": 3})
+
+        touch(os.path.join(self.dir, "b.json"), mtime=1000000)
+        os.utime(self.dir, (1000000, 1000000))
+        self.assertEqual(self.cache.get(("a", "_"), self.build, [self.dir]), {"build": 4})
+
+    def test_missing(self):
+        missing = os.path.join(self.dir, "goob.json")
+        out = self.cache.get("a", self.build, [missing])
+        self.assertIs(self.cache.get("a", self.build, [missing]), out)
+        touch(missing)
+        self.assertEqual(self.cache.get("a", self.build, [missing]), {"build": 2})
+
+    def test_failed_build(self):
+        def fail():
+            raise RuntimeError("oops")
+        with self.assertRaises(RuntimeError):
+            self.cache.get("a", fail, [self.file])
+        self.assertNotIn("a", self.cache)
+
+
+if __name__ == '__main__':
+    test.main()
@@ -1,4 +1,4 @@
-import unittest, pdb, os, json
+import unittest, pdb, os, json, time, glob
 from collections import OrderedDict
 
 import nistoar.jq as jq
@@ -9,6 +9,32 @@ jqlibdir = os.path.join(mddir, "jq")
 datadir = os.path.join(jqlibdir, "tests", "data")
 janaffile = os.path.join(datadir, "janaf_pod.json")
 
+class TestCodec(unittest.TestCase):
+
+    def test_dumps(self):
+        data = OrderedDict([("b", [1, 2.5, None]), ("a", "d\u00e9j\u00e0 vu")])
+        self.assertEqual(json.loads(jq.dumps(data)), data)
+        self.assertEqual(jq.dumps(data)[:6], '{"b":[')
+        self.assertNotIn("\n", jq.dumps(data))
+        self.assertEqual(json.loads(jq.dumpb(data).decode('utf-8')), data)
+        self.assertTrue(isinstance(jq.dumpb(data), bytes))
+
+        # falls back to json for data orjson does not support
+        self.assertEqual(json.loads(jq.dumps({1: "a"})), {"1": "a"})
+
+    def test_loads(self):
+        out = jq.loads('{"b": 1, "a": {"c": 2}}')
+        self.assertTrue(isinstance(out, OrderedDict))
+        self.assertTrue(isinstance(out['a'], OrderedDict))
+        self.assertEqual(list(out.keys()), ["b", "a"])
+
+        out = jq.loads(b'{"b": 1, "a": {"c": 2}}')
+        self.assertTrue(isinstance(out, OrderedDict))
+
+        out = jq.loads(b'{"b": 1, "a": {"c": 2}}', False)
+        self.assertEqual(list(out.keys()), ["b", "a"])
+        self.assertEqual(out, {"a": {"c": 2}, "b": 1})
+
 class TestJqCommand(unittest.TestCase):
 
     def setUp(self):
@@ -69,6 +95,12 @@ class TestJqCommand(unittest.TestCase):
         out = self.jqc.process_data("[.goob]", json.dumps(data))
         self.assertEqual(out, ["gurn"])
 
+        out = self.jqc.process_data("[.goob]", jq.dumpb(data))
+        self.assertEqual(out, ["gurn"])
+        out = self.jqc.process_data("{a: .goob}", jq.dumpb(data), ordered=False)
+        self.assertEqual(out, {"a": "gurn"})
+        self.assertFalse(isinstance(out, OrderedDict))
+
 class TestJq(unittest.TestCase):
 
     def test_ctr(self):
@@ -124,6 +156,26 @@ class TestJq(unittest.TestCase):
         out = jqt.transform(json.dumps({}), {"goob": "hank"})
         self.assertEqual(out, ["hank"])
 
+    def test_transform_data(self):
+        jqt = jq.Jq("{goob: .goob, id: $id}", args={"id": "ID"})
+        data = {"id": "ID", "goob": "gurn"}
+        out = jqt.transform_data(data)
+        self.assertEqual(out, {"goob": "gurn", "id": "ID"})
+        self.assertTrue(isinstance(out, OrderedDict))
+        self.assertEqual(jqt.transform_data(data, {"id": "XX"})['id'], "XX")
+
+        out = jqt.transform_data(data, ordered=False)
+        self.assertEqual(out, {"goob": "gurn", "id": "ID"})
+        self.assertEqual(list(out.keys()), ["goob", "id"])
+
+        jqt = jq.Jq("{goob: .goob, id: $id}", args={"id": "ID"}, poolsize=1)
+        try:
+            self.assertEqual(jqt.transform_data(data), {"goob": "gurn", "id": "ID"})
+            self.assertEqual(jqt.transform_data(data, {"id": "XX"}, False),
+                             {"goob": "gurn", "id": "XX"})
+        finally:
+            jqt.close()
+
     def test_transform_file(self):
         jqt = jq.Jq(".accessLevel")
         out = jqt.transform_file(janaffile)
@@ -138,8 +190,179 @@ class TestJq(unittest.TestCase):
         
         out = jqt.transform_file(janaffile, {"id": "ark:ID"})
         self.assertEqual(out, 'ark:ID')
+
+    def test_transform_pooled(self):
+        jqt = jq.Jq("[$goob, .a]", args={"goob": "gurn"}, poolsize=2)
+        try:
+            self.assertEqual(jqt.transform(json.dumps({"a": 1})), ["gurn", 1])
+            self.assertEqual(jqt.transform(json.dumps({"a": 2}), {"goob": "hank"}),
+                             ["hank", 2])
+            self.assertEqual(jqt.transform(json.dumps({"a": 3}), {"id": "ark:ID"}),
+                             ["gurn", 3])
+        finally:
+            jqt.close()
+
+    def test_transform_file_pooled(self):
+        jqt = jq.Jq('nerdm::podds2resource_for($id) | .["@id"]',
+                    jqlibdir, ["pod2nerdm:nerdm"], {"id": "ID"}, poolsize=1)
+        try:
+            self.assertEqual(jqt.transform_file(janaffile), 'ID')
+            self.assertEqual(jqt.transform_file(janaffile, {"id": "ark:ID"}), 'ark:ID')
+        finally:
+            jqt.close()
+
+    def test_transform_many(self):
+        jqt = jq.Jq("[$goob, .a]", args={"goob": "gurn"})
+        docs = [json.dumps({"a": i}) for i in range(5)]
+        out = jqt.transform_many(docs)
+        self.assertFalse(isinstance(out, list))
+        self.assertEqual(list(out), [["gurn", i] for i in range(5)])
+
+        out = jqt.transform_many(iter(docs), ({"goob": i*2} for i in range(5)))
+        self.assertEqual(list(out), [[i*2, i] for i in range(5)])
+
+        self.assertEqual(list(jqt.transform_many([])), [])
+
+    def test_transform_many_w_mod(self):
+        jqt = jq.Jq('nerdm::podds2resource_for($id) | .["@id"]',
+                    jqlibdir, ["pod2nerdm:nerdm"])
+        with open(janaffile) as fd:
+            data = fd.read()
+        out = jqt.transform_many([data, data], [{"id": "ark:ID1"}, {"id": "ark:ID2"}])
+        self.assertEqual(list(out), ["ark:ID1", "ark:ID2"])
+
+    def test_transform_many_errors(self):
+        jqt = jq.Jq(".a")
+        out = jqt.transform_many(['{"a": 1}', '5', '{"a": 3}'])
+        self.assertEqual(next(out), 1)
+        with self.assertRaises(RuntimeError):
+            next(out)
+
+        out = jqt.transform_many(['{"a": 1}', '{"a": ', '{"a": 3}'])
+        with self.assertRaises(RuntimeError):
+            list(out)
+
+class TestJqPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = jq.JqPool("[$goob, .a]", args={"goob": "gurn"}, size=2)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_ctor(self):
+        self.assertEqual(self.pool.size, 2)
+        self.assertEqual(self.pool.args, {"goob": "gurn"})
+        self.assertEqual(self.pool.filter,
+             '.[1] as {$goob} | .[0] | try ([[$goob, .a]] | [true, .]) catch [false, .]')
+        self.assertEqual(self.pool.form_cmd(),
+                         ['jq', '-c', '--unbuffered', '--argjson', 'goob', '"gurn"',
+                          self.pool.filter])
+
+        with self.assertRaises(ValueError):
+            jq.JqPool("[.goob]", size=0)
+        with self.assertRaises(ValueError):
+            jq.JqPool("[.goob]", modules=["gurn"])
+
+    def test_transform(self):
+        self.assertEqual(self.pool.transform(json.dumps({"a": 1})), ["gurn", 1])
+        self.assertEqual(self.pool.transform('{"a": 2}', {"goob": 3}), [3, 2])
+        with self.assertRaises(ValueError):
+            self.pool.transform('{"a": 2}', {"hank": 3})
+
+    def test_error_isolation(self):
+        with self.assertRaises(RuntimeError):
+            self.pool.transform('5')
+        self.assertEqual(self.pool.transform('{"a": 1}'), ["gurn", 1])
+
+        # a syntax error kills the process; a new one should get started
+        with self.assertRaises(RuntimeError):
+            self.pool.transform('{"a": ')
+        self.assertEqual(self.pool.transform('{"a": 2}'), ["gurn", 2])
+
+        # malformed input must not leave jq waiting for more
+        for bad in ['{"a": "unterminated', '{"a": [1, 2}', '{"a": 1} {"a": 2}', '']:
+            with self.assertRaises(RuntimeError):
+                self.pool.transform(bad)
+            self.assertEqual(self.pool.transform('{"a": 3}'), ["gurn", 3])
+
+        jqt = jq.Jq('.', poolsize=1)
+        with self.assertRaises(RuntimeError):
+            jqt.transform('{"a": "unterminated')
+        self.assertEqual(jqt.transform('{"a": 4}'), {"a": 4})
+
+    def test_timeout(self):
+        pool = jq.JqPool("[range(1e9)] | length", size=1, timeout=0.5)
+        try:
+            with self.assertRaises(RuntimeError):
+                pool.transform('{}')
+            self.assertEqual(pool._idle, [])
+        finally:
+            pool.close()
+
+        pool = jq.JqPool("if .a then [range(1e9)] | length else 1 end",
+                         size=1, timeout=0.5)
+        try:
+            self.assertEqual(pool.transform('{"a": false}'), 1)
+            with self.assertRaises(RuntimeError):
+                pool.transform('{"a": true}')
+            self.assertEqual(pool.transform('{"a": false}'), 1)
+        finally:
+            pool.close()
+
+    def test_multiple_results(self):
+        pool = jq.JqPool(".[]")
+        try:
+            with self.assertRaises(ValueError):
+                pool.transform('[1, 2]')
+            self.assertEqual(pool.transform('[1]'), 1)
+        finally:
+            pool.close()
+
+    def test_close(self):
+        self.assertEqual(self.pool.transform('{"a": 1}'), ["gurn", 1])
+        self.pool.close()
+        with self.assertRaises(RuntimeError):
+            self.pool.transform('{"a": 1}')
         
-        
-        
+@unittest.skipIf("bench" not in os.environ.get("OAR_TEST_INCLUDE",""),
+                 "kindly skipping benchmark tests")
+class TestCodecBenchmark(unittest.TestCase):
+
+    def test_transform_data(self):
+        # compare the cost of the former text round trip with that of 
+        # transform_data() over the model examples
+        exfiles = glob.glob(os.path.join(os.path.dirname(jqlibdir), "model",
+                                         "examples", "*.json"))
+        docs = []
+        for f in exfiles:
+            with open(f) as fd:
+                try:
+                    docs.append(json.load(fd, object_pairs_hook=OrderedDict))
+                except ValueError:
+                    pass
+        jqt = jq.Jq('.')
+        reps = 10
+
+        def timeit(func):
+            t0 = time.time()
+            for i in range(reps):
+                for d in docs:
+                    func(d)
+            return (time.time() - t0) / (reps * len(docs)) * 1000
+
+        old = timeit(lambda d: jqt.transform(json.dumps(d)))
+        new = timeit(lambda d: jqt.transform_data(d))
+        fast = timeit(lambda d: jqt.transform_data(d, ordered=False))
+        print("\nper-document transform on {0} examples (orjson={1}): "
+              "str round trip: {2:.2f}ms; transform_data: {3:.2f}ms; "
+              "unordered: {4:.2f}ms".format(len(docs), bool(jq.orjson), old, new, fast))
+
+        old = timeit(lambda d: jq.jsonDecoder.decode(json.dumps(d)))
+        new = timeit(lambda d: jq.loads(jq.dumpb(d)))
+        fast = timeit(lambda d: jq.loads(jq.dumpb(d), False))
+        print("codec cost only: json: {0:.3f}ms; dumpb/loads: {1:.3f}ms; unordered: {2:.3f}ms"
+              .format(old, new, fast))
+
 if __name__ == '__main__':
     unittest.main()
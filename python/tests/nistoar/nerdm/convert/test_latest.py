@@ -54,6 +54,30 @@ class TestNERDm2Latest(test.TestCase):
                                               byext, cvtr.defver),
                          "https://data.nist.gov/od/dm/nerdm-schema/blue/1.0#Res")
         
+    def test_schema_uri_matcher(self):
+        matchr = latest._SchemaURIMatcher({"http://example.com/anext/": "v0.1", "pub": "v1.2",
+                                           "exp": "", "": "v2.2"}, "1.0")
+        self.assertEqual(matchr("https://data.nist.gov/od/dm/nerdm-schema/pub/v0.3#Res"),
+                         "https://data.nist.gov/od/dm/nerdm-schema/pub/v1.2#Res")
+        self.assertEqual(matchr("https://www.nist.gov/od/dm/nerdm-schema/pub/v0.3#Res"),
+                         "https://data.nist.gov/od/dm/nerdm-schema/pub/v1.2#Res")
+        self.assertEqual(matchr("https://data.nist.gov/od/dm/nerdm-schema/v0.3"),
+                         "https://data.nist.gov/od/dm/nerdm-schema/v2.2")
+        self.assertEqual(matchr("http://example.com/anext/v88#goob"), "http://example.com/anext/v0.1#goob")
+        self.assertEqual(matchr("https://data.nist.gov/od/dm/nerdm-schema/blue/v0.3#Res"),
+                         "https://data.nist.gov/od/dm/nerdm-schema/blue/1.0#Res")
+        self.assertIsNone(matchr("https://data.nist.gov/od/dm/nerdm-schema/exp/v0.3#Res"))
+        self.assertIsNone(matchr("http://example.com/other/v88#goob"))
+        self.assertIn("http://example.com/anext/v88#goob", matchr._memo)
+        self.assertEqual(matchr("http://example.com/anext/v88#goob"), "http://example.com/anext/v0.1#goob")
+
+        cvtr = latest.NERDm2Latest(defver="1.0", byext={})
+        self.assertIs(cvtr._matcher_for(), cvtr._matcher_for())
+        self.assertIsNot(cvtr._matcher_for("v0.3"), cvtr._matcher_for())
+        self.assertEqual(cvtr._upd_schema_ver("https://data.nist.gov/od/dm/nerdm-schema/pub/v0.3#Res",
+                                              cvtr._matcher_for(), cvtr.defver),
+                         "https://data.nist.gov/od/dm/nerdm-schema/pub/"+const.pub_ver+"#Res")
+        
     def test_upd_schema_ver_on_node(self):
         defver = "1.0"
         byext = {
@@ -360,6 +384,32 @@ class TestNERDm2Latest(test.TestCase):
         self.assertNotIn('version', ltst)
         self.assertNotIn('releaseHistory', ltst)
 
+    def test_convert_copy_on_write(self):
+        cvtr = latest.NERDm2Latest()
+        with open(hitsc) as fd:
+            nerdm = json.load(fd)
+        orig = deepcopy(nerdm)
+
+        ltst = cvtr.convert(nerdm, copy_on_write=True)
+        self.assertEqual(nerdm, orig)
+        self.assertEqual(ltst, cvtr.convert(nerdm))
+        self.assertEqual(ltst['_schema'], const.CORE_SCHEMA_URI+"#")
+        self.assertNotIn('versionHistory', ltst)
+        self.assertIn('releaseHistory', ltst)
+
+        # unchanged nodes are shared with the input
+        self.assertIs(ltst['contactPoint'], nerdm['contactPoint'])
+        self.assertIsNot(ltst['references'], nerdm['references'])
+
+        with open(simplenerd) as fd:
+            nerdm = json.load(fd)
+        orig = deepcopy(nerdm)
+        ltst = cvtr.convert(nerdm, copy_on_write=True)
+        self.assertEqual(nerdm, orig)
+        self.assertEqual(ltst, cvtr.convert(nerdm))
+        self.assertIsNot(ltst['_extensionSchemas'], nerdm['_extensionSchemas'])
+        self.assertEqual(ltst['_extensionSchemas'], [const.PUB_SCHEMA_URI+"#/definitions/PublicDataResource"])
+
                          
 if __name__ == '__main__':
     test.main()
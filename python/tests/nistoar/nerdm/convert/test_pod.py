@@ -1,4 +1,4 @@
-import unittest, pdb, os, json, re
+import unittest, pdb, os, json, re, io
 from collections import OrderedDict
 
 import nistoar.nerdm.convert as cvt
@@ -68,6 +68,22 @@ class TestPODds2Res(unittest.TestCase):
         self.assertEqual(res["@id"], "ark:ID")
         self.assertEqual(res["accessLevel"], "public")
 
+    def test_convert_pooled(self):
+        cvtr = cvt.PODds2Res(jqlibdir, {'jq_poolsize': 2})
+        with open(janaffile) as fd:
+            data = fd.read()
+
+        res = cvtr.convert(data, "ark:ID1")
+        self.assertEqual(res["@id"], "ark:ID1")
+        self.assertEqual(res["accessLevel"], "public")
+        res = cvtr.convert(data, "ark:ID2")
+        self.assertEqual(res["@id"], "ark:ID2")
+        self.assertEqual(res["@context"][1], {"@base": "ark:ID2"})
+
+        res = cvtr.convert_file(janaffile, "ark:ID3")
+        self.assertEqual(res["@id"], "ark:ID3")
+        self.assertEqual(res, cvt.PODds2Res(jqlibdir).convert_file(janaffile, "ark:ID3"))
+
     def test_convert_data(self):
         cvtr = cvt.PODds2Res(jqlibdir)
         self.assertFalse(cvtr.enrich_refs)
@@ -95,6 +111,49 @@ class TestPODds2Res(unittest.TestCase):
         self.assertEqual(res['topic'][0]['tag'], "Physics: Optical physics and communications")
         self.assertEqual(res['theme'][0], "optical physics")
 
+    def test_convert_data_many(self):
+        cvtr = cvt.PODds2Res(jqlibdir)
+        with open(janaffile) as fd:
+            data = json.load(fd)
+        data['theme'] = ['optical physics']
+
+        ids = ["ark:ID%d" % i for i in range(3)]
+        res = list(cvtr.convert_data_many([data]*3, ids))
+        self.assertEqual(len(res), 3)
+        self.assertEqual([r['@id'] for r in res], ids)
+        self.assertEqual(res[0]['theme'][0], "Physics: Optical physics and communications")
+        self.assertEqual(res[2], cvtr.convert_data(data, "ark:ID2"))
+
+    def test_python_engine(self):
+        with self.assertRaises(ValueError):
+            cvt.PODds2Res(jqlibdir, engine="goob")
+
+        cvtr = cvt.PODds2Res(jqlibdir, engine="python")
+        self.assertEqual(cvtr.engine, "python")
+        self.assertIsNone(cvtr.jqt)
+        jqcvtr = cvt.PODds2Res(jqlibdir)
+
+        res = cvtr.convert_file(janaffile, "ark:ID")
+        self.assertEqual(res["@id"], "ark:ID")
+        self.assertEqual(res, jqcvtr.convert_file(janaffile, "ark:ID"))
+
+        with open(janaffile) as fd:
+            data = fd.read()
+        self.assertEqual(cvtr.convert(data, "ark:ID"), res)
+
+        data = json.loads(data)
+        data['theme'] = ['optical physics']
+        res = cvtr.convert_data(data, "ark:ID")
+        self.assertEqual(res['theme'][0], "Physics: Optical physics and communications")
+        self.assertEqual(data['theme'], ['optical physics'])
+        self.assertEqual(res, jqcvtr.convert_data(data, "ark:ID"))
+
+        res = list(cvtr.convert_data_many([data]*2, ["ark:ID0", "ark:ID1"]))
+        self.assertEqual([r['@id'] for r in res], ["ark:ID0", "ark:ID1"])
+
+        with self.assertRaises(RuntimeError):
+            cvtr.convert_data({"title": ["not", "a", "string"]}, "ark:ID")
+
     def test_themes2topics(self):
         cvtr = cvt.PODds2Res(jqlibdir)
 
@@ -308,6 +367,53 @@ simplehier = [
     }
 ]
 
+pdlfile = os.path.join(datadir, "nist-pdl-oct2016.json")
+
+class TestPODCatalogReader(unittest.TestCase):
+
+    def setUp(self):
+        with open(pdlfile) as fd:
+            self.dss = json.load(fd)['dataset']
+
+    def test_datasets(self):
+        for bufsize in (16, 1000, 65536):
+            with open(pdlfile) as fd:
+                rdr = cvt.PODCatalogReader(fd, bufsize)
+                self.assertEqual(list(rdr.datasets()), self.dss)
+                self.assertEqual(rdr.scanned, len(self.dss))
+
+    def test_start_count(self):
+        with open(pdlfile) as fd:
+            rdr = cvt.PODCatalogReader(fd, 1000)
+            self.assertEqual(list(rdr.datasets(10, 5)), self.dss[10:15])
+            self.assertEqual(rdr.scanned, 15)
+
+        with open(pdlfile) as fd:
+            rdr = cvt.PODCatalogReader(fd)
+            self.assertEqual(list(rdr.datasets(len(self.dss)-2)), self.dss[-2:])
+
+        with open(pdlfile) as fd:
+            rdr = cvt.PODCatalogReader(fd)
+            self.assertEqual(list(rdr.datasets(len(self.dss)+2)), [])
+            self.assertEqual(rdr.scanned, len(self.dss))
+
+    def test_odd_content(self):
+        doc = '{"a": 1, "b": [1, {"x": "]}\\\\\\""}], ' + \
+              '"dataset": [ {"q": "a\\\\"}, 3, "s", null ], "z": 0}'
+        for bufsize in (1, 3, 100):
+            rdr = cvt.PODCatalogReader(io.StringIO(doc), bufsize)
+            self.assertEqual(list(rdr.datasets()), [{"q": "a\\"}, 3, "s", None])
+
+        rdr = cvt.PODCatalogReader(io.StringIO('{"dataset": []}'))
+        self.assertEqual(list(rdr.datasets()), [])
+
+    def test_errors(self):
+        for doc in ['{}', '{"a": "b"}', '[1]', '{"dataset": [{"a": 1}',
+                    '{"dataset": [{"a":1} {"b":2}]}', '{"dataset": [{"a": }]}']:
+            rdr = cvt.PODCatalogReader(io.StringIO(doc), 4)
+            with self.assertRaises(ValueError):
+                list(rdr.datasets())
+
 class TestRes2PODds(unittest.TestCase):
 
     def test_ctor(self):
@@ -371,12 +477,50 @@ class TestComponentCounter(unittest.TestCase):
         inv = cc.inventory(simplenerd['components'])
         self.assertEqual(inv, fullinv)
 
+    def test_pooled(self):
+        cc = cvt.ComponentCounter(jqlibdir, 1)
+        self.assertEqual(cc.inventory(simplenerd['components']), fullinv)
+        self.assertEqual(cc.inventory_collection(simplenerd['components'], "trial3"),
+                         trial3inv)
+        self.assertEqual(cc.inventory_by_type(simplenerd['components'], "trial3"),
+                         trial3byty)
+
+    def test_python_engine(self):
+        with self.assertRaises(ValueError):
+            cvt.ComponentCounter(jqlibdir, engine="goob")
+        cc = cvt.ComponentCounter(jqlibdir, engine="python")
+        self.assertEqual(cc.inventory(simplenerd['components']), fullinv)
+        self.assertEqual(cc.inventory_collection(simplenerd['components'], "trial3"),
+                         trial3inv)
+        self.assertEqual(cc.inventory_by_type(simplenerd['components'], "trial3"),
+                         trial3byty)
+
+        idx = cc.index(simplenerd['components'])
+        self.assertIs(cc.index(idx), idx)
+        self.assertEqual(cc.inventory(idx), fullinv)
+        self.assertEqual(cc.inventory_collection(idx, "trial3"), trial3inv)
+        self.assertEqual(cvt.ComponentCounter(jqlibdir).inventory(idx), fullinv)
+
 class TestHierarchyBuilder(unittest.TestCase):
 
     def test_build_hierarchy(self):
         hb = cvt.HierarchyBuilder(jqlibdir)
         hier = hb.build_hierarchy(simplenerd['components'])
         self.assertEqual(hier, simplehier)
+
+    def test_build_hierarchy_pooled(self):
+        hb = cvt.HierarchyBuilder(jqlibdir, 2)
+        hier = hb.build_hierarchy(simplenerd['components'])
+        self.assertEqual(hier, simplehier)
+        hier = hb.build_hierarchy(simplenerd['components'])
+        self.assertEqual(hier, simplehier)
+
+    def test_python_engine(self):
+        hb = cvt.HierarchyBuilder(jqlibdir, engine="python")
+        hier = hb.build_hierarchy(simplenerd['components'])
+        self.assertEqual(hier, simplehier)
+        hier = hb.build_hierarchy(cvt.ComponentCounter(jqlibdir).index(simplenerd['components']))
+        self.assertEqual(hier, simplehier)
         
 if __name__ == '__main__':
     unittest.main()
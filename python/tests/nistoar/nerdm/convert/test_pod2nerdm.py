@@ -0,0 +1,228 @@
+import unittest, pdb, os, json, time
+from collections import OrderedDict
+
+import nistoar.nerdm.convert.pod2nerdm as p2n
+from nistoar import jq
+
+mddir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(os.path.dirname(__file__)))))))
+jqlibdir = os.path.join(mddir, "jq")
+datadir = os.path.join(jqlibdir, "tests", "data")
+janaffile = os.path.join(datadir, "janaf_pod.json")
+pdlfile = os.path.join(datadir, "nist-pdl-oct2016.json")
+schemadir = os.path.join(os.path.dirname(jqlibdir), "model")
+exdir = os.path.join(schemadir, "examples")
+
+def load(path):
+    with open(path) as fd:
+        return json.load(fd, object_pairs_hook=OrderedDict)
+
+def pod_samples():
+    """
+    return a list of (label, POD Dataset record) pairs drawn from the
+    POD records available in the jq test data and the model examples.
+    """
+    out = []
+    for f in sorted(os.listdir(datadir)):
+        if not f.endswith(".json") or f.startswith("simple-nerdm"):
+            continue
+        data = load(os.path.join(datadir, f))
+        if 'dataset' in data:
+            out.extend([("{0}[{1}]".format(f, i), d)
+                        for i, d in enumerate(data['dataset'])])
+        else:
+            out.append((f, data))
+    pod = load(os.path.join(exdir, "pod.json"))
+    if 'dataset' in pod:
+        out.extend([("pod.json[{0}]".format(i), d)
+                    for i, d in enumerate(pod['dataset'])])
+    else:
+        out.append(("pod.json", pod))
+    return out
+
+class TestHelpers(unittest.TestCase):
+
+    def test_filepath(self):
+        self.assertEqual(p2n.filepath("https://s3.amazonaws.com/nist-srd/SRD13/a/b.json"),
+                         "a/b.json")
+        self.assertEqual(p2n.filepath("https://data.nist.gov/od/ds/1234/foo%20bar.txt"),
+                         "foo bar.txt")
+        self.assertEqual(p2n.filepath("https://example.com/data/goob.zip"),
+                         "goob.zip")
+
+    def test_url_decode(self):
+        self.assertEqual(p2n.url_decode("a%20b%2Fc"), "a b/c")
+        self.assertEqual(p2n.url_decode("a+b"), "a+b")
+        self.assertEqual(p2n.url_decode_plus("a+b"), "a b")
+
+    def test_dirname_basename(self):
+        self.assertEqual(p2n.dirname("a/b/c"), "a/b")
+        self.assertEqual(p2n.dirname("c"), "")
+        self.assertEqual(p2n.basename("a/b/c"), "c")
+        self.assertEqual(p2n.ansc_coll_paths(["a/b/c", "a/d"]), ["a", "a/b"])
+
+    def test_dist2comp(self):
+        dist = OrderedDict([("downloadURL",
+                             "https://data.nist.gov/od/ds/1234/goob/data.json"),
+                            ("mediaType", "application/json")])
+        comp = p2n.dist2comp(dist, None)
+        self.assertEqual(comp['filepath'], "goob/data.json")
+        self.assertEqual(comp['@id'], "cmps/goob/data.json")
+        self.assertIn("nrdp:DataFile", comp['@type'])
+
+        dist = OrderedDict([("accessURL", "https://example.com/goob")])
+        comp = p2n.dist2comp(dist, None)
+        self.assertNotIn('filepath', comp)
+        self.assertEqual(comp['@id'], "#goob")
+        self.assertEqual(comp['@type'][0], "nrdp:AccessPage")
+
+    def test_podds2resource(self):
+        pod = load(janaffile)
+        res = p2n.podds2resource(pod, "ark:ID")
+        self.assertEqual(res["@id"], "ark:ID")
+        self.assertEqual(res["accessLevel"], "public")
+        self.assertEqual(res["title"], pod["title"])
+        self.assertTrue(res["_schema"].startswith("https://data.nist.gov/od/dm/nerdm-schema/"))
+        self.assertTrue(len(res["components"]) > 0)
+
+        res = p2n.podds2resource(pod)
+        self.assertIsNone(res["@id"])
+
+def make_comps(ndirs, nfiles):
+    comps = [ OrderedDict([("@id", "#access"), ("@type", ["nrdp:AccessPage"])]) ]
+    for d in range(ndirs):
+        for f in range(nfiles):
+            comps.append(OrderedDict([
+                ("@id", "cmps/d{0}/sub/f{1}.csv".format(d, f)),
+                ("@type", ["nrdp:DataFile", "nrdp:DownloadableFile"]),
+                ("filepath", "d{0}/sub/f{1}.csv".format(d, f))
+            ]))
+        comps.append(OrderedDict([
+            ("@id", "cmps/d{0}/README.txt".format(d)),
+            ("@type", ["nrdp:DataFile", "nrdp:DownloadableFile"]),
+            ("filepath", "d{0}/README.txt".format(d))
+        ]))
+    return p2n.insert_subcoll_comps(comps)
+
+class TestComponentIndex(unittest.TestCase):
+
+    def assertSameAs(self, comps, colls):
+        idx = p2n.ComponentIndex(comps)
+        self.assertEqual(json.dumps(idx.inventory()),
+                         json.dumps(p2n.inventory_components(comps)))
+        self.assertEqual(json.dumps(idx.hierarchy()),
+                         json.dumps(p2n.hierarchy(comps)))
+        for coll in colls:
+            self.assertEqual(json.dumps(idx.inventory_collection(coll)),
+                             json.dumps(p2n.inventory_collection(comps, coll)))
+            self.assertEqual(json.dumps(idx.inventory_by_type(coll)),
+                             json.dumps(p2n.inventory_by_type(comps, coll)))
+            self.assertEqual(json.dumps(idx.hierarchy(coll)),
+                             json.dumps(p2n.hierarchy(comps, coll)))
+
+    def test_simple(self):
+        comps = load(os.path.join(datadir, "simple-nerdm.json"))['components']
+        self.assertSameAs(comps, ["", "trial3", "trial3/trial3a", "goob", "trial"])
+
+    def test_generated(self):
+        comps = make_comps(3, 4)
+        idx = p2n.ComponentIndex(comps)
+        self.assertEqual(len(idx.children("")), 4)
+        self.assertEqual(len(idx.children("d1/sub")), 4)
+        self.assertEqual(idx.inventory_collection("d1")['descCount'], 6)
+        self.assertSameAs(comps, ["", "d0", "d1/sub", "d3", "d1/su"])
+
+    def test_odd_paths(self):
+        comps = [
+            OrderedDict([("@type", ["nrdp:Subcollection"]), ("filepath", "a/")]),
+            OrderedDict([("@type", ["nrdp:DataFile"]), ("filepath", "a/b")]),
+            OrderedDict([("@type", ["nrdp:Subcollection"]), ("filepath", "a/c/")]),
+            OrderedDict([("@type", ["nrdp:DataFile"]), ("filepath", "a/c/d")]),
+            OrderedDict([("@type", ["nrdp:DataFile"]), ("filepath", "a//e")]),
+            OrderedDict([("@type", ["nrdp:DataFile"]), ("filepath", "/f")]),
+            OrderedDict([("@type", ["nrdp:DataFile"]), ("filepath", "")]),
+            OrderedDict([("@type", []), ("filepath", "g")]),
+            OrderedDict([("@type", ["nrdp:Hidden"])])
+        ]
+        self.assertSameAs(comps, ["", "a", "a/", "a/c", "a/c/", "/"])
+
+    def test_fallback(self):
+        comps = [ OrderedDict([("@type", "nrdp:DataFile"), ("filepath", "a/b")]) ]
+        idx = p2n.ComponentIndex(comps)
+        self.assertFalse(idx._indexed)
+        with self.assertRaises(ValueError):
+            idx.inventory()
+
+class TestEquivalence(unittest.TestCase):
+    """
+    check that the native conversion produces the same output as the jq
+    implementation
+    """
+
+    def test_podds2resource(self):
+        samples = pod_samples()
+        self.assertTrue(len(samples) > 100)
+        ids = ["ark:/88434/mds0{0:04d}".format(i) for i in range(len(samples))]
+
+        jqt = jq.Jq('nerdm::podds2resource_for($id)', jqlibdir, ["pod2nerdm:nerdm"])
+        jqouts = jqt.transform_many((json.dumps(s[1]) for s in samples),
+                                    ({"id": id} for id in ids))
+
+        for (label, pod), id, expect in zip(samples, ids, jqouts):
+            got = p2n.podds2resource(pod, id)
+            self.assertEqual(json.dumps(got), json.dumps(expect),
+                             "Output mismatch for "+label)
+
+    def test_inventory(self):
+        nerdm = load(os.path.join(datadir, "simple-nerdm.json"))
+        comps = nerdm['components']
+        jqt = jq.Jq('nerdm::inventory_components', jqlibdir, ["pod2nerdm:nerdm"])
+        self.assertEqual(json.dumps(p2n.inventory_components(comps)),
+                         json.dumps(jqt.transform(json.dumps(comps))))
+
+        jqt = jq.Jq('nerdm::hierarchy("")', jqlibdir, ["pod2nerdm:nerdm"])
+        self.assertEqual(json.dumps(p2n.hierarchy(comps)),
+                         json.dumps(jqt.transform(json.dumps(comps))))
+
+@unittest.skipIf("bench" not in os.environ.get("OAR_TEST_INCLUDE",""),
+                 "kindly skipping benchmark tests")
+class TestBenchmark(unittest.TestCase):
+
+    def test_podds2resource(self):
+        samples = [s[1] for s in pod_samples()]
+        ids = ["ark:/88434/mds0{0:04d}".format(i) for i in range(len(samples))]
+
+        jqt = jq.Jq('nerdm::podds2resource_for($id)', jqlibdir, ["pod2nerdm:nerdm"])
+        t0 = time.time()
+        list(jqt.transform_many((json.dumps(s) for s in samples),
+                                ({"id": id} for id in ids)))
+        jqtime = time.time() - t0
+
+        t0 = time.time()
+        for pod, id in zip(samples, ids):
+            p2n.podds2resource(pod, id)
+        pytime = time.time() - t0
+
+        print("\npodds2resource on {0} records: jq (batch): {1:.3f}s; python: {2:.3f}s"
+              .format(len(samples), jqtime, pytime))
+
+    def test_inventory(self):
+        comps = make_comps(50, 200)
+
+        t0 = time.time()
+        expect = p2n.inventory_components(comps)
+        scantime = time.time() - t0
+
+        t0 = time.time()
+        idx = p2n.ComponentIndex(comps)
+        got = idx.inventory()
+        hier = idx.hierarchy()
+        idxtime = time.time() - t0
+        self.assertEqual(got, expect)
+
+        print("\ninventory of {0} components: by scanning: {1:.3f}s; by index (+hierarchy): {2:.3f}s"
+              .format(len(comps), scantime, idxtime))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -122,6 +122,36 @@ class TestNERDm2RMM(test.TestCase):
         self.assertEqual(ing['releaseSet']['hasRelease'][0]['version'], "1.0.0")
         self.assertEqual(ing['releaseSet']['hasRelease'][0]['description'], "initial release")
 
+    def test_to_rmm_copy_on_write(self):
+        cvtr = rmm.NERDmForRMM()
+
+        with open(pdrrec) as fd:
+            nerdm = json.load(fd)
+        orig = deepcopy(nerdm)
+
+        ing = cvtr.to_rmm(nerdm)
+        self.assertEqual(nerdm, orig)
+
+        # unchanged nodes are shared
+        self.assertIs(ing['record']['contactPoint'], ing['version']['contactPoint'])
+        self.assertIs(ing['record']['components'][0], nerdm['components'][0])
+        self.assertIs(ing['version']['components'][0], nerdm['components'][0])
+        self.assertIs(ing['record']['releaseHistory'], ing['version']['releaseHistory'])
+        self.assertIs(ing['releaseSet']['hasRelease'], ing['record']['releaseHistory']['hasRelease'])
+
+        # rewritten nodes are not
+        self.assertIsNot(ing['record']['releaseHistory'], nerdm['releaseHistory'])
+        self.assertIsNot(ing['record']['components'], ing['version']['components'])
+        self.assertIsNot(ing['record']['components'][2], ing['version']['components'][2])
+        self.assertEqual(ing['record']['components'][2]['downloadURL'],
+                         "https://data.nist.gov/od/ds/mds2-2106/Readme.txt")
+        self.assertEqual(ing['version']['components'][2]['downloadURL'],
+                         "https://data.nist.gov/od/ds/mds2-2106/_v/1.6.0/Readme.txt")
+        self.assertEqual(ing['record']['releaseHistory']['hasRelease'][0]['location'],
+                         "https://data.nist.gov/od/id/ark:/88434/mds2-2106/pdr:v/1.0.0")
+        self.assertEqual(nerdm['releaseHistory']['hasRelease'][0]['location'],
+                         "https://data.nist.gov/od/id/ark:/88434/mds2-2106")
+
     def test_validate_rmm(self):
         lpsep = "https://testdata.nist.gov/od/id/"
         cvtr = rmm.NERDmForRMM()
@@ -1,7 +1,7 @@
 import unittest, pdb, os, json
 from collections import OrderedDict
 
-from jsonmerge.strategies import Strategy
+from jsonmerge.strategies import Strategy, BaseInstanceError, HeadInstanceError
 import jsonmerge
 
 import nistoar.nerdm.merge as mrg
@@ -203,6 +203,40 @@ class TestArrayMergeByMultiId(unittest.TestCase):
             { "@id": "goob", "foo": "bin" },
             { "@id": "bob", "tells": "alice" }
         ])
+
+    def test_merge_not_unique(self):
+        strat = mrg.ArrayMergeByMultiId()
+        schema = {'mergeStrategy': 'arrayMergeByMultiId'}
+        merger = jsonmerge.Merger(schema,
+                                  {'arrayMergeByMultiId': strat}, 'OrderedDict')
+
+        base = [ { "@id": "goob", "foo": "bar" },
+                 { "@id": "hank", "foo": "bin" } ]
+        head = [ { "@id": "hank", "gurn": "cranston" },
+                 { "@id": "bob", "tells": "alice" },
+                 { "@id": "hank", "tells": "alice" } ]
+        with self.assertRaises(HeadInstanceError):
+            merger.merge(base, head)
+
+        base.append({ "@id": "bob" })
+        base.append({ "@id": "bob", "foo": "bar" })
+        with self.assertRaises(BaseInstanceError):
+            merger.merge(base, head[:2])
+
+    def test_merge_many(self):
+        strat = mrg.ArrayMergeByMultiId()
+        schema = {'mergeStrategy': 'arrayMergeByMultiId'}
+        merger = jsonmerge.Merger(schema,
+                                  {'arrayMergeByMultiId': strat}, 'OrderedDict')
+
+        base = [ { "@id": "c%d" % i, "a": i } for i in range(1000) ]
+        head = [ { "@id": "c%d" % i, "b": i } for i in range(1500, 0, -3) ]
+        mrgd = merger.merge(base, head)
+        self.assertEqual(len(mrgd), 1167)
+        self.assertEqual(mrgd[3], { "@id": "c3", "a": 3, "b": 3 })
+        self.assertEqual(mrgd[4], { "@id": "c4", "a": 4 })
+        self.assertEqual(mrgd[1000], { "@id": "c1500", "b": 1500 })
+        self.assertEqual(mrgd[-1], { "@id": "c1002", "b": 1002 })
         
 class TestTopicArray(unittest.TestCase):
 
@@ -305,6 +339,45 @@ class TestBaseArrayAsDefault(unittest.TestCase):
             { "@id": "bob", "tells": "alice" },
             { "@id": "hank", "foo": "bin" }
         ])
+
+    def test_merge_not_unique(self):
+        strat = mrg.BaseArrayAsDefault()
+        schema = {'mergeStrategy': 'baseArrayAsDefault'}
+        merger = jsonmerge.Merger(schema,
+                                  {'baseArrayAsDefault': strat},
+                                  'OrderedDict')
+
+        base = [ { "@id": "goob", "foo": "bar" },
+                 { "@id": "hank", "foo": "bin" },
+                 { "@id": "goob", "foo": "bin" } ]
+        head = [ { "@id": "goob", "gurn": "cranston" } ]
+        with self.assertRaises(BaseInstanceError) as cm:
+            merger.merge(base, head)
+        self.assertIn("'goob' was not unique in base", str(cm.exception))
+
+        head = [ { "@id": "hank", "gurn": "cranston" },
+                 { "@id": "bob", "tells": "alice" },
+                 { "@id": "hank", "tells": "alice" } ]
+        with self.assertRaises(HeadInstanceError) as cm:
+            merger.merge(base[:2], head)
+        self.assertIn("'hank' was not unique in head", str(cm.exception))
+
+    def test_merge_many(self):
+        strat = mrg.BaseArrayAsDefault()
+        schema = {'mergeStrategy': 'baseArrayAsDefault'}
+        merger = jsonmerge.Merger(schema,
+                                  {'baseArrayAsDefault': strat},
+                                  'OrderedDict')
+
+        base = [ { "@id": "c%d" % i, "a": i } for i in range(1000) ]
+        head = [ { "@id": "c%d" % i, "b": i } for i in range(1500, 0, -3) ]
+        mrgd = merger.merge(base, head)
+        self.assertEqual(len(mrgd), 1167)
+        self.assertEqual(mrgd[0], { "@id": "c1500", "b": 1500 })
+        self.assertEqual(mrgd[166], { "@id": "c1002", "b": 1002 })
+        self.assertEqual(mrgd[167], { "@id": "c999", "a": 999, "b": 999 })
+        self.assertEqual(mrgd[500], { "@id": "c0", "a": 0 })
+        self.assertEqual(mrgd[-1], { "@id": "c998", "a": 998 })
         
 
 
@@ -66,6 +66,42 @@ class TestResearchTopicsTaxonomy(unittest.TestCase):
         term = self.tax.match_theme("Biological Nuclear Explosives", False)
         self.assertEqual(term.defn['term'], "Chemical/Biological/Radiological/Nuclear/Explosives (CBRNE)")
 
+    def test_match_theme_indexed(self):
+        self.assertEqual(list(self.tax._candidates(["concrete", "cement"], "term")),
+                         [self.tax.data['vocab'].index(self.tax.taillu["Concrete/cement"])])
+        self.assertEqual(list(self.tax._candidates(["goober", "cement"], "term")), [])
+        self.assertEqual(len(self.tax._candidates(["Bio-technology"], "term")),
+                         len(self.tax.data['vocab']))
+
+        term = self.tax.match_theme("Cement", False)
+        self.assertEqual(term.defn['term'], "Concrete/cement")
+        term = self.tax.match_theme("Cement Concrete", False)
+        self.assertIsNone(term)
+        term = self.tax.match_theme("Buildings: Sustainable", False)
+        self.assertEqual(term.defn['term'], "Sustainable buildings")
+
+    def test_match_theme_cached(self):
+        self.tax._cached_match.cache_clear()
+        term = self.tax.match_theme("internet of things")
+        self.assertEqual(term.defn['term'], "Internet of Things (IoT)")
+        term = self.tax.match_theme("internet of things")
+        self.assertEqual(term.defn['term'], "Internet of Things (IoT)")
+        term = self.tax.match_theme("internet of things", False)
+        self.assertEqual(term.defn['term'], "Internet of Things")
+        info = self.tax._cached_match.cache_info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 2)
+
+    def test_get_taxonomy(self):
+        tax = taxon.get_taxonomy(schemadir)
+        self.assertEqual(tax.data['version'], "2.0")
+        self.assertIs(taxon.get_taxonomy(schemadir), tax)
+        self.assertIs(taxon.get_taxonomy(os.path.join(schemadir, "..", "model")), tax)
+        self.assertIsNot(tax, self.tax)
+
+        with self.assertRaises(RuntimeError):
+            taxon.get_taxonomy("/tmp/goober")
+
     def test_themes2topics(self):
         themes = [
             "Optical physics", "Goober and the Peas", "Bioscience", "chemistry"
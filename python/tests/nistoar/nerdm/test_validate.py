@@ -4,6 +4,7 @@ from collections.abc import Mapping
 import ejsonschema as ejs
 
 import nistoar.nerdm.validate as vld8
+from nistoar.nerdm.validate import ValidationError
 
 mddir = os.path.dirname(os.path.dirname(os.path.dirname(
             os.path.dirname(os.path.abspath(os.path.dirname(__file__))))))
@@ -57,6 +58,49 @@ class TestValidate(unittest.TestCase):
         self.assertTrue(isinstance(v, ejs.ExtValidator))
         self.assertEqual(v._epfx, "_")
 
+    def test_get_validator(self):
+        v = vld8.get_validator(schemadir, "_")
+        self.assertTrue(isinstance(v, ejs.ExtValidator))
+        self.assertEqual(v._epfx, "_")
+        self.assertIs(vld8.get_validator(schemadir, "_"), v)
+        self.assertIs(vld8.get_validator(schemadir+"/", {"_schema": "xxx"}), v)
+
+        v2 = vld8.get_validator(schemadir, "$")
+        self.assertEqual(v2._epfx, "$")
+        self.assertIsNot(v2, v)
+
+        with self.assertRaises(TypeError):
+            vld8.get_validator(schemadir, 3)
+
+    def test_get_compiled_validator(self):
+        v = vld8.get_validator(schemadir, "_", compiled=True)
+        self.assertTrue(isinstance(v, vld8.CompiledValidator))
+        self.assertIs(v.fallback, vld8.get_validator(schemadir, "_"))
+        self.assertIs(vld8.get_validator(schemadir, "_", compiled=True), v)
+        self.assertIsNot(vld8.get_validator(schemadir, "$", compiled=True), v)
+
+    def test_compiled_validate(self):
+        v = vld8.get_validator(schemadir, "_", compiled=True)
+        with open(os.path.join(datadir, "janaf-orig.json")) as fd:
+            data = json.load(fd)
+        orig = json.loads(json.dumps(data))
+
+        self.assertEqual(v.validate(data, raiseex=False), [])
+        self.assertEqual(data, orig)
+        if vld8.fastjsonschema:
+            self.assertTrue(v._passes(data, None))
+            self.assertIn((data['_schema'],)+tuple(data['_extensionSchemas']), v._compiled)
+
+        del data['title']
+        if vld8.fastjsonschema:
+            self.assertFalse(v._passes(data, None))
+        errs = v.validate(data, strict=False, raiseex=False)
+        self.assertGreater(len(errs), 0)
+        self.assertEqual([str(e) for e in errs],
+                         [str(e) for e in v.fallback.validate(data, strict=False, raiseex=False)])
+        with self.assertRaises(ValidationError):
+            v.validate(data)
+
     def test_validate(self):
         with open(os.path.join(datadir, "janaf-orig.json")) as fd:
             data = json.load(fd)
@@ -67,10 +111,113 @@ class TestValidate(unittest.TestCase):
         errs = vld8.validate(data, schemadir, strict=False)
         self.assertGreater(len(errs), 0)
 
-        
+    def test_validate_many(self):
+        with open(os.path.join(datadir, "janaf-orig.json")) as fd:
+            data = json.load(fd)
+        bad = json.loads(json.dumps(data))
+        del bad['title']
+        bad['@id'] = "ark:/88434/bad"
+        items = [data, bad, ("goob", bad), os.path.join(datadir, "janaf-orig.json"),
+                 os.path.join(datadir, "missing.json")]
+
+        res = list(vld8.validate_many(items, schemadir))
+        self.assertEqual([r[0] for r in res],
+                         [data['@id'], "ark:/88434/bad", "goob", items[3], items[4]])
+        self.assertEqual(res[0][1], [])
+        self.assertGreater(len(res[1][1]), 0)
+        self.assertIn('message', res[1][1][0])
+        self.assertEqual(res[2][1], res[1][1])
+        self.assertEqual(res[3][1], [])
+        self.assertEqual(len(res[4][1]), 1)
+        self.assertTrue(res[4][1][0]['message'].startswith("Unable to read"))
+
+        self.assertEqual(list(vld8.validate_many(items, schemadir, workers=2, batch_size=2)), res)
+
+    def test_validate_rendition(self):
+        with open(os.path.join(datadir, "janaf-orig.json")) as fd:
+            data = json.load(fd)
+        val = vld8.get_validator(schemadir, compiled=True)
+        self.assertEqual(val.validate(data, raiseex=False), [])
+
+        # a rendition that shares all but its first component with data
+        rend = dict(data)
+        rend['@id'] = "ark:/88434/goob"
+        rend['components'] = list(data['components'])
+        rend['components'][0] = dict(data['components'][0])
+        rend['components'][0]['downloadURL'] += "?v=1"
+        self.assertEqual(vld8.validate_rendition(val, rend, data, raiseex=False), [])
+
+        rend['components'][0]['downloadURL'] = 5
+        errs = vld8.validate_rendition(val, rend, data, raiseex=False)
+        self.assertGreater(len(errs), 0)
+        with self.assertRaises(ValidationError):
+            vld8.validate_rendition(val, rend, data)
 
+        # an unshared component must still be distinct from the shared ones
+        rend['components'][0] = dict(data['components'][1])
+        self.assertGreater(len(vld8.validate_rendition(val, rend, data, raiseex=False)), 0)
+        rend['components'][0] = data['components'][1]
+        self.assertGreater(len(vld8.validate_rendition(val, rend, data, raiseex=False)), 0)
 
+        # problems outside of the components are found, too
+        rend['components'][0] = data['components'][0]
+        del rend['title']
+        self.assertGreater(len(vld8.validate_rendition(val, rend, data, raiseex=False)), 0)
 
+    def test_validate_update(self):
+        with open(os.path.join(datadir, "janaf-orig.json")) as fd:
+            prev = json.load(fd)
+        val = vld8.get_validator(schemadir, compiled=True)
+
+        def mutants():
+            rec = json.loads(json.dumps(prev))
+            rec['title'] = "A new title"
+            rec['components'][2]['description'] = "updated"
+            yield rec, True
+            rec = json.loads(json.dumps(rec))
+            rec['components'].reverse()
+            yield rec, True
+            rec = json.loads(json.dumps(rec))
+            rec['components'].append({"@id": "#cmp/new", "title": "new"})
+            yield rec, True
+            rec = json.loads(json.dumps(rec))
+            rec['components'][-1]['title'] = ["bad"]
+            yield rec, False
+            rec = json.loads(json.dumps(prev))
+            rec['components'][1]['downloadURL'] = 5
+            yield rec, False
+            rec = json.loads(json.dumps(prev))
+            rec['components'].append(json.loads(json.dumps(prev['components'][3])))
+            yield rec, False
+            rec = json.loads(json.dumps(prev))
+            rec['components'][0] = json.loads(json.dumps(prev['components'][3]))
+            yield rec, False
+            rec = json.loads(json.dumps(prev))
+            del rec['title']
+            yield rec, False
+
+            # a change in type is a change, even if the values are equal in python
+            prev['components'][0]['size'] = 1
+            for size in (True, 1.0):
+                rec = json.loads(json.dumps(prev))
+                rec['title'] = "A new title"
+                rec['components'][0]['size'] = size
+                yield rec, False
+
+            # a changed component that is equal in python to an unchanged one
+            prev['components'][1]['size'] = 1
+            rec = json.loads(json.dumps(prev))
+            rec['components'][0] = dict(prev['components'][1])
+            rec['components'][0]['size'] = 1.0
+            yield rec, val.validate(rec, raiseex=False) == []
+
+        for rec, valid in mutants():
+            errs = vld8.validate_update(val, rec, prev, raiseex=False)
+            self.assertEqual(not errs, valid)
+            self.assertEqual(not val.validate(rec, raiseex=False), valid)
+            if not valid:
+                with self.assertRaises(ValidationError):
+                    vld8.validate_update(val, rec, prev)
 
         
 if __name__ == '__main__':
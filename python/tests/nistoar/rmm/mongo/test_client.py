@@ -0,0 +1,44 @@
+import os, pdb
+import unittest as test
+
+from nistoar.rmm.mongo import client
+
+dburl = "mongodb://localhost:27017/testdb"
+
+class TestClientFactory(test.TestCase):
+
+    def tearDown(self):
+        client.configure({})
+        client.close_all()
+
+    def test_options_from_config(self):
+        self.assertEqual(client.options_from_config(None), {})
+        self.assertEqual(client.options_from_config({"maxPoolSize": 20, "w": "majority",
+                                                     "goob": "gurn"}),
+                         {"maxPoolSize": 20, "w": "majority"})
+        with self.assertRaises(ValueError):
+            client.options_from_config("maxPoolSize")
+
+    def test_get_client(self):
+        cli = client.get_client(dburl)
+        self.assertIs(client.get_client(dburl), cli)
+        self.assertEqual(cli.get_database().name, "testdb")
+
+        other = client.get_client(dburl, maxPoolSize=5)
+        self.assertIsNot(other, cli)
+        self.assertEqual(other.options.pool_options.max_pool_size, 5)
+        self.assertIs(client.get_client(dburl, maxPoolSize=5), other)
+
+        client.close_all()
+        self.assertIsNot(client.get_client(dburl), cli)
+
+    def test_configure(self):
+        client.configure({"maxPoolSize": 7, "w": 1, "connectTimeoutMS": 2000})
+        cli = client.get_client(dburl)
+        self.assertEqual(cli.options.pool_options.max_pool_size, 7)
+        self.assertEqual(cli.options.pool_options.connect_timeout, 2.0)
+        self.assertEqual(cli.write_concern.document, {"w": 1})
+
+            
+if __name__ == '__main__':
+    test.main()
@@ -1,8 +1,26 @@
-import pdb, os, json
+import pdb, os, json, warnings
 import unittest as test
+from pymongo import MongoClient
 
 from nistoar.rmm.mongo import loader 
 
+dburl = None
+if os.environ.get('MONGO_TESTDB_URL'):
+    dburl = os.environ.get('MONGO_TESTDB_URL')
+
+class _TestLoader(loader.Loader):
+    # a minimal concrete Loader
+    def load(self, data, validate=True, results=None, id=None):
+        if not results:
+            results = loader.LoadLog("test")
+        key = {"@id": data['@id']}
+        try:
+            if self.load_data(data, key, self.onupdate):
+                results.add(key)
+        except loader.RecordIngestError as ex:
+            results.add(key, [ex])
+        return results
+
 class TestLoadResult(test.TestCase):
 
     def test_ctor(self):
@@ -51,8 +69,162 @@ class TestLoadLog(test.TestCase):
         self.assertTrue(res.succeeded({"name": "bob"}))
         self.assertTrue(res.failed({"name": "bob"}))
         self.assertEqual(res.failures({"name": "bob"})[0].errs, ["epic fail"])
-        
 
+    def test_lookup_keys(self):
+        res = loader.LoadLog("test")
+        res.add({"@id": "ark:/88434/goob", "version": "1.0.0"})
+        res.add({"version": "1.0.1", "@id": "ark:/88434/goob"}, "epic fail")
+        res.add({"q": ["a", {"b": 1}]}, "fail")
+        res.add("file.json")
+        self.assertTrue(res.succeeded({"version": "1.0.0", "@id": "ark:/88434/goob"}))
+        self.assertFalse(res.failed({"version": "1.0.0", "@id": "ark:/88434/goob"}))
+        self.assertTrue(res.failed({"@id": "ark:/88434/goob", "version": "1.0.1"}))
+        self.assertFalse(res.succeeded({"@id": "ark:/88434/goob", "version": "1.0.1"}))
+        self.assertFalse(res.succeeded({"@id": "ark:/88434/goob"}))
+        self.assertTrue(res.failed({"q": ["a", {"b": 1}]}))
+        self.assertFalse(res.failed({"q": ("a", {"b": 1})}))
+        self.assertTrue(res.succeeded("file.json"))
+        self.assertEqual(len(res.failures()), 2)
+        self.assertEqual(len(res.failures({"q": ["a", {"b": 1}]})), 1)
+
+    def test_unchanged(self):
+        res = loader.LoadLog("test").add("a").add("b", unchanged=True).add("c", "fail", True)
+        self.assertEqual(res.attempt_count, 3)
+        self.assertEqual(res.success_count, 2)
+        self.assertEqual(res.unchanged_count, 1)
+        self.assertTrue(res.unchanged("b"))
+        self.assertTrue(res.succeeded("b"))
+        self.assertFalse(res.unchanged("a"))
+        self.assertFalse(res.unchanged("c"))
+        self.assertEqual(loader.LoadLog().merge(res).unchanged_count, 1)
+
+    def test_merge(self):
+        res = loader.LoadLog("test").add("a").add("b", "fail")
+        other = loader.LoadLog("other").add("c").add("b").add("d", "fail")
+        self.assertIs(res.merge(other), res)
+        self.assertEqual(res.attempt_count, 5)
+        self.assertEqual(res.failure_count, 2)
+        self.assertEqual(res.success_count, 3)
+        self.assertTrue(res.succeeded("b"))
+        self.assertTrue(res.failed("b"))
+        self.assertTrue(res.failed("d"))
+        self.assertEqual(other.attempt_count, 3)
+
+
+
+@test.skipIf(not os.environ.get('MONGO_TESTDB_URL'),
+             "test mongodb not available")
+class TestLoadData(test.TestCase):
+
+    def setUp(self):
+        self.ldr = _TestLoader(dburl, "testload")
+        self.ldr.onupdate = 'quiet'
+        self.ldr.connect()
+        self.coll = self.ldr._db["testload"]
+
+    def tearDown(self):
+        client = MongoClient(dburl)
+        if not hasattr(client, 'get_database'):
+            client.get_database = client.get_default_database
+        db = client.get_database()
+        if "testload" in db.list_collection_names():
+            db.drop_collection("testload")
+
+    def test_no_key(self):
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}), 1)
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 2}), 1)
+        self.assertEqual(self.coll.count_documents({"@id": "goob"}), 2)
+
+    def test_quiet(self):
+        key = {"@id": "goob"}
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}, key, 'quiet'), 1)
+            self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 2}, key, 'quiet'), 1)
+        self.assertEqual([x for x in w if issubclass(x.category, loader.UpdateWarning)], [])
+        self.assertEqual(self.coll.count_documents(key), 1)
+        self.assertEqual(self.coll.find_one(key)['a'], 2)
+
+    def test_duplicate_keys(self):
+        key = {"@id": "goob"}
+        self.coll.insert_many([{"@id": "goob", "a": 1}, {"@id": "goob", "a": 2}])
+        for onupdate in ('quiet', 'warn', 'fail', lambda d, k: True):
+            with self.assertRaises(loader.RecordIngestError):
+                self.ldr.load_data({"@id": "goob", "a": 3}, key, onupdate)
+        self.assertEqual(sorted(r['a'] for r in self.coll.find(key)), [1, 2])
+
+    def test_key_is_unique(self):
+        self.assertFalse(self.ldr._key_is_unique(self.coll, {"@id": "goob"}))
+        self.coll.create_index([("@id", 1)], unique=True)
+        self.ldr.connect()
+        self.assertTrue(self.ldr._key_is_unique(self.coll, {"@id": "goob"}))
+        self.assertTrue(self.ldr._key_is_unique(self.coll, {"@id": "goob", "a": 1}))
+        self.assertFalse(self.ldr._key_is_unique(self.coll, {"a": 1}))
+        self.assertFalse(self.ldr._key_is_unique(self.coll, {"@id": {"$ne": "goob"}}))
+
+    def test_warn(self):
+        key = {"@id": "goob"}
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}, key, 'warn'), 1)
+            self.assertEqual([x for x in w if issubclass(x.category, loader.UpdateWarning)], [])
+            self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 2}, key, 'warn'), 1)
+            self.assertEqual(len([x for x in w if issubclass(x.category, loader.UpdateWarning)]),
+                             1)
+        self.assertEqual(self.coll.count_documents(key), 1)
+        self.assertEqual(self.coll.find_one(key)['a'], 2)
+
+    def test_fail(self):
+        key = {"@id": "goob"}
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}, key, 'fail'), 1)
+        with self.assertRaises(loader.RecordIngestError):
+            self.ldr.load_data({"@id": "goob", "a": 2}, key, 'fail')
+        self.assertEqual(self.coll.count_documents(key), 1)
+        self.assertEqual(self.coll.find_one(key)['a'], 1)
+
+        self.ldr.onupdate = 'fail'
+        res = self.ldr.load({"@id": "goob", "a": 3})
+        self.assertEqual(res.failure_count, 1)
+        self.assertEqual(self.coll.find_one(key)['a'], 1)
+
+    def test_callable(self):
+        key = {"@id": "goob"}
+        seen = []
+        def onupdate(prev, k):
+            seen.append((prev, k))
+            return prev['a'] < 2
+
+        # no previous record:  the function is not called
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}, key, onupdate), 1)
+        self.assertEqual(seen, [])
+        id = self.coll.find_one(key)['_id']
+
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 2}, key, onupdate), 1)
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(seen[0][0]['a'], 1)
+        self.assertEqual(seen[0][1], key)
+        self.assertEqual(self.coll.count_documents(key), 1)
+        doc = self.coll.find_one(key)
+        self.assertEqual(doc['a'], 2)
+        self.assertEqual(doc['_id'], id)
+
+        # the function declines the update
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 3}, key, onupdate), 0)
+        self.assertEqual(len(seen), 2)
+        self.assertEqual(self.coll.find_one(key)['a'], 2)
+
+    def test_callable_removed(self):
+        key = {"@id": "goob"}
+        self.assertEqual(self.ldr.load_data({"@id": "goob", "a": 1}, key, 'quiet'), 1)
+
+        # the previous record disappears before it can be replaced
+        def onupdate(prev, k):
+            self.coll.delete_one({"_id": prev["_id"]})
+            return True
+        with self.assertRaises(loader.RecordIngestError) as cm:
+            self.ldr.load_data({"@id": "goob", "a": 2}, key, onupdate)
+        self.assertIn("removed during update", str(cm.exception))
+        self.assertEqual(self.coll.count_documents(key), 0)
 
             
 if __name__ == '__main__':
@@ -63,6 +63,19 @@ class TestNERDmLoader(test.TestCase):
     def test_ctor(self):
         self.assertEqual(self.ldr.coll, "versions")
 
+    def test_ensure_indexes(self):
+        self.ldr.connect()
+        self.assertEqual(self.ldr.missing_indexes(), {})
+        db = self.ldr._client.get_database()
+        self.assertIn("@id_1_version_1", db.versions.index_information())
+        self.assertIn("@id_1", db.record.index_information())
+        self.assertIn("@id_1", db.releasesets.index_information())
+
+        db.record.drop_index("@id_1")
+        self.assertEqual(self.ldr.missing_indexes(), {"record": ["@id_1"]})
+        self.assertEqual(self.ldr.ensure_indexes(), {"record": ["@id_1"]})
+        self.assertEqual(self.ldr.missing_indexes(), {})
+
     def test_validate(self):
         with open(janaffile) as fd:
             data = json.load(fd)
@@ -187,6 +200,103 @@ class TestNERDmLoader(test.TestCase):
             self.assertEqual(c[0]['version'], v)
             self.assertEqual(c[0]['title'], 'A Version '+v)
 
+    def test_load_many(self):
+        with open(janaffile) as fd:
+            data = json.load(fd)
+        recs = []
+        for v in "1.0.0 1.0.1 1.0.0".split():
+            rec = json.loads(json.dumps(data))
+            rec['version'] = v
+            rec['title'] = "Version "+v
+            recs.append(rec)
+        recs.append({"title": "goob"})
+
+        res = self.ldr.load_many(recs, batch_size=2)
+        self.assertEqual(res.attempt_count, 8)
+        self.assertEqual(res.success_count, 7)
+        self.assertEqual(res.failure_count, 1)
+        self.assertEqual(res.unchanged_count, 1)
+        self.assertTrue(res.unchanged('{"@id": "ark:/88434/sdp0fjspek351/pdr:v/1.0.0", "version": "1.0.0"}'))
+        self.assertTrue(res.failed('{"@id": "?"}'))
+        self.assertTrue(res.succeeded('{"@id": "ark:/88434/sdp0fjspek351/pdr:v/1.0.1", "version": "1.0.1"}'))
+
+        db = self.ldr._client.get_database()
+        self.assertEqual(db.record.count_documents({}), 1)
+        c = db.record.find()
+        self.assertEqual(c[0]['@id'], 'ark:/88434/sdp0fjspek351')
+        self.assertEqual(c[0]['version'], '1.0.1')
+        self.assertEqual(db.releasesets.count_documents({}), 1)
+        c = db.releasesets.find()
+        self.assertEqual(c[0]['@id'], 'ark:/88434/sdp0fjspek351/pdr:v')
+        self.assertEqual(c[0]['version'], '1.0.1')
+        self.assertEqual(db.versions.count_documents({}), 2)
+
+        # updates not allowed
+        self.ldr.onupdate = 'fail'
+        res = self.ldr.load_many(recs[:1])
+        self.assertEqual(res.attempt_count, 1)
+        self.assertEqual(res.failure_count, 1)
+
+    def test_load_unchanged(self):
+        with open(janaffile) as fd:
+            data = json.load(fd)
+        res = self.ldr.load(data)
+        self.assertEqual(res.success_count, 3)
+        self.assertEqual(res.unchanged_count, 0)
+        c = self.ldr._client.get_database().versions.find()
+        self.assertEqual(c[0][nerdm.CONTENT_HASH_PROP], nerdm.content_hash(data))
+
+        res = self.ldr.load(data)
+        self.assertEqual(res.attempt_count, 1)
+        self.assertEqual(res.unchanged_count, 1)
+        self.assertEqual(res.success_count, 1)
+
+        data['title'] = "Updated"
+        res = self.ldr.load(data)
+        self.assertEqual(res.attempt_count, 3)
+        self.assertEqual(res.unchanged_count, 0)
+        c = self.ldr._client.get_database().record.find()
+        self.assertEqual(c[0]['title'], "Updated")
+
+    def test_reload_after_failure(self):
+        with open(janaffile) as fd:
+            data = json.load(fd)
+
+        # make the loading of the releaseSet part fail
+        validate_parts = self.ldr._validate_parts
+        def failing_validate_parts(parts):
+            errs = validate_parts(parts)
+            errs['releaseSet'] = [loader.RecordIngestError("releaseSet failure")]
+            return errs
+        self.ldr._validate_parts = failing_validate_parts
+
+        for load in (self.ldr.load, lambda d: self.ldr.load_many([d])):
+            res = load(data)
+            self.assertEqual(res.failure_count, 1)
+            c = self.ldr._client.get_database().versions.find()
+            self.assertNotIn(nerdm.CONTENT_HASH_PROP, c[0])
+
+            # an identical reload is not skipped
+            res = load(data)
+            self.assertEqual(res.unchanged_count, 0)
+            self.assertEqual(res.failure_count, 1)
+
+        # once all the parts load, the content is remembered
+        self.ldr._validate_parts = validate_parts
+        for load in (self.ldr.load, lambda d: self.ldr.load_many([d])):
+            res = load(data)
+            self.assertEqual(res.unchanged_count, 0)
+            self.assertEqual(res.failure_count, 0)
+            c = self.ldr._client.get_database().versions.find()
+            self.assertEqual(c[0][nerdm.CONTENT_HASH_PROP], nerdm.content_hash(data))
+            self.ldr._client.get_database().versions.update_many({},
+                                                  {"$unset": {nerdm.CONTENT_HASH_PROP: ""}})
+
+        res = self.ldr.load(data)
+        self.assertEqual(res.unchanged_count, 0)
+        res = self.ldr.load(data)
+        self.assertEqual(res.unchanged_count, 1)
+
     def test_load_from_file(self):
         res = self.ldr.load_from_file(janaffile)
         self.assertEqual(res.attempt_count, 3)
@@ -198,6 +308,47 @@ class TestNERDmLoader(test.TestCase):
         self.assertEqual(self.ldr._client.get_database().versions.count_documents({}), 1)
         self.assertEqual(self.ldr._client.get_database().releasesets.count_documents({}), 1)
 
+    def test_load_from_dir_parallel(self):
+        loaded = []
+        res = self.ldr.load_from_dir(exdir, workers=2,
+                                     onload=lambda f, parts, r: loaded.append(f))
+        self.assertGreater(res.attempt_count, 0)
+        self.assertIn(janaffile, loaded)
+        db = self.ldr._client.get_database()
+        self.assertEqual(db.record.count_documents({'@id': 'ark:/88434/sdp0fjspek351'}), 1)
+        self.assertEqual(db.releasesets.count_documents({'@id': 'ark:/88434/sdp0fjspek351/pdr:v'}), 1)
+
+        # a serial reload should find the successfully loaded records unchanged
+        sres = self.ldr.load_from_dir(exdir)
+        self.assertEqual(sres.failure_count, res.failure_count)
+        self.assertGreater(sres.unchanged_count, 0)
+        self.assertEqual(sres.unchanged_count, sres.success_count)
+
+        self.ldr.skip_unchanged = False
+        sres = self.ldr.load_from_dir(exdir)
+        self.assertEqual(sres.attempt_count, res.attempt_count)
+        self.assertEqual(sres.failure_count, res.failure_count)
+        self.assertEqual(sres.unchanged_count, 0)
+
+    def test_prep_file(self):
+        nerdm._prep_loader = self.ldr
+        try:
+            prepared, validated = nerdm._prep_file(janaffile, True)
+            self.assertTrue(validated)
+            self.assertEqual(prepared[3]['version'], [])
+
+            self.ldr.load_from_file(janaffile)
+
+            # a record that is already loaded does not get validated
+            validate_parts = self.ldr._validate_parts
+            self.ldr._validate_parts = lambda parts: self.fail("unchanged record validated")
+            prepared, validated = nerdm._prep_file(janaffile, True)
+            self.assertFalse(validated)
+            self.assertEqual(prepared[3], {})
+            self.ldr._validate_parts = validate_parts
+        finally:
+            nerdm._prep_loader = None
+
     def test_init_metrics_for(self):
         with open(pdrfile) as fd:
             rec = json.load(fd)
@@ -215,6 +366,29 @@ class TestNERDmLoader(test.TestCase):
         self.assertEqual(c[0]['filepath'], "NIST_NPL_InterlabData2019.csv.sha256")
         # replace this with checks of successful loading into the database
         #self.fail("Tests not implemented")
+
+    def test_init_metrics_for_many(self):
+        with open(pdrfile) as fd:
+            rec = json.load(fd)
+        with open(janaffile) as fd:
+            janaf = json.load(fd)
+        nfiles = len([c for c in rec['components'] if 'filepath' in c])
+
+        self.ldr.connect()
+        database = self.ldr.lateloadr._db_metrics
+        nerdm.init_metrics_for_many(database, [rec, janaf, rec])
+        self.assertEqual(rec['@id'], 'ark:/88434/mds2-2106')
+        self.assertNotIn('pdrid', rec)
+        self.assertEqual(database.recordMetrics.count_documents({}), 2)
+        self.assertEqual(database.fileMetrics.count_documents({'pdrid': 'ark:/88434/mds2-2106'}), nfiles)
+
+        # a new file gets added; existing entries are left alone
+        database.fileMetrics.update_one({'pdrid': 'ark:/88434/mds2-2106'}, {'$set': {'success_get': 3}})
+        rec['components'].append({"@type": ["nrdp:DataFile"], "filepath": "goob.txt"})
+        nerdm.init_metrics_for(database, rec)
+        self.assertEqual(database.recordMetrics.count_documents({}), 2)
+        self.assertEqual(database.fileMetrics.count_documents({'pdrid': 'ark:/88434/mds2-2106'}), nfiles+1)
+        self.assertEqual(database.fileMetrics.count_documents({'success_get': 3}), 1)
         
 
         
@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+#
+# Usage: ensure-rmm-indexes.py [-cqs] [-M URL] [-m URL]
+# See help details via: ensure-rmm-indexes.py -h
+#
+# Create (or check for) the indexes needed by the RMM collections
+#
+import os, sys
+from argparse import ArgumentParser
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+oarpypath = os.path.join(basedir, "python")
+if 'OAR_HOME' in os.environ:
+    basedir = os.environ['OAR_HOME']
+    oarpypath = os.path.join(basedir, "lib", "python") +":"+ \
+                os.path.join(basedir, "python")
+schemadir = os.path.join(basedir, "etc", "schemas")
+if not os.path.exists(schemadir):
+    sdir = os.path.join(basedir, "model")
+    if os.path.exists(sdir):
+        schemadir = sdir
+    
+if 'OAR_PYTHONPATH' in os.environ:
+    oarpypath = os.environ['OAR_PYTHONPATH']
+
+sys.path.extend(oarpypath.split(os.pathsep))
+try:
+    import nistoar
+except ImportError as e:
+    nistoardir = os.path.join(basedir, "python")
+    sys.path.append(nistoardir)
+    import nistoar
+
+from nistoar.rmm.mongo.nerdm import NERDmLoader
+from nistoar.rmm.mongo.fields import FieldLoader
+from nistoar.rmm.mongo.taxon import TaxonomyLoader
+
+description = \
+"""create the indexes needed by the RMM's collections (record, versions, releasesets, 
+fields, taxonomy, and the metrics collections) that are missing from the database.
+"""
+
+epilog = None
+
+def define_opts(progname=None):
+    parser = ArgumentParser(progname, None, description, epilog)
+    parser.add_argument('-c', '--check', dest='check', default=False,
+                        action="store_true",
+                        help="only report the missing indexes; do not create them.  "+
+                             "The exit status will be 1 if any are missing.")
+    parser.add_argument('-q', '--quiet', dest='quiet', default=False,
+                        action="store_true",
+                        help="do not print non-fatal status messages")
+    parser.add_argument('-s', '--silent', dest='silent', default=False,
+                        action="store_true", help="print no messages at all")
+    parser.add_argument('-M', '--mongodb-url', metavar='URL',type=str,dest='url',
+                        action='store', default="mongodb://mongodb:3333/TestDB",
+                        help="the URL to the MongoDB database to index (in "+
+                             "the form 'mongodb://HOST:PORT/DBNAME')")
+    parser.add_argument('-m', '--metrics-url', metavar='URL',type=str,dest='metrics_url',
+                        action='store', default=None,
+                        help="the URL to the MongoDB database holding the metrics "+
+                             "collections, if different from the one given by -M")
+
+    return parser
+
+def main(args):
+    parser = define_opts()
+    opts = parser.parse_args(args)
+    if opts.silent:
+        opts.quiet = True
+
+    stat = 0
+    loaders = [ NERDmLoader(opts.url, schemadir, opts.metrics_url),
+                FieldLoader(opts.url, schemadir),
+                TaxonomyLoader(opts.url, schemadir)   ]
+
+    for loader in loaders:
+        loader.auto_ensure_indexes = False
+        try:
+            if opts.check:
+                missing = loader.missing_indexes()
+                if missing:
+                    stat = 1
+                for coll, names in missing.items():
+                    if not opts.silent:
+                        print("{0}: missing indexes: {1}".format(coll, ", ".join(names)))
+            else:
+                for coll, names in loader.ensure_indexes().items():
+                    if not opts.quiet:
+                        print("{0}: created indexes: {1}".format(coll, ", ".join(names)))
+        except Exception as ex:
+            if not opts.silent:
+                print("{0}: Failed to {1} indexes: {2}"
+                      .format(parser.prog, (opts.check and "check") or "create", str(ex)),
+                      file=sys.stderr)
+            return 2
+        finally:
+            loader.disconnect()
+
+    if not opts.quiet and stat == 0:
+        print("All indexes are in place")
+    return stat
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
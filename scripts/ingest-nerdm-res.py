@@ -1,6 +1,6 @@
 #! /usr/bin/env python
 #
-# Usage: ingest-nerdm-res.py [-VqsU] [-M URL] NERD_FILE_OR_DIR [...]
+# Usage: ingest-nerdm-res.py [-VqsU] [-M URL] [-w N] NERD_FILE_OR_DIR [...]
 # See help details via: ingest-nerdm-res.py -h
 #
 # Load NERDm JSON files into the RMM
@@ -69,6 +69,15 @@ def define_opts(progname=None):
                         action='store', default="mongodb://mongodb:3333/TestDB",
                         help="the URL to the MongoDB database to load into (in "+
                              "the form 'mongodb://HOST:PORT/DBNAME')")
+    parser.add_argument('-w', '--workers', metavar='N', type=int, dest='workers',
+                        action='store', default=1,
+                        help="load the files found in directories using N worker "+
+                             "processes (for parsing and validation) and N threads "+
+                             "(for database writes); default: 1 (serial loading)")
+    parser.add_argument('-F', '--force', dest='force', default=False,
+                        action="store_true",
+                        help="reload records even if they are unchanged from the "+
+                             "versions already in the database")
 
     return parser
 
@@ -87,13 +96,15 @@ def main(args):
     if opts.warn and not opts.quiet:
         loader.onupdate = 'warn'
         warnings.simplefilter("once")
+    if opts.force:
+        loader.skip_unchanged = False
     totres = LoadLog()
 
     for nerdpath in opts.nerdfile:
         validate = opts.validate
 
         if os.path.isdir(nerdpath):
-            res = load_from_dir(nerdpath, loader, validate, opts.archdir)
+            res = load_from_dir(nerdpath, loader, validate, opts.archdir, opts.workers)
         elif os.path.isfile(nerdpath):
             res = load_from_file(nerdpath, loader, validate, opts.archdir)
         elif not os.path.exists(nerdpath):
@@ -118,14 +129,23 @@ def main(args):
                               res.attempt_count))
 
     if not opts.quiet:
-        print("Ingested {0} out of {1} records".format(totres.success_count,
-                                                       totres.attempt_count))
+        print("Ingested {0} out of {1} records ({2} unchanged)"
+              .format(totres.success_count, totres.attempt_count, totres.unchanged_count))
 
     if totres.failure_count > 0:
         stat = 2
     return stat
 
-def load_from_dir(dirpath, loader, validate=True, archdir=None):
+def load_from_dir(dirpath, loader, validate=True, archdir=None, workers=1):
+    if workers > 1:
+        onload = None
+        if archdir:
+            def onload(filepath, parts, res):
+                if res.failure_count == 0:
+                    archive_record(filepath, parts['record'].get('@id', ''),
+                                   parts['version'].get('version', '1.0.0'), archdir)
+        return loader.load_from_dir(dirpath, validate, LoadLog(), workers, onload)
+
     results = LoadLog()
 
     for root, dirs, files in os.walk(dirpath):
@@ -153,18 +173,20 @@ def load_from_file(filepath, loader, validate=True, archdir=None, results=None):
     out = loader.load(data, validate=validate, results=results, id=filepath)
 
     if archdir and out.failure_count == 0:
-        recid = re.sub(r'/.*$', '', re.sub(r'ark:/\d+/', '', data.get('@id','')))
-        if not recid:
-            # should not happen
-            recid = filepath
-        ver = data.get('version', '1.0.0').replace('.', '_')
-        outfile = os.path.join(archdir, "%s-v%s.json" % (os.path.basename(recid), ver))
-
-        # this should not raise errors, but if it does, let it bubble up
-        shutil.move(filepath, outfile)
+        archive_record(filepath, data.get('@id',''), data.get('version', '1.0.0'), archdir)
             
     return out
 
+def archive_record(filepath, id, version, archdir):
+    recid = re.sub(r'/.*$', '', re.sub(r'ark:/\d+/', '', id))
+    if not recid:
+        # should not happen
+        recid = filepath
+    ver = version.replace('.', '_')
+    outfile = os.path.join(archdir, "%s-v%s.json" % (os.path.basename(recid), ver))
+
+    # this should not raise errors, but if it does, let it bubble up
+    shutil.move(filepath, outfile)
 
 
 def fmterrs(errs):
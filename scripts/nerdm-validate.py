@@ -0,0 +1,156 @@
+#! /usr/bin/env python3
+#
+# Usage: nerdm-validate.py [-a] [-j JOBS] [-o FILE] [-S DIR] [-t URI] [-qs] SRC ...
+# See help details via: nerdm-validate.py -h
+#
+# Validate NERDm records found in directories, JSON files, or NDJSON files, writing a report
+# for each (invalid) record as a line of NDJSON.
+#
+import os, sys, json, time
+from argparse import ArgumentParser
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+oarpypath = os.path.join(basedir, "python")
+if 'OAR_HOME' in os.environ:
+    basedir = os.environ['OAR_HOME']
+    oarpypath = os.path.join(basedir, "lib", "python") +":"+ \
+                os.path.join(basedir, "python")
+schemadir = os.path.join(basedir, "etc", "schemas")
+if not os.path.exists(schemadir):
+    sdir = os.path.join(basedir, "model")
+    if os.path.exists(sdir):
+        schemadir = sdir
+
+if 'OAR_PYTHONPATH' in os.environ:
+    oarpypath = os.environ['OAR_PYTHONPATH']
+if 'OAR_SCHEMA_DIR' in os.environ:
+    schemadir = os.environ['OAR_SCHEMA_DIR']
+
+sys.path.extend(oarpypath.split(os.pathsep))
+try:
+    import nistoar
+except ImportError as e:
+    nistoardir = os.path.join(basedir, "python")
+    sys.path.append(nistoardir)
+    import nistoar
+
+from nistoar.nerdm.validate import validate_many
+
+prog = os.path.basename(sys.argv[0])
+if not prog or prog == 'python':
+    prog = "nerdm-validate"
+
+NDJSON_EXTS = (".ndjson", ".jsonl")
+
+description = \
+"""validate NERDm records.  Each SRC can be a directory (searched recursively for .json files),
+a JSON file, or an NDJSON file (ending in .ndjson or .jsonl) with one record per line.  A report
+for each invalid record is written as a line of NDJSON: an object with "id", "valid", and
+"errors" properties.
+"""
+
+epilog = None
+
+def define_opts(progname=None):
+    parser = ArgumentParser(progname, None, description, epilog)
+    parser.add_argument('src', metavar='SRC', type=str, nargs='+',
+                        help="a directory, JSON file, or NDJSON file containing records to validate")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs', default=1,
+                        help="validate records using N parallel processes (default: 1)")
+    parser.add_argument('-o', '--output', metavar='FILE', type=str, dest='outfile',
+                        help="write the NDJSON reports to FILE (default: standard out)")
+    parser.add_argument('-a', '--all', dest='all', default=False, action="store_true",
+                        help="write a report for every record, including the valid ones")
+    parser.add_argument('-S', '--schema-dir', metavar='DIR', type=str, dest='schemadir',
+                        default=schemadir,
+                        help="the directory containing the NERDm schemas (default: "+
+                             str(schemadir)+")")
+    parser.add_argument('-t', '--type-uri', metavar='URI', type=str, dest='typeuri',
+                        help="validate each record against the schema with this URI rather than "+
+                             "the one given by its _schema property")
+    parser.add_argument('-L', '--lenient', dest='strict', default=True, action="store_false",
+                        help="do not fail records that use an unrecognized extension schema")
+    parser.add_argument('-q', '--quiet', dest='quiet', default=False, action="store_true",
+                        help="do not print the summary statistics")
+    parser.add_argument('-s', '--silent', dest='silent', default=False, action="store_true",
+                        help="print no messages at all (other than the reports)")
+    return parser
+
+def main(args):
+    parser = define_opts()
+    opts = parser.parse_args(args)
+    if opts.silent:
+        opts.quiet = True
+
+    if opts.jobs < 1:
+        raise RuntimeError("--jobs value must be a positive number")
+    if not opts.schemadir or not os.path.isdir(opts.schemadir):
+        raise RuntimeError("{0}: schema directory not found".format(opts.schemadir))
+
+    out = sys.stdout
+    if opts.outfile:
+        out = open(opts.outfile, 'w')
+
+    tally = {"count": 0, "invalid": 0}
+    def report(id, errs):
+        tally['count'] += 1
+        if errs:
+            tally['invalid'] += 1
+        if errs or opts.all:
+            out.write(json.dumps({"id": id, "valid": not errs, "errors": errs}) + "\n")
+
+    start = time.time()
+    try:
+        for id, errs in validate_many(find_records(opts.src, report), opts.schemadir, opts.jobs,
+                                      opts.typeuri, opts.strict):
+            report(id, errs)
+    finally:
+        if opts.outfile:
+            out.close()
+
+    count, invalid = tally['count'], tally['invalid']
+    if not opts.quiet:
+        elapsed = time.time() - start
+        rate = (elapsed > 0 and count / elapsed) or 0.0
+        print("Validated {0} records in {1:.2f}s ({2:.1f} records/s): {3} valid, {4} invalid"
+              .format(count, elapsed, rate, count - invalid, invalid), file=sys.stderr)
+
+    return invalid
+
+def find_records(srcs, onerror):
+    """
+    return the records to validate found in the given sources.  Files are returned as paths (to
+    be read by the validating process); NDJSON records are returned as (FILE:LINE, record) pairs.
+    :param function onerror:  a function that is called with an identifier and a list of errors
+                              for each NDJSON line that cannot be parsed
+    """
+    for src in srcs:
+        if os.path.isdir(src):
+            for dirpath, dirnames, filenames in os.walk(src):
+                dirnames.sort()
+                for f in sorted(filenames):
+                    if f.endswith(".json") and not f.startswith('.'):
+                        yield os.path.join(dirpath, f)
+        elif src.endswith(NDJSON_EXTS) and os.path.isfile(src):
+            with open(src) as fd:
+                for i, line in enumerate(fd, 1):
+                    if not line.strip():
+                        continue
+                    id = "{0}:{1}".format(src, i)
+                    try:
+                        rec = json.loads(line)
+                    except ValueError as ex:
+                        onerror(id, [{"message": "Unable to read record: "+str(ex)}])
+                        continue
+                    yield (id, rec)
+        else:
+            # a missing file will be reported as invalid
+            yield src
+
+if __name__ == '__main__':
+    try:
+        invalid = main(sys.argv[1:])
+        sys.exit((invalid and 2) or 0)
+    except RuntimeError as e:
+        print("{0}: Error: {1}".format(prog, str(e)), file=sys.stderr)
+        sys.exit(1)
@@ -1,6 +1,6 @@
 #! /usr/bin/env python3
 #
-# Usage: pdl2resources [-d DIR] [-i START] [-c COUNT] PDLFILE
+# Usage: pdl2resources [-d DIR] [-i START] [-c COUNT] [-j JOBS] PDLFILE
 #
 # Extract the Dataset objects from the given PDL file, convert them to
 # NERDm Resource records, and write them out into individual files.  New ARK
@@ -9,6 +9,8 @@
 import os, sys, errno, json, re
 from argparse import ArgumentParser
 from collections import OrderedDict
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 oarpypath = os.path.join(basedir, "python")
@@ -43,7 +45,7 @@ except ImportError as e:
     sys.path.append(nistoardir)
     import nistoar
 
-from nistoar.nerdm.convert import PODds2Res
+from nistoar.nerdm.convert import PODds2Res, PODCatalogReader
 from nistoar.id import PDRMinter, NIST_ARK_NAAN
 SHOULDER_POS = len("ark:/"+NIST_ARK_NAAN+"/")
 
@@ -58,6 +60,8 @@ if not prog or prog == 'python':
     prog = "pdl2resources"
 
 IDSEQ = 2000
+BATCH_SIZE = 100        # datasets converted per jq process
+PAR_BATCH_SIZE = 20     # datasets per batch handed to a worker (with --jobs)
 
 description = \
 """convert PDL Datasets to NERDm Resource records"""
@@ -78,6 +82,10 @@ def define_opts(progname=None):
                         help="export no more than COUNT records", default=-1)
     parser.add_argument('-T', '--fix-theme', dest='fixtheme',action='store_true',
                         help="add controlled topic values based on given themes")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs',
+                        default=1,
+                        help="convert records using N parallel processes "+
+                             "(default: 1)")
 
     return parser
 
@@ -85,49 +93,117 @@ def main(args):
     parser = define_opts()
     opts = parser.parse_args(args)
 
+    if opts.jobs < 1:
+        raise RuntimeError("--jobs value must be a positive number")
+
     seq = IDSEQ + opts.start
     minter = PDRMinter(None, { 'shoulder_for_edi': 'mds0' })
-    cvtr = PODds2Res(jqlib, schemadir=schemadir)
-    cvtr.fix_theme = opts.fixtheme
 
     ensure_out_dir(opts.odir)
 
     try:
-        with open(opts.pdlfile) as fd:
-            pdldata = json.load(fd)
+        fd = open(opts.pdlfile)
     except IOError as e:
         raise RuntimeError("Unable to read PDL file ({0}): {1}".
                            format(opts.pdlfile, str(e)))
-    except ValueError as e:
-        raise RuntimeError("JSON Syntax error: "+str(e))
 
-    if 'dataset' not in pdldata:
-        raise RuntimeError("PDL catalog document is missing its 'dataset' property")
-    dss = pdldata['dataset']
+    # the catalog is streamed so that only the datasets being converted are 
+    # held in memory (a batch at a time)
+    with fd:
+        reader = PODCatalogReader(fd)
+        dss = reader.datasets(opts.start, opts.count)
+        try:
+            if opts.jobs > 1:
+                extracted = convert_parallel(batches(dss, minter, PAR_BATCH_SIZE), opts)
+            else:
+                init_worker(opts.odir, opts.fixtheme)
+                extracted = sum(convert_batch(b, ids)
+                                for b, ids in batches(dss, minter, BATCH_SIZE))
+        except IOError as e:
+            raise RuntimeError("Unable to read PDL file ({0}): {1}".
+                               format(opts.pdlfile, str(e)))
+        except ValueError as e:
+            raise RuntimeError(str(e))
+
+    if opts.count != 0 and reader.scanned <= opts.start:
+        raise RuntimeError("Not enough datasets found for requested starting record: start={0} > found={1}".format(opts.start, reader.scanned))
 
-    if opts.start >= len(dss):
-        raise RuntimeError("Not enough datasets found for requested starting record: start={0} > found={1}".format(opts.start, len(dss)))
+    if not extracted:
+        print("Warning: No output files written.", file=sys.stderr)
 
-    extracted = 0
-    lim = len(dss)
-    if opts.count >= 0:
-        lim = opts.start + opts.count
-    for i in range(opts.start, lim):
+    return extracted
+
+# the converter used by the current (worker) process; see init_worker()
+_cvtr = None
+_odir = None
+
+def init_worker(odir, fixtheme):
+    """
+    set up the converter used by convert_batch() in the current process
+    """
+    global _cvtr, _odir
+    _odir = odir
+    _cvtr = PODds2Res(jqlib, schemadir=schemadir)
+    _cvtr.fix_theme = fixtheme
+
+def batches(dss, minter, size):
+    """
+    group the given datasets into batches of a given size, minting an 
+    identifier for each one.  The identifiers are minted in catalog order 
+    (before the batch is handed off for conversion), so they do not depend on 
+    how the batches are converted.  
+    :return generator:  yielding (datasets, identifiers) list pairs
+    """
+    batch, ids = [], []
+    for ds in dss:
         iddata = {}
-        if "identifier" in dss[i]:
-            iddata['ediid'] = dss[i]['identifier']
-        id = minter.mint(iddata)
-        basename = id[SHOULDER_POS:]
-        res = cvtr.convert_data(dss[i], id)
-        with open(os.path.join(opts.odir,basename+".json"), 'w') as fd:
-            json.dump(res, fd, indent=4, separators=(',', ': '))
+        if "identifier" in ds:
+            iddata['ediid'] = ds['identifier']
+        ids.append(minter.mint(iddata))
+        batch.append(ds)
+        if len(batch) >= size:
+            yield batch, ids
+            batch, ids = [], []
+    if batch:
+        yield batch, ids
+
+def convert_batch(dss, ids):
+    """
+    convert the given datasets, assigning them the given identifiers, and 
+    write the results to the output directory.  The datasets are converted 
+    through a single jq process.  
+    :return int:  the number of files written
+    """
+    extracted = 0
+    for id, res in zip(ids, _cvtr.convert_data_many(dss, ids)):
+        write_resource(_odir, id, res)
         extracted += 1
+    return extracted
 
-    if not extracted:
-        print("Warning: No output files written.", file=sys.stderr)
-
+def convert_parallel(batches, opts):
+    """
+    convert the given batches of datasets by farming them out to a pool of
+    opts.jobs worker processes.  Only a few batches per worker are read ahead
+    of the conversion at any time.
+    :return int:  the number of files written
+    """
+    extracted = 0
+    pending = deque()
+    with ProcessPoolExecutor(opts.jobs, initializer=init_worker,
+                             initargs=(opts.odir, opts.fixtheme)) as pool:
+        for dss, ids in batches:
+            pending.append(pool.submit(convert_batch, dss, ids))
+            if len(pending) >= 2 * opts.jobs:
+                extracted += pending.popleft().result()
+        while pending:
+            extracted += pending.popleft().result()
     return extracted
 
+def write_resource(odir, id, res):
+    basename = id[SHOULDER_POS:]
+    with open(os.path.join(odir,basename+".json"), 'w') as fd:
+        json.dump(res, fd, indent=4, separators=(',', ': '))
+
 def ensure_out_dir(odir):
     if not os.path.exists(odir):
         pdir = os.path.dirname(odir)
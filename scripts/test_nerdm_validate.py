@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#
+import os, pdb, sys, shutil, json
+import unittest as test
+
+scriptdir = os.path.dirname(os.path.abspath(__file__))
+basedir = os.path.dirname(scriptdir)
+datadir = os.path.join(basedir, "model", "examples")
+valscript = os.path.join(scriptdir, "nerdm-validate.py")
+
+tmpname = "_test_validate"
+tmpdir = os.path.join(os.getcwd(), tmpname)
+srcdir = os.path.join(tmpdir, "src")
+ndjson = os.path.join(tmpdir, "recs.ndjson")
+report = os.path.join(tmpdir, "report.ndjson")
+examples = ["janaf.json", "mds2-2106.json"]
+
+class TestValidate(test.TestCase):
+
+    def setUp(self):
+        os.makedirs(srcdir)
+        for f in examples:
+            shutil.copy(os.path.join(datadir, f), srcdir)
+        with open(ndjson, 'w') as fd:
+            for f in examples:
+                with open(os.path.join(datadir, f)) as ifd:
+                    rec = json.load(ifd)
+                fd.write(json.dumps(rec) + "\n")
+            del rec['title']
+            fd.write(json.dumps(rec) + "\n")
+
+    def tearDown(self):
+        if os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir)
+
+    def read_report(self):
+        with open(report) as fd:
+            return [json.loads(line) for line in fd]
+
+    def test_valid(self):
+        script = "python3 {0} -q -j 2 -o {1} {2}".format(valscript, report, srcdir)
+        self.assertEqual(os.system(script), 0)
+        self.assertEqual(self.read_report(), [])
+
+        script = "python3 {0} -q -a -o {1} {2}".format(valscript, report, srcdir)
+        self.assertEqual(os.system(script), 0)
+        rpt = self.read_report()
+        self.assertEqual([r['id'] for r in rpt], [os.path.join(srcdir, f) for f in examples])
+        self.assertTrue(all(r['valid'] for r in rpt))
+
+    def test_invalid(self):
+        script = "python3 {0} -q -j 2 -o {1} {2} {3}".format(valscript, report, srcdir, ndjson)
+        self.assertNotEqual(os.system(script), 0)
+        rpt = self.read_report()
+        self.assertEqual(len(rpt), 1)
+        self.assertEqual(rpt[0]['id'], ndjson+":3")
+        self.assertFalse(rpt[0]['valid'])
+        self.assertTrue(any("title" in e['message'] for e in rpt[0]['errors']))
+
+
+if __name__ == '__main__':
+    test.main()
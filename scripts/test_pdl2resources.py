@@ -70,6 +70,23 @@ class TestConvert(test.TestCase):
         self.assertEqual(len(failed), 0,
              "{0} converted file(s) failed validation".format(str(len(failed))))
 
+    def test_convert_parallel(self):
+        serdir = os.path.join(tmpdir, "serial")
+        pardir = os.path.join(tmpdir, "parallel")
+        script = "python3 {0} -d {1} -c 20 {2}"
+        self.assertEqual(os.system(script.format(cvtscript, serdir, pdlfile)), 0)
+        script = "python3 {0} -d {1} -c 20 -j 3 {2}"
+        self.assertEqual(os.system(script.format(cvtscript, pardir, pdlfile)), 0)
+
+        files = sorted(os.listdir(serdir))
+        self.assertEqual(len(files), 20)
+        self.assertEqual(sorted(os.listdir(pardir)), files)
+        for f in files:
+            with open(os.path.join(serdir, f)) as fd:
+                expect = json.load(fd)
+            with open(os.path.join(pardir, f)) as fd:
+                self.assertEqual(json.load(fd), expect)
+
         
 
 if __name__ == '__main__':
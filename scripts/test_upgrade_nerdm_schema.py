@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#
+import os, pdb, sys, shutil, json
+import unittest as test
+
+scriptdir = os.path.dirname(os.path.abspath(__file__))
+basedir = os.path.dirname(scriptdir)
+datadir = os.path.join(basedir, "model", "examples")
+simplenerd = os.path.join(basedir, "jq", "tests", "data", "simple-nerdm.json")
+upgscript = os.path.join(scriptdir, "upgrade-nerdm-schema.py")
+
+sys.path.insert(0, os.path.join(basedir, "python"))
+import nistoar.nerdm.constants as const
+
+tmpname = "_test_upgrade"
+tmpdir = os.path.join(os.getcwd(), tmpname)
+srcdir = os.path.join(tmpdir, "src")
+outdir = os.path.join(tmpdir, "out")
+ndjson = os.path.join(tmpdir, "recs.ndjson")
+examples = ["hitsc-0.2.json", "janaf.json", "mds2-2106.json"]
+
+class TestUpgrade(test.TestCase):
+
+    def setUp(self):
+        os.makedirs(os.path.join(srcdir, "sub"))
+        os.mkdir(outdir)
+        for f in examples:
+            shutil.copy(os.path.join(datadir, f), srcdir)
+        shutil.copy(simplenerd, os.path.join(srcdir, "sub"))
+        with open(ndjson, 'w') as fd:
+            for f in examples:
+                with open(os.path.join(datadir, f)) as ifd:
+                    fd.write(json.dumps(json.load(ifd)) + "\n")
+            fd.write('{"title": "not NERDm"}\n')
+
+    def tearDown(self):
+        if os.path.exists(tmpdir):
+            shutil.rmtree(tmpdir)
+
+    def check_upgraded(self, path):
+        with open(path) as fd:
+            nerd = json.load(fd)
+        self.assertEqual(nerd['_schema'], const.CORE_SCHEMA_URI+"#")
+        self.assertNotIn('versionHistory', nerd)
+        return nerd
+
+    def test_upgrade_to_outdir(self):
+        script = "python3 {0} -q -j 2 -d {1} {2}".format(upgscript, outdir, srcdir)
+        self.assertEqual(os.system(script), 0)
+
+        for f in examples:
+            self.check_upgraded(os.path.join(outdir, "src", f))
+        nerd = self.check_upgraded(os.path.join(outdir, "src", "sub", "simple-nerdm.json"))
+        self.assertEqual(nerd['_extensionSchemas'],
+                         [const.PUB_SCHEMA_URI+"#/definitions/PublicDataResource"])
+
+        with open(os.path.join(srcdir, "hitsc-0.2.json")) as fd:
+            self.assertTrue(json.load(fd)['_schema'].endswith("/v0.2#"))
+
+    def test_upgrade_in_place(self):
+        script = "python3 {0} -q -i {1}".format(upgscript, srcdir)
+        self.assertEqual(os.system(script), 0)
+        for f in examples:
+            self.check_upgraded(os.path.join(srcdir, f))
+        self.assertEqual([f for f in os.listdir(srcdir) if f.startswith('.')], [])
+
+    def test_upgrade_ndjson(self):
+        script = "python3 {0} -s -i {1}".format(upgscript, ndjson)
+        self.assertNotEqual(os.system(script), 0)
+
+        with open(ndjson) as fd:
+            lines = fd.readlines()
+        self.assertEqual(len(lines), len(examples)+1)
+        for line in lines[:-1]:
+            self.assertEqual(json.loads(line)['_schema'], const.CORE_SCHEMA_URI+"#")
+        self.assertEqual(json.loads(lines[-1]), {"title": "not NERDm"})
+
+
+if __name__ == '__main__':
+    test.main()
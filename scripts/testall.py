@@ -13,6 +13,8 @@ jqtest = [os.path.join(testdir, "test_pod2nerdm.jqt"),
 nerdmtest = [os.path.join(testdir, "test_podds2resource.py"),
              os.path.join(testdir, "test_resource2midaspodds.py")]
 pdltest = os.path.join(basedir, "scripts", "test_pdl2resources.py")
+upgtest = os.path.join(basedir, "scripts", "test_upgrade_nerdm_schema.py")
+valtest = os.path.join(basedir, "scripts", "test_nerdm_validate.py")
 extest = os.path.join(basedir, "model", "tests", "test_examples.py")
 pydir = os.path.join(basedir, "python")
 pytestdir = os.path.join(pydir, "tests")
@@ -44,6 +46,14 @@ notok = os.system("/usr/bin/env python3 {0}".format(pdltest))
 if notok:
     print("**ERROR: some or all pdl2resources output files have failed validation")
     status += 8
+notok = os.system("/usr/bin/env python3 {0}".format(upgtest))
+if notok:
+    print("**ERROR: some or all upgrade-nerdm-schema tests have failed")
+    status += 32
+notok = os.system("/usr/bin/env python3 {0}".format(valtest))
+if notok:
+    print("**ERROR: some or all nerdm-validate tests have failed")
+    status += 64
 
 print("Executing nistoar python tests...")
 os.environ.setdefault('OAR_TEST_INCLUDE', '')
@@ -0,0 +1,322 @@
+#! /usr/bin/env python3
+#
+# Usage: upgrade-nerdm-schema.py [-i | -d DIR] [-j JOBS] [-V VER] [-qs] SRC ...
+# See help details via: upgrade-nerdm-schema.py -h
+#
+# Upgrade an archive of NERDm records to the latest (or a specified) version of the NERDm
+# schemas.  SRC can be a directory of NERDm JSON files, a single JSON file, or an NDJSON file
+# (one record per line).
+#
+import os, sys, json, time, tempfile
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+oarpypath = os.path.join(basedir, "python")
+if 'OAR_HOME' in os.environ:
+    basedir = os.environ['OAR_HOME']
+    oarpypath = os.path.join(basedir, "lib", "python") +":"+ \
+                os.path.join(basedir, "python")
+
+if 'OAR_PYTHONPATH' in os.environ:
+    oarpypath = os.environ['OAR_PYTHONPATH']
+
+sys.path.extend(oarpypath.split(os.pathsep))
+try:
+    import nistoar
+except ImportError as e:
+    nistoardir = os.path.join(basedir, "python")
+    sys.path.append(nistoardir)
+    import nistoar
+
+from nistoar.nerdm.convert.latest import NERDm2Latest
+
+prog = os.path.basename(sys.argv[0])
+if not prog or prog == 'python':
+    prog = "upgrade-nerdm-schema"
+
+NDJSON_EXTS = (".ndjson", ".jsonl")
+BATCH_SIZE = 200        # NDJSON lines per task handed to a worker
+FILE_BATCH_SIZE = 20    # files per task handed to a worker
+
+description = \
+"""upgrade NERDm records to the latest (or a specified) version of the NERDm schemas.  Each SRC
+can be a directory (searched recursively for .json files), a JSON file, or an NDJSON file
+(ending in .ndjson or .jsonl) with one record per line.
+"""
+
+epilog = None
+
+def define_opts(progname=None):
+    parser = ArgumentParser(progname, None, description, epilog)
+    parser.add_argument('src', metavar='SRC', type=str, nargs='+',
+                        help="a directory, JSON file, or NDJSON file containing records to upgrade")
+    parser.add_argument('-i', '--in-place', dest='inplace', default=False, action="store_true",
+                        help="replace each file with its upgraded version")
+    parser.add_argument('-d', '--output-directory', type=str, dest='odir', metavar='DIR',
+                        help="write the upgraded files to DIR, mirroring the layout of the "+
+                             "input directories")
+    parser.add_argument('-V', '--version', type=str, dest='version', metavar='VER',
+                        help="the version of the NERDm schemas to upgrade to (e.g. v0.7); "+
+                             "default: the latest version")
+    parser.add_argument('-j', '--jobs', metavar='N', type=int, dest='jobs', default=1,
+                        help="upgrade records using N parallel processes (default: 1)")
+    parser.add_argument('-q', '--quiet', dest='quiet', default=False, action="store_true",
+                        help="do not print the summary report")
+    parser.add_argument('-s', '--silent', dest='silent', default=False, action="store_true",
+                        help="print no messages at all")
+    return parser
+
+class UpgradeLog(object):
+    """
+    a tally of the records processed
+    """
+    def __init__(self):
+        self.upgraded = 0
+        self.unchanged = 0
+        self.failures = []
+        self.start = time.time()
+
+    @property
+    def count(self):
+        return self.upgraded + self.unchanged + len(self.failures)
+
+    def add(self, name, status, err=None):
+        if err:
+            self.failures.append((name, err))
+        elif status:
+            self.upgraded += 1
+        else:
+            self.unchanged += 1
+
+    def summary(self):
+        elapsed = time.time() - self.start
+        rate = (elapsed > 0 and self.count / elapsed) or 0.0
+        return "Processed {0} records in {1:.2f}s ({2:.1f} records/s): {3} upgraded, {4} unchanged, " \
+               "{5} failed".format(self.count, elapsed, rate, self.upgraded, self.unchanged,
+                                   len(self.failures))
+
+def main(args):
+    parser = define_opts()
+    opts = parser.parse_args(args)
+    if opts.silent:
+        opts.quiet = True
+
+    if opts.inplace == bool(opts.odir):
+        raise RuntimeError("Exactly one of --in-place or --output-directory is required")
+    if opts.jobs < 1:
+        raise RuntimeError("--jobs value must be a positive number")
+    if opts.odir and not os.path.isdir(opts.odir):
+        raise RuntimeError("{0}: not an existing directory".format(opts.odir))
+
+    log = UpgradeLog()
+    pool = None
+    if opts.jobs > 1:
+        pool = ProcessPoolExecutor(opts.jobs, initializer=init_worker, initargs=(opts.version,))
+    else:
+        init_worker(opts.version)
+
+    try:
+        for src in opts.src:
+            if os.path.isdir(src):
+                odir = opts.odir and os.path.join(opts.odir, os.path.basename(src.rstrip(os.sep)))
+                upgrade_dir(src, odir, log, pool, opts.jobs)
+            elif src.endswith(NDJSON_EXTS) and os.path.isfile(src):
+                outfile = opts.odir and os.path.join(opts.odir, os.path.basename(src))
+                upgrade_ndjson(src, outfile or src, log, pool, opts.jobs)
+            elif os.path.isfile(src):
+                outfile = opts.odir and os.path.join(opts.odir, os.path.basename(src))
+                for res in upgrade_files([(src, outfile or src)]):
+                    log.add(*res)
+            else:
+                log.add(src, None, "File not found")
+    finally:
+        if pool:
+            pool.shutdown()
+
+    if not opts.silent:
+        for name, err in log.failures:
+            print("{0}: {1}: {2}".format(prog, name, err), file=sys.stderr)
+    if not opts.quiet:
+        print(log.summary())
+
+    return log
+
+# the converter used by the current (worker) process; see init_worker()
+_cvtr = None
+_version = None
+
+def init_worker(version=None):
+    """
+    set up the converter used by the current process
+    """
+    global _cvtr, _version
+    _cvtr = NERDm2Latest()
+    _version = version
+
+def upgrade_record(rec):
+    """
+    upgrade the given record to the requested schema version.
+    :return tuple:  the upgraded record and whether it differs from the input
+    """
+    out = _cvtr.convert(rec, version=_version, copy_on_write=True)
+    return out, out != rec
+
+def upgrade_files(pairs):
+    """
+    upgrade the given files, writing the results to the given output files; a file that is to be
+    upgraded in place is only rewritten if its contents changed.
+    :param list pairs:  (input, output) file path pairs
+    :return list:  a (name, changed, error) tuple for each file
+    """
+    out = []
+    for inpath, outpath in pairs:
+        try:
+            with open(inpath) as fd:
+                rec = json.load(fd)
+            rec, changed = upgrade_record(rec)
+            if changed or os.path.abspath(inpath) != os.path.abspath(outpath):
+                write_atomically(outpath, json.dumps(rec, indent=4, separators=(',', ': ')))
+            out.append((inpath, changed, None))
+        except Exception as ex:
+            out.append((inpath, False, str(ex) or type(ex).__name__))
+    return out
+
+def upgrade_lines(lines):
+    """
+    upgrade the NDJSON records in the given lines.  A line that fails to be upgraded is returned
+    unchanged.
+    :param list lines:  (line number, line) pairs giving the lines to upgrade
+    :return list:  a (line number, output line, changed, error) tuple for each line
+    """
+    out = []
+    for lineno, line in lines:
+        try:
+            rec, changed = upgrade_record(json.loads(line))
+            if changed:
+                line = json.dumps(rec, separators=(',', ':')) + "\n"
+            out.append((lineno, line, changed, None))
+        except Exception as ex:
+            out.append((lineno, line, False, str(ex) or type(ex).__name__))
+    return out
+
+def _submit(pool, func, *args):
+    if pool:
+        return pool.submit(func, *args)
+    return _Done(func(*args))
+
+class _Done(object):
+    # stands in for a Future when running serially
+    def __init__(self, result):
+        self._result = result
+    def result(self):
+        return self._result
+
+def _run(tasks, pool, jobs):
+    # execute the tasks, yielding their results in order, with only a few tasks per worker in flight
+    pending = deque()
+    for task in tasks:
+        pending.append(_submit(pool, *task))
+        if len(pending) >= 2 * jobs:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def find_files(srcdir, odir=None):
+    """
+    return (input, output) path pairs for the JSON files found under a directory
+    """
+    for dirpath, dirnames, filenames in os.walk(srcdir):
+        dirnames.sort()
+        for f in sorted(filenames):
+            if f.startswith('.') or not f.endswith(".json"):
+                continue
+            inpath = os.path.join(dirpath, f)
+            outpath = inpath
+            if odir:
+                outpath = os.path.join(odir, os.path.relpath(inpath, srcdir))
+            yield inpath, outpath
+
+def upgrade_dir(srcdir, odir, log, pool=None, jobs=1):
+    """
+    upgrade all of the JSON files found under the given directory
+    """
+    def batches():
+        batch = []
+        for pair in find_files(srcdir, odir):
+            if odir:
+                os.makedirs(os.path.dirname(pair[1]), exist_ok=True)
+            batch.append(pair)
+            if len(batch) >= FILE_BATCH_SIZE:
+                yield (upgrade_files, batch)
+                batch = []
+        if batch:
+            yield (upgrade_files, batch)
+
+    for results in _run(batches(), pool, jobs):
+        for res in results:
+            log.add(*res)
+
+def upgrade_ndjson(srcfile, outfile, log, pool=None, jobs=1):
+    """
+    upgrade the records in an NDJSON file, writing the results (in order) to outfile.  The output
+    is written to a temporary file which replaces outfile once all records have been processed.
+    """
+    def batches(fd):
+        batch = []
+        for i, line in enumerate(fd, 1):
+            if not line.strip():
+                continue
+            batch.append((i, line if line.endswith("\n") else line+"\n"))
+            if len(batch) >= BATCH_SIZE:
+                yield (upgrade_lines, batch)
+                batch = []
+        if batch:
+            yield (upgrade_lines, batch)
+
+    with open(srcfile) as infd, _AtomicFile(outfile) as outfd:
+        for results in _run(batches(infd), pool, jobs):
+            for lineno, line, changed, err in results:
+                outfd.write(line)
+                log.add("{0}:{1}".format(srcfile, lineno), changed, err)
+
+class _AtomicFile(object):
+    # a file that is written to a temporary file and moved into place when closed without error
+    def __init__(self, path):
+        self.path = path
+        fd, self.tmppath = tempfile.mkstemp(prefix="."+os.path.basename(path)+".",
+                                            dir=os.path.dirname(os.path.abspath(path)))
+        self.fd = os.fdopen(fd, 'w')
+
+    def __enter__(self):
+        return self.fd
+
+    def __exit__(self, exctype, exc, tb):
+        self.fd.close()
+        if exctype:
+            os.remove(self.tmppath)
+            return False
+        if os.path.exists(self.path):
+            os.chmod(self.tmppath, os.stat(self.path).st_mode & 0o777)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.tmppath, 0o666 & ~umask)
+        os.replace(self.tmppath, self.path)
+
+def write_atomically(path, content):
+    """
+    write the given content to a file, replacing it only once it has been completely written
+    """
+    with _AtomicFile(path) as fd:
+        fd.write(content)
+        fd.write("\n")
+
+if __name__ == '__main__':
+    try:
+        log = main(sys.argv[1:])
+        sys.exit((log.failures and 2) or 0)
+    except RuntimeError as e:
+        print("{0}: Error: {1}".format(prog, str(e)), file=sys.stderr)
+        sys.exit(1)